@@ -0,0 +1,312 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from metrics import REGISTRY, metrics_enabled
+from state_manager import DEFAULT_TIMEZONE, SLOT_DONE, StateManager
+
+logger = logging.getLogger(__name__)
+
+DB_CALL_SECONDS = REGISTRY.histogram(
+    'bot_db_call_seconds', 'Time of StateManager calls in the DB thread', ['method']
+)
+DB_CALL_ERRORS = REGISTRY.counter('bot_db_call_errors_total', 'Failed StateManager calls', ['method'])
+DB_TRANSACTION_SECONDS = REGISTRY.histogram(
+    'bot_db_transaction_seconds', 'Time of group commit transactions including commit'
+)
+DB_BATCH_CALLS = REGISTRY.histogram(
+    'bot_db_batch_calls', 'StateManager calls per group commit transaction',
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+)
+
+
+def _resolve(future: asyncio.Future, ok: bool, value):
+    """Завершить future в потоке event loop"""
+    if future.done():
+        return
+    if ok:
+        future.set_result(value)
+    else:
+        future.set_exception(value)
+
+
+class AsyncStateManager:
+    """
+    Асинхронный фасад над StateManager.
+
+    Все обращения к SQLite выполняются в отдельном потоке БД, поэтому
+    корутины бота не блокируют event loop. Вызовы, накопившиеся в очереди,
+    выполняются в одной транзакции (group commit), а их результаты
+    возвращаются только после фиксации.
+    """
+
+    def __init__(self, state_manager: StateManager, max_batch: int = 512):
+        self.state_manager = state_manager
+        self.max_batch = max_batch
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name='state-db', daemon=True)
+        self._thread.start()
+
+    def _submit(self, func, *args) -> asyncio.Future:
+        """Поставить вызов в очередь потока БД"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.put((func, args, loop, future))
+        return future
+
+    def _run(self):
+        """Цикл потока БД: выполнение вызовов пакетами в одной транзакции"""
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                return
+
+            batch = [item]
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            results = []
+            # Время вызовов меряется, только если метрики включены
+            timing = metrics_enabled()
+            started = time.perf_counter() if timing else 0.0
+            # Блокировка записи нужна, только если в пакете есть изменяющий вызов
+            write = not all(getattr(func, 'read_only', False) for func, _, _, _ in batch)
+            try:
+                with self.state_manager._get_connection(write):
+                    for func, args, _, _ in batch:
+                        call_started = time.perf_counter() if timing else 0.0
+                        try:
+                            results.append((True, func(*args)))
+                        except Exception as e:
+                            results.append((False, e))
+                            DB_CALL_ERRORS.inc(func.__name__)
+                        if timing:
+                            DB_CALL_SECONDS.observe(time.perf_counter() - call_started, func.__name__)
+                if timing:
+                    DB_TRANSACTION_SECONDS.observe(time.perf_counter() - started)
+                    DB_BATCH_CALLS.observe(len(batch))
+            except Exception as e:
+                # Транзакция не зафиксирована: ни один вызов пакета не выполнен
+                logger.error(f"Group commit of {len(batch)} state operations failed: {e}")
+                results = [(False, e)] * len(batch)
+
+            for (_, _, loop, future), (ok, value) in zip(batch, results):
+                loop.call_soon_threadsafe(_resolve, future, ok, value)
+
+    async def close(self):
+        """Дождаться выполнения поставленных вызовов и закрыть БД"""
+        self._queue.put(None)
+        await asyncio.get_running_loop().run_in_executor(None, self._thread.join)
+        self.state_manager.close()
+
+    async def user_exists(self, user_id: int) -> bool:
+        """Проверка существования пользователя"""
+        return await self._submit(self.state_manager.user_exists, user_id)
+
+    async def create_user(self, user_id: int, timezone: str = DEFAULT_TIMEZONE):
+        """Создание нового пользователя"""
+        return await self._submit(self.state_manager.create_user, user_id, timezone)
+
+    async def get_user_timezone(self, user_id: int) -> Optional[str]:
+        """Часовой пояс пользователя"""
+        return await self._submit(self.state_manager.get_user_timezone, user_id)
+
+    async def set_user_timezone(self, user_id: int, timezone: str):
+        """Установить часовой пояс пользователя"""
+        return await self._submit(self.state_manager.set_user_timezone, user_id, timezone)
+
+    async def get_timezones(self) -> List[str]:
+        """Часовые пояса, которые когда-либо выбирали пользователи"""
+        return await self._submit(self.state_manager.get_timezones)
+
+    async def get_timezones_added(self) -> Dict[str, Optional[str]]:
+        """Часовые пояса и время их появления в боте (UTC)"""
+        return await self._submit(self.state_manager.get_timezones_added)
+
+    async def touch_user(self, user_id: int, today: Optional[str] = None):
+        """Отметить обращение пользователя к боту"""
+        return await self._submit(self.state_manager.touch_user, user_id, today)
+
+    async def reactivate_user(self, user_id: int) -> bool:
+        """Вернуть пользователя в рассылку, True - если он был заблокирован"""
+        return await self._submit(self.state_manager.reactivate_user, user_id)
+
+    async def block_users(self, user_ids: List[int]):
+        """Исключить пользователей из рассылки после постоянной ошибки доставки"""
+        return await self._submit(self.state_manager.block_users, list(user_ids))
+
+    async def get_user_status(self, user_id: int) -> Optional[str]:
+        """Статус доставки пользователя"""
+        return await self._submit(self.state_manager.get_user_status, user_id)
+
+    async def get_user_activity(self, active_since: Optional[str] = None) -> Dict[str, int]:
+        """Количество пользователей по статусу (и неактивных с active_since)"""
+        return await self._submit(self.state_manager.get_user_activity, active_since)
+
+    async def get_all_users(self) -> List[int]:
+        """Получить список всех пользователей"""
+        return await self._submit(self.state_manager.get_all_users)
+
+    async def get_users_page(self, after_user_id: Optional[int], limit: int,
+                             shard: Optional[Tuple[int, int]] = None,
+                             timezone: Optional[str] = None, active_only: bool = False,
+                             active_since: Optional[str] = None) -> List[int]:
+        """Получить следующую страницу пользователей (шарда, пояса, активных), упорядоченных по user_id"""
+        return await self._submit(
+            self.state_manager.get_users_page, after_user_id, limit, shard, timezone, active_only, active_since
+        )
+
+    async def iter_user_batches(self, batch_size: int = 1000, after_user_id: Optional[int] = None,
+                                shard: Optional[Tuple[int, int]] = None,
+                                timezone: Optional[str] = None, active_only: bool = False,
+                                active_since: Optional[str] = None) -> AsyncIterator[List[int]]:
+        """Потоково перебрать пользователей (шарда, пояса, активных) после after_user_id страницами по batch_size"""
+        last_user_id = after_user_id
+        while True:
+            batch = await self.get_users_page(
+                last_user_id, batch_size, shard, timezone, active_only, active_since
+            )
+            if not batch:
+                return
+            yield batch
+            last_user_id = batch[-1]
+
+    async def iter_users(self, batch_size: int = 1000) -> AsyncIterator[int]:
+        """Потоково перебрать всех пользователей порциями по batch_size"""
+        async for batch in self.iter_user_batches(batch_size):
+            for user_id in batch:
+                yield user_id
+
+    async def set_verb_of_the_day(self, user_id: int, infinitivo: str, today: Optional[str] = None):
+        """Установить глагол дня для пользователя"""
+        return await self._submit(self.state_manager.set_verb_of_the_day, user_id, infinitivo, today)
+
+    async def get_current_verb(self, user_id: int, today: Optional[str] = None) -> Optional[str]:
+        """Получить текущий глагол дня для пользователя"""
+        return await self._submit(self.state_manager.get_current_verb, user_id, today)
+
+    async def get_sent_tenses(self, user_id: int, today: Optional[str] = None) -> List[str]:
+        """Получить список отправленных времён для пользователя на сегодня"""
+        return await self._submit(self.state_manager.get_sent_tenses, user_id, today)
+
+    async def mark_tense_sent(self, user_id: int, tense: str, today: Optional[str] = None):
+        """Отметить время как отправленное"""
+        return await self._submit(self.state_manager.mark_tense_sent, user_id, tense, today)
+
+    async def set_verbs_of_the_day(self, assignments: Iterable[Tuple[int, str]],
+                                   today: Optional[str] = None) -> Dict[int, str]:
+        """Установить глаголы дня для многих пользователей в одной транзакции"""
+        return await self._submit(self.state_manager.set_verbs_of_the_day, list(assignments), today)
+
+    async def get_current_verbs(self, user_ids: List[int], today: Optional[str] = None) -> Dict[int, str]:
+        """Получить глаголы дня для многих пользователей"""
+        return await self._submit(self.state_manager.get_current_verbs, user_ids, today)
+
+    async def get_slot_state(self, user_ids: List[int],
+                             today: Optional[str] = None) -> List[Tuple[int, str, List[str]]]:
+        """Получить (user_id, infinitivo, отправленные времена) для многих пользователей"""
+        return await self._submit(self.state_manager.get_slot_state, user_ids, today)
+
+    async def mark_tenses_sent(self, deliveries: Iterable[Tuple[int, str]], today: Optional[str] = None):
+        """Отметить отправленные времена для многих пользователей"""
+        return await self._submit(self.state_manager.mark_tenses_sent, list(deliveries), today)
+
+    async def claim_next_tenses(self, user_ids: List[int], tenses: List[str], today: Optional[str] = None,
+                                slot: Optional[str] = None,
+                                verbs: Optional[Dict[int, str]] = None) -> List[Tuple[int, str, str]]:
+        """Зарезервировать в outbox следующее время для многих пользователей"""
+        return await self._submit(self.state_manager.claim_next_tenses, user_ids, tenses, today, slot, verbs)
+
+    async def complete_tense_claims(self, delivered: Iterable[Tuple[int, str]],
+                                    failed: Iterable[Tuple[int, str]], today: Optional[str] = None):
+        """Отметить доставленные строки outbox и снять недоставленные"""
+        return await self._submit(self.state_manager.complete_tense_claims, list(delivered), list(failed), today)
+
+    async def get_pending_tenses(self, today: Optional[str] = None, timezone: Optional[str] = None,
+                                 shard: Optional[Tuple[int, int]] = None,
+                                 claimed_before: Optional[str] = None,
+                                 limit: int = 1000) -> List[Tuple[int, str, str]]:
+        """Недоставленные строки outbox за дату"""
+        return await self._submit(
+            self.state_manager.get_pending_tenses, today, timezone, shard, claimed_before, limit
+        )
+
+    async def get_outbox_backlog(self) -> Dict[str, Optional[object]]:
+        """Число недоставленных строк outbox и время самой старой"""
+        return await self._submit(self.state_manager.get_outbox_backlog)
+
+    async def save_quiz_sessions(self, sessions: Iterable[Tuple[str, int, str, str, List[str], int]]):
+        """Сохранить сессии квизов одной транзакцией"""
+        return await self._submit(self.state_manager.save_quiz_sessions, list(sessions))
+
+    async def get_quiz_session(self, session_id: str) -> Optional[Tuple[str, int, str, str, List[str], int, bool]]:
+        """Получить сессию квиза"""
+        return await self._submit(self.state_manager.get_quiz_session, session_id)
+
+    async def record_quiz_answer(self, session_id: str, chosen_index: int, is_correct: bool) -> bool:
+        """Записать ответ на квиз, вернуть False при повторном ответе"""
+        return await self._submit(self.state_manager.record_quiz_answer, session_id, chosen_index, is_correct)
+
+    async def record_quiz_results(self, results: Iterable[Tuple[int, str, str, bool, str]]):
+        """Дописать ответы на квизы в журнал и обновить агрегаты"""
+        return await self._submit(self.state_manager.record_quiz_results, list(results))
+
+    async def get_user_quiz_stats(self, user_id: int) -> Optional[Tuple[int, int, int, int, str]]:
+        """Статистика квизов пользователя"""
+        return await self._submit(self.state_manager.get_user_quiz_stats, user_id)
+
+    async def get_quiz_report(self, limit: int = 5) -> Dict[str, object]:
+        """Сводка по квизам для администратора"""
+        return await self._submit(self.state_manager.get_quiz_report, limit)
+
+    async def record_review(self, user_id: int, infinitivo: str, is_correct: bool,
+                            today: Optional[str] = None) -> str:
+        """Записать ответ на квиз по глаголу и пересчитать дату повторения"""
+        return await self._submit(self.state_manager.record_review, user_id, infinitivo, is_correct, today)
+
+    async def get_due_verbs(self, user_ids: List[int], today: Optional[str] = None) -> Dict[int, str]:
+        """Самые просроченные глаголы многих пользователей: {user_id: infinitivo}"""
+        return await self._submit(self.state_manager.get_due_verbs, user_ids, today)
+
+    async def get_slot_runs(self, today: Optional[str] = None) -> Dict[str, Tuple[str, Optional[int]]]:
+        """Прогоны слотов за сегодня"""
+        return await self._submit(self.state_manager.get_slot_runs, today)
+
+    async def begin_slot_run(self, slot: str, today: Optional[str] = None) -> Tuple[str, Optional[int]]:
+        """Начать или продолжить сегодняшний прогон слота"""
+        return await self._submit(self.state_manager.begin_slot_run, slot, today)
+
+    async def save_slot_cursor(self, slot: str, last_user_id: int, today: Optional[str] = None):
+        """Сохранить курсор прогона слота"""
+        return await self._submit(self.state_manager.save_slot_cursor, slot, last_user_id, today)
+
+    async def finish_slot_run(self, slot: str, status: str = SLOT_DONE, today: Optional[str] = None):
+        """Отметить сегодняшний прогон слота завершённым"""
+        return await self._submit(self.state_manager.finish_slot_run, slot, status, today)
+
+    async def prune_old_rows(self, keep_days: int) -> Dict[str, int]:
+        """Удалить записи старше keep_days дней"""
+        return await self._submit(self.state_manager.prune_old_rows, keep_days)
+
+    async def get_table_sizes(self) -> Dict[str, int]:
+        """Количество строк в основных таблицах"""
+        return await self._submit(self.state_manager.get_table_sizes)
+
+    async def reset_daily_progress(self, user_id: int):
+        """Сброс ежедневного прогресса (для тестирования)"""
+        return await self._submit(self.state_manager.reset_daily_progress, user_id)
+
+    async def reset_sent_tenses(self, user_id: int, today: Optional[str] = None):
+        """Сброс отправленных времён для пользователя"""
+        return await self._submit(self.state_manager.reset_sent_tenses, user_id, today)
@@ -0,0 +1,121 @@
+"""
+Бенчмарк словаря с правильными формами из conjugator.py против словаря,
+в котором хранятся все формы.
+
+Синтетический набор: --verbs глаголов на -ar/-er/-ir во всех временах
+conjugator.TENSES, доля --irregular времён отличается от правильного
+спряжения (изменённая основа). Для обоих вариантов .bin выводятся размер
+файла, память записей всех глаголов (tracemalloc), первое обращение к
+времени глагола (поиск, создание записи и спряжение) и повторное
+обращение (из кэша conjugate()).
+
+Запуск из корня проекта:
+    python benchmarks/bench_conjugator.py
+    python benchmarks/bench_conjugator.py --verbs 20000 --irregular 0.1
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import verb_dataset  # noqa: E402
+from conjugator import TENSES, conjugate  # noqa: E402
+from data_loader import VerbDataLoader  # noqa: E402
+from verb_dataset import PERSONS  # noqa: E402
+
+CONSONANTS = 'bcdfglmnprstv'
+VOWELS = 'aeiou'
+
+
+def write_synthetic_csv(path: str, count: int, irregular: float):
+    """Синтетический набор со случайными инфинитивами во всех временах спряжения"""
+    rng = random.Random(42)
+    infinitivos = set()
+    while len(infinitivos) < count:
+        stem = ''.join(rng.choice(CONSONANTS) + rng.choice(VOWELS) for _ in range(rng.randint(2, 4)))
+        infinitivos.add(stem + rng.choice('bdlnrt') + rng.choice(('ar', 'er', 'ir')))
+
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(
+            ['popularity', 'infinitivo', 'translation_ru']
+            + [f'{tense}__{person}' for tense in TENSES for person in PERSONS]
+        )
+        for index, infinitivo in enumerate(sorted(infinitivos, key=lambda _: rng.random())):
+            row = [str(index + 1), infinitivo, f'перевод {index}']
+            for tense in TENSES:
+                forms = conjugate(infinitivo, tense)
+                if rng.random() < irregular:
+                    # Неправильное время: изменённая основа во всех лицах
+                    forms = tuple(form.replace(infinitivo[:2], infinitivo[:2] + 'i', 1) for form in forms)
+                row.extend(forms)
+            writer.writerow(row)
+
+
+def compile_full(csv_file: str, compiled_file: str):
+    """Образ, в котором все времена хранятся как неправильные"""
+    regular = verb_dataset.conjugate
+    verb_dataset.conjugate = lambda infinitivo, tense: None
+    try:
+        verb_dataset.compile_csv(csv_file, compiled_file)
+    finally:
+        verb_dataset.conjugate = regular
+
+
+def measure(csv_file: str, compiled_file: str, names: list) -> dict:
+    conjugate.cache_clear()
+    tracemalloc.start()
+    loader = VerbDataLoader(csv_file, compiled_file)
+    loader.get_all_verbs()
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del loader
+
+    conjugate.cache_clear()
+    loader = VerbDataLoader(csv_file, compiled_file)
+    timings = []
+    for _ in range(2):
+        started = time.perf_counter()
+        for name, tense in names:
+            loader.get_tense_forms(loader.get_verb_by_infinitivo(name), tense)
+        timings.append((time.perf_counter() - started) / len(names) * 1e6)
+    return {'size': os.path.getsize(compiled_file), 'memory': memory, 'cold': timings[0], 'warm': timings[1]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--verbs', type=int, default=5000)
+    parser.add_argument('--irregular', type=float, default=0.3, help='доля неправильных времён')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_file = os.path.join(tmp_dir, 'verbs.csv')
+        write_synthetic_csv(csv_file, args.verbs, args.irregular)
+        regular_file = os.path.join(tmp_dir, 'regular.bin')
+        full_file = os.path.join(tmp_dir, 'full.bin')
+        verb_dataset.compile_csv(csv_file, regular_file)
+        compile_full(csv_file, full_file)
+
+        _, records = verb_dataset.read_csv(csv_file)
+        rng = random.Random(7)
+        names = [(record[1], rng.choice(TENSES)) for record in records]
+        rng.shuffle(names)
+
+        print(f"{args.verbs} verbs x {len(TENSES)} tenses, {args.irregular:.0%} irregular")
+        print(f"{'dataset':>11} {'.bin, KB':>9} {'memory, MB':>11} {'first, us':>10} {'repeat, us':>11}")
+        for name, compiled_file in (('conjugator', regular_file), ('full table', full_file)):
+            result = measure(csv_file, compiled_file, names)
+            print(
+                f"{name:>11} {result['size'] / 1024:>9.0f} {result['memory'] / 2 ** 20:>11.2f} "
+                f"{result['cold']:>10.2f} {result['warm']:>11.2f}"
+            )
+
+
+if __name__ == '__main__':
+    main()
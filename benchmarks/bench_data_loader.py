@@ -0,0 +1,108 @@
+"""
+Бенчмарк VerbDataLoader: задержка поиска глагола по инфинитиву и память
+для прежнего хранения (список словарей csv.DictReader, линейный поиск)
+и для индексированных компактных записей.
+
+Прогоняется на текущем verbs.csv и на синтетическом наборе из 10k глаголов.
+
+Запуск из корня проекта:
+    python benchmarks/bench_data_loader.py
+    python benchmarks/bench_data_loader.py --synthetic 50000 --lookups 2000
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_loader import VerbDataLoader  # noqa: E402
+
+CSV_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'verbs.csv')
+
+
+class LegacyVerbDataLoader:
+    """Прежний загрузчик: список словарей и линейный поиск"""
+
+    def __init__(self, csv_file: str):
+        with open(csv_file, 'r', encoding='utf-8') as f:
+            self.verbs = list(csv.DictReader(f))
+
+    def get_verb_by_infinitivo(self, infinitivo: str):
+        for verb in self.verbs:
+            if verb['infinitivo'] == infinitivo:
+                return verb
+        return None
+
+    def get_tense_forms(self, verb_data, tense: str):
+        return [verb_data.get(f"{tense}__{person}", '—') for person in ['1s', '2s', '3s', '1p', '2p', '3p']]
+
+
+def write_synthetic_csv(path: str, count: int):
+    """Синтетический набор: глаголы из verbs.csv с уникальными инфинитивами"""
+    with open(CSV_FILE, 'r', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        rows = list(reader)
+
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for index in range(count):
+            row = list(rows[index % len(rows)])
+            row[0] = str(index + 1)
+            row[1] = f"{row[1]}{index}"
+            # Формы делаются уникальными, как у настоящего словаря
+            row[3:] = [f"{form}{index}" for form in row[3:]]
+            writer.writerow(row)
+
+
+def measure(loader_class, csv_file: str, lookups: int):
+    # Память меряется отдельной загрузкой, чтобы tracemalloc не искажал время
+    tracemalloc.start()
+    loader = loader_class(csv_file)
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del loader
+
+    started = time.perf_counter()
+    loader = loader_class(csv_file)
+    load_time = time.perf_counter() - started
+
+    rng = random.Random(42)
+    names = [loader.verbs[rng.randrange(len(loader.verbs))] for _ in range(lookups)]
+    names = [verb['infinitivo'] if isinstance(verb, dict) else verb.infinitivo for verb in names]
+
+    started = time.perf_counter()
+    for name in names:
+        verb = loader.get_verb_by_infinitivo(name)
+        loader.get_tense_forms(verb, 'Presente')
+    lookup_time = (time.perf_counter() - started) / lookups * 1e6
+
+    return load_time, memory, lookup_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--synthetic', type=int, default=10000, help='размер синтетического набора')
+    parser.add_argument('--lookups', type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        synthetic = os.path.join(tmp_dir, 'verbs_synthetic.csv')
+        write_synthetic_csv(synthetic, args.synthetic)
+
+        print(f"{'dataset':>12} {'loader':>8} {'load, ms':>9} {'memory, MB':>11} {'lookup, us':>11}")
+        for name, csv_file in (('verbs.csv', CSV_FILE), (f'{args.synthetic} verbs', synthetic)):
+            for loader_name, loader_class in (('legacy', LegacyVerbDataLoader), ('indexed', VerbDataLoader)):
+                load_time, memory, lookup_time = measure(loader_class, csv_file, args.lookups)
+                print(f"{name:>12} {loader_name:>8} {load_time * 1000:>9.1f} "
+                      f"{memory / 1024 / 1024:>11.2f} {lookup_time:>11.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,282 @@
+"""
+Нагрузочный тест полного дня: N синтетических пользователей получают все
+слоты дня (глагол дня, два квиза, времена) в сжатом времени.
+
+Бот работает как в продакшене - тик планировщика, диспетчер слотов,
+очередь отправки, поток БД - но сообщения уходят в локальную заглушку
+Telegram Bot API в отдельном процессе, которая может имитировать задержку
+сети, flood control (429) и пользователей, заблокировавших бота (403).
+Тики суток проигрываются подряд без ожидания
+(или с паузой --tick-seconds). Сеть не нужна, поэтому тест можно запускать
+в CI: при числе ошибок отправки больше --max-errors код выхода ненулевой.
+
+Для каждого слота выводятся: число отправленных сообщений, ошибок и
+отказов заблокированных чатов (после первого отказа чат выпадает из рассылки),
+время и пропускная способность рассылки, перцентили задержки отправки
+(от постановки в очередь до ответа API) и время выполнения запросов в
+потоке БД.
+
+Запуск из корня проекта:
+    python benchmarks/bench_day.py
+    python benchmarks/bench_day.py --users 20000 --zones 4 --flood-every 5000 --api-latency 0.02
+    python benchmarks/bench_day.py --blocked 0.2
+"""
+import argparse
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import pytz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram import Bot  # noqa: E402
+from telegram.request import HTTPXRequest  # noqa: E402
+
+from bot import OUTBOUND_SENDERS, SLOT_TICK_MINUTES, SpanishVerbBot  # noqa: E402
+from bench_timezones import pick_zones  # noqa: E402
+from fake_telegram import FakeTelegramProcess, percentile  # noqa: E402
+from outbound import OutboundQueue, is_permanent_error  # noqa: E402
+
+CSV_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'verbs.csv')
+TOKEN = '123456:bench'
+UNLIMITED = 1e9
+
+# Слот, к которому относится текущая корутина (задачи диспетчера наследуют контекст)
+current_slot = contextvars.ContextVar('current_slot', default=None)
+
+
+class SlotMetrics:
+    """Метрики одного слота, суммарно по всем часовым поясам"""
+
+    def __init__(self):
+        self.users = 0
+        self.sent = 0
+        self.errors = 0
+        self.blocked = 0
+        self.latencies = []
+        self.db_time = 0.0
+        self.runs = []
+
+    @property
+    def elapsed(self) -> float:
+        """Время, когда шёл хотя бы один прогон слота (прогоны поясов одного тика пересекаются)"""
+        total = 0.0
+        end = None
+        for started, finished in sorted(self.runs):
+            if end is None or started > end:
+                total += finished - started
+                end = finished
+            elif finished > end:
+                total += finished - end
+                end = finished
+        return total
+
+    def report(self) -> dict:
+        return {
+            'users': self.users,
+            'sent': self.sent,
+            'errors': self.errors,
+            'blocked': self.blocked,
+            'elapsed': self.elapsed,
+            'throughput': self.sent / self.elapsed if self.elapsed else 0.0,
+            'p50': percentile(self.latencies, 0.5),
+            'p99': percentile(self.latencies, 0.99),
+            'db_time': self.db_time,
+        }
+
+
+def blocked_users(users: int, share: float):
+    """Пользователи, заблокировавшие бота: равномерно доля share от всех"""
+    if not share:
+        return set()
+    step = 1 / share
+    return {int(index * step) + 1 for index in range(int(users * share))}
+
+
+def populate(bot: SpanishVerbBot, users: int, zones):
+    """Синтетические пользователи, распределённые по часовым поясам"""
+    today = datetime.now().date().isoformat()
+    with bot.state_manager.state_manager._get_connection() as conn:
+        conn.executemany(
+            'INSERT OR IGNORE INTO users (user_id, created_at, timezone, last_interaction) VALUES (?, ?, ?, ?)',
+            (
+                (user_id, '2024-01-01T00:00:00', zones[user_id % len(zones)], today)
+                for user_id in range(1, users + 1)
+            )
+        )
+        conn.executemany('INSERT OR IGNORE INTO timezones (timezone) VALUES (?)', ((zone,) for zone in zones))
+
+
+def instrument(bot: SpanishVerbBot, metrics):
+    """Обёртки вокруг прогона слота, отправки и вызовов БД, собирающие метрики по слотам"""
+    run_slot = bot.run_slot
+    send_message = bot.outbound.send_message
+    submit = bot.state_manager._submit
+    dispatch = bot.dispatcher.run
+
+    async def timed_run_slot(slot_name, handler, timezone=None):
+        slot = metrics[slot_name]
+        current_slot.set(slot)
+        started = time.perf_counter()
+        try:
+            await run_slot(slot_name, handler, timezone)
+        finally:
+            slot.runs.append((started, time.perf_counter()))
+
+    async def timed_dispatch(*args, **kwargs):
+        count = await dispatch(*args, **kwargs)
+        slot = current_slot.get()
+        if slot is not None:
+            slot.users += count
+        return count
+
+    async def timed_send_message(chat_id, **kwargs):
+        slot = current_slot.get()
+        started = time.perf_counter()
+        try:
+            result = await send_message(chat_id, **kwargs)
+        except Exception as e:
+            if slot is not None:
+                if is_permanent_error(e):
+                    slot.blocked += 1
+                else:
+                    slot.errors += 1
+            raise
+        if slot is not None:
+            slot.sent += 1
+            slot.latencies.append(time.perf_counter() - started)
+        return result
+
+    def timed_submit(func, *args):
+        slot = current_slot.get()
+        if slot is None:
+            return submit(func, *args)
+
+        def timed(*call_args):
+            # Выполняется в потоке БД
+            started = time.perf_counter()
+            try:
+                return func(*call_args)
+            finally:
+                slot.db_time += time.perf_counter() - started
+
+        return submit(timed, *args)
+
+    bot.run_slot = timed_run_slot
+    bot.dispatcher.run = timed_dispatch
+    bot.outbound.send_message = timed_send_message
+    bot.state_manager._submit = timed_submit
+
+
+async def simulate_day(bot: SpanishVerbBot, tick_seconds: float):
+    """Проиграть тики суток: слоты каждого тика дорабатывают до следующего тика"""
+    day = datetime.now(pytz.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    for tick in range(24 * 60 // SLOT_TICK_MINUTES):
+        await bot.run_tick(day + timedelta(minutes=tick * SLOT_TICK_MINUTES))
+        while bot._slot_tasks:
+            await asyncio.gather(*list(bot._slot_tasks), return_exceptions=True)
+        if tick_seconds:
+            await asyncio.sleep(tick_seconds)
+
+
+async def run(args, api: FakeTelegramProcess, db_file: str):
+    bot = SpanishVerbBot(CSV_FILE, db_file)
+    populate(bot, args.users, pick_zones(args.zones))
+    if not args.no_state_cache:
+        await bot.state_manager.start()
+        await bot.state_manager.wait_loaded()
+
+    telegram = Bot(TOKEN, base_url=f'{api.url}/bot', request=HTTPXRequest(connection_pool_size=OUTBOUND_SENDERS))
+    await telegram.initialize()
+    bot.outbound = OutboundQueue(
+        telegram, senders=OUTBOUND_SENDERS,
+        global_rate=args.rate, global_burst=args.rate, chat_rate=UNLIMITED, chat_burst=UNLIMITED,
+        on_blocked=bot.mark_blocked
+    )
+    await bot.outbound.start()
+
+    metrics = defaultdict(SlotMetrics)
+    instrument(bot, metrics)
+    started = time.perf_counter()
+    await simulate_day(bot, args.tick_seconds)
+    elapsed = time.perf_counter() - started
+
+    outbound = bot.outbound.stats()
+    await bot.outbound.stop()
+    await bot.state_manager.close()
+    await telegram.shutdown()
+    return metrics, outbound, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--zones', type=int, default=1, help='число часовых поясов пользователей')
+    parser.add_argument('--rate', type=float, default=UNLIMITED, help='лимит отправки, сообщений в секунду')
+    parser.add_argument('--api-latency', type=float, default=0.0, help='задержка ответа API на отправку, с')
+    parser.add_argument('--flood-every', type=int, default=0, help='отвечать 429 на каждый N-й sendMessage')
+    parser.add_argument('--flood-retry-after', type=int, default=1, help='retry_after в ответе 429, с')
+    parser.add_argument('--blocked', type=float, default=0.0, help='доля пользователей, заблокировавших бота')
+    parser.add_argument('--no-state-cache', action='store_true', help='без кэша состояния пользователей в памяти')
+    parser.add_argument('--tick-seconds', type=float, default=0.0, help='пауза между тиками планировщика, с')
+    parser.add_argument('--max-errors', type=int, default=0, help='допустимое число ошибок отправки')
+    parser.add_argument('--json', help='сохранить отчёт в JSON')
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    api = FakeTelegramProcess()
+    api.start()
+    try:
+        api.configure(
+            record_messages=False, send_latency=args.api_latency,
+            flood_every=args.flood_every, flood_retry_after=args.flood_retry_after,
+            blocked_chats=blocked_users(args.users, args.blocked)
+        )
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            metrics, outbound, elapsed = asyncio.run(run(args, api, os.path.join(tmp_dir, 'day.db')))
+        calls = api.stats()['calls']
+    finally:
+        api.stop()
+
+    reports = {slot_name: slot.report() for slot_name, slot in metrics.items()}
+    print(f"{'slot':>12} {'users':>7} {'sent':>7} {'errors':>6} {'blocked':>7} {'time, s':>8} {'msg/s':>8} "
+          f"{'p50, ms':>8} {'p99, ms':>8} {'db, s':>7}")
+    for slot_name, report in reports.items():
+        print(
+            f"{slot_name:>12} {report['users']:>7} {report['sent']:>7} {report['errors']:>6} {report['blocked']:>7} "
+            f"{report['elapsed']:>8.2f} {report['throughput']:>8,.0f} "
+            f"{report['p50'] * 1000:>8.1f} {report['p99'] * 1000:>8.1f} {report['db_time']:>7.2f}"
+        )
+
+    sent = sum(report['sent'] for report in reports.values())
+    errors = sum(report['errors'] for report in reports.values())
+    blocked = sum(report['blocked'] for report in reports.values())
+    print(
+        f"\nDay: {sent} messages in {elapsed:.2f}s ({sent / elapsed:,.0f} msg/s), errors {errors}, "
+        f"blocked {blocked} ({calls.get('blocked', 0)} API 403 responses), "
+        f"API sendMessage calls {calls.get('sendmessage', 0)}, 429 responses {calls.get('flood', 0)}, "
+        f"flood waits {outbound['flood_waits']}, retried {outbound['retried']}"
+    )
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({
+                'args': vars(args), 'elapsed': elapsed, 'slots': reports,
+                'outbound': outbound, 'api_calls': calls,
+            }, f, indent=2)
+
+    if errors > args.max_errors:
+        print(f"Too many send errors: {errors} > {args.max_errors}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Бенчмарк HTTP-клиента Bot API: устойчивая пропускная способность
+sendMessage при разном размере пула соединений.
+
+Сообщения --seconds секунд без перерыва отправляют --senders корутин, как отправители
+OutboundQueue в слоте рассылки, в локальную заглушку Telegram Bot API в
+отдельном процессе с задержкой ответа --api-latency (сетевая задержка до
+api.telegram.org). Для каждого размера пула выводятся пропускная
+способность, перцентили задержки вызова sendMessage (с ожиданием
+свободного соединения) и число ошибок (TimedOut, если соединения не
+нашлось за --pool-timeout).
+Отдельно измеряется самый большой пул без keep-alive (keepalive_expiry=0:
+простаивающее соединение сразу считается истёкшим и открывается заново).
+
+Запуск из корня проекта:
+    python benchmarks/bench_http_pool.py
+    python benchmarks/bench_http_pool.py --pool-sizes 1 8 32 128 --senders 128 --api-latency 0.1
+"""
+import argparse
+import asyncio
+import itertools
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram import Bot  # noqa: E402
+from telegram.error import TelegramError  # noqa: E402
+
+from fake_telegram import FakeTelegramProcess, percentile  # noqa: E402
+from telegram_client import TelegramRequest  # noqa: E402
+
+TOKEN = '123456:bench'
+
+
+async def run(api: FakeTelegramProcess, pool_size: int, keepalive: float, args) -> dict:
+    request = TelegramRequest(pool_size, keepalive_expiry=keepalive, pool_timeout=args.pool_timeout)
+    telegram = Bot(TOKEN, base_url=f'{api.url}/bot', request=request)
+    await telegram.initialize()
+
+    chat_ids = itertools.count(1)
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + args.seconds
+
+    async def sender():
+        nonlocal errors
+        for chat_id in chat_ids:
+            if time.perf_counter() >= deadline:
+                return
+            started = time.perf_counter()
+            try:
+                await telegram.send_message(chat_id, text='hola')
+            except TelegramError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(sender() for _ in range(args.senders)))
+    elapsed = time.perf_counter() - started
+    await telegram.shutdown()
+    return {
+        'sent': len(latencies),
+        'errors': errors,
+        'throughput': len(latencies) / elapsed,
+        'p50': percentile(latencies, 0.5),
+        'p99': percentile(latencies, 0.99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pool-sizes', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument('--senders', type=int, default=32, help='одновременных отправителей')
+    parser.add_argument('--seconds', type=float, default=5.0, help='длительность прогона для каждого пула')
+    parser.add_argument('--api-latency', type=float, default=0.05, help='задержка ответа API на sendMessage, с')
+    parser.add_argument('--pool-timeout', type=float, default=5.0, help='ожидание свободного соединения, с')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.CRITICAL)
+
+    api = FakeTelegramProcess()
+    api.start()
+    api.configure(send_latency=args.api_latency)
+    try:
+        print(f"{'pool':>5} {'keep-alive':>10} {'sent':>6} {'errors':>6} {'msg/s':>8} {'p50, ms':>8} {'p99, ms':>8}")
+        runs = [(pool_size, 60.0) for pool_size in args.pool_sizes]
+        runs.append((max(args.pool_sizes), 0.0))
+        for pool_size, keepalive in runs:
+            result = asyncio.run(run(api, pool_size, keepalive, args))
+            print(
+                f"{pool_size:>5} {'yes' if keepalive else 'no':>10} {result['sent']:>6} {result['errors']:>6} "
+                f"{result['throughput']:>8.0f} {result['p50'] * 1000:>8.1f} {result['p99'] * 1000:>8.1f}"
+            )
+    finally:
+        api.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Бенчмарк накладных расходов метрик: время горячих вызовов с выключенными
+(по умолчанию) и включёнными метриками.
+
+Запуск из корня проекта:
+    python benchmarks/bench_metrics.py
+    python benchmarks/bench_metrics.py --calls 1000000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_loader import VerbDataLoader  # noqa: E402
+from metrics import REGISTRY, enable_metrics, timed  # noqa: E402
+
+CSV_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'verbs.csv')
+
+BENCH_SECONDS = REGISTRY.histogram('bench_seconds', 'Benchmark coroutine latency', ['kind'])
+
+
+async def noop():
+    pass
+
+
+@timed(BENCH_SECONDS, 'noop')
+async def timed_noop():
+    pass
+
+
+def per_call_ns(func, calls: int) -> float:
+    started = time.perf_counter()
+    func(calls)
+    return (time.perf_counter() - started) / calls * 1e9
+
+
+def measure(loader: VerbDataLoader, calls: int):
+    infinitivo = loader.get_all_verbs()[0].infinitivo
+
+    def lookups(n):
+        get = loader.get_verb_by_infinitivo
+        for _ in range(n):
+            get(infinitivo)
+
+    def raw_lookups(n):
+        get = loader._by_infinitivo.get
+        for _ in range(n):
+            get(infinitivo)
+
+    def coroutines(coroutine):
+        def run(n):
+            async def loop():
+                for _ in range(n):
+                    await coroutine()
+            asyncio.run(loop())
+        return run
+
+    return {
+        'dict lookup (no instrumentation)': per_call_ns(raw_lookups, calls),
+        'get_verb_by_infinitivo': per_call_ns(lookups, calls),
+        'plain coroutine': per_call_ns(coroutines(noop), calls),
+        '@timed coroutine': per_call_ns(coroutines(timed_noop), calls),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=300000)
+    args = parser.parse_args()
+
+    loader = VerbDataLoader(CSV_FILE)
+    disabled = measure(loader, args.calls)
+    enable_metrics()
+    enabled = measure(loader, args.calls)
+
+    print(f"{'call':>34} {'disabled, ns':>13} {'enabled, ns':>12}")
+    for name in disabled:
+        print(f"{name:>34} {disabled[name]:>13.0f} {enabled[name]:>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
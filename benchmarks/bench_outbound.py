@@ -0,0 +1,89 @@
+"""
+Бенчмарк очереди исходящих сообщений: время разгрузки слота на N пользователей
+при глобальном лимите Telegram и периодических ответах RetryAfter.
+
+Отправка эмулируется фейковым ботом с задержкой сети, который отвечает
+RetryAfter при превышении лимита частоты, а также на каждый N-й запрос.
+
+Запуск из корня проекта:
+    python benchmarks/bench_outbound.py
+    python benchmarks/bench_outbound.py --users 300 3000 --senders 16 --latency 0.1
+"""
+import argparse
+import asyncio
+import collections
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram.error import RetryAfter  # noqa: E402
+
+from outbound import OutboundQueue  # noqa: E402
+
+
+class FakeBot:
+    """Бот с сетевой задержкой, лимитом частоты и периодическими ответами RetryAfter"""
+
+    def __init__(self, latency: float, limit: int, flood_every: int):
+        self.latency = latency
+        self.limit = limit
+        self.flood_every = flood_every
+        self.tokens = float(limit)
+        self.updated = time.monotonic()
+        self.requests = 0
+        self.delivered = collections.Counter()
+
+    async def send_message(self, chat_id: int, **kwargs):
+        await asyncio.sleep(self.latency)
+        self.requests += 1
+        now = time.monotonic()
+        self.tokens = min(self.limit, self.tokens + (now - self.updated) * self.limit)
+        self.updated = now
+        if self.tokens < 1 or (self.flood_every and self.requests % self.flood_every == 0):
+            raise RetryAfter(1)
+        self.tokens -= 1
+        self.delivered[chat_id] += 1
+        return chat_id
+
+
+async def run_slot(users: int, senders: int, latency: float, rate: float, limit: int, flood_every: int):
+    bot = FakeBot(latency, limit, flood_every)
+    queue = OutboundQueue(bot, senders=senders, global_rate=rate)
+    await queue.start()
+
+    started = time.monotonic()
+    await asyncio.gather(*(queue.send_message(user_id, text='hola') for user_id in range(users)))
+    drain_time = await queue.drain()
+    elapsed = time.monotonic() - started
+    stats = queue.stats()
+    await queue.stop()
+
+    dropped = users - len(bot.delivered)
+    return elapsed, drain_time, stats, dropped
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, nargs='+', default=[30, 300, 1500])
+    parser.add_argument('--senders', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.05, help='задержка одного запроса, с')
+    parser.add_argument('--rate', type=float, default=30.0, help='лимит очереди, сообщений в секунду')
+    parser.add_argument('--server-limit', type=int, default=30, help='лимит фейкового сервера в секунду')
+    parser.add_argument('--flood-every', type=int, default=250, help='отвечать RetryAfter на каждый N-й запрос')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    print(f"{'users':>7} {'N/30, s':>8} {'drain, s':>9} {'max depth':>10} {'retried':>8} {'flood':>6} {'dropped':>8}")
+    for users in args.users:
+        elapsed, drain_time, stats, dropped = asyncio.run(
+            run_slot(users, args.senders, args.latency, args.rate, args.server_limit, args.flood_every)
+        )
+        print(f"{users:>7} {users / 30:>8.1f} {drain_time:>9.1f} {stats['max_depth']:>10} "
+              f"{stats['retried']:>8} {stats['flood_waits']:>6} {dropped:>8}")
+
+
+if __name__ == '__main__':
+    main()
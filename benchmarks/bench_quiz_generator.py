@@ -0,0 +1,83 @@
+"""
+Бенчмарк генерации квизов: пропускная способность прежней схемы
+(новый список кандидатов на каждый квиз) и предвычисленных пулов
+с пакетной генерацией.
+
+Запуск из корня проекта:
+    python benchmarks/bench_quiz_generator.py
+    python benchmarks/bench_quiz_generator.py --users 100000 --synthetic 10000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_loader import VerbDataLoader  # noqa: E402
+from quiz_generator import QuizGenerator  # noqa: E402
+from bench_data_loader import CSV_FILE, write_synthetic_csv  # noqa: E402
+
+
+def legacy_translation_quiz(verbs, verb):
+    """Прежний квиз №1: список всех переводов строится заново"""
+    correct = verb.translation_ru
+    available = [v.translation_ru for v in verbs if v.translation_ru != correct]
+    options = [correct] + random.sample(available, min(3, len(available)))
+    random.shuffle(options)
+    return options
+
+
+def legacy_infinitivo_quiz(verbs, verb):
+    """Прежний квиз №2: список всех инфинитивов строится заново"""
+    correct = verb.infinitivo
+    available = [v.infinitivo for v in verbs if v.infinitivo != correct]
+    options = [correct] + random.sample(available, min(3, len(available)))
+    random.shuffle(options)
+    return options
+
+
+def measure(csv_file: str, users: int):
+    loader = VerbDataLoader(csv_file)
+    verbs = loader.get_all_verbs()
+    rng = random.Random(42)
+    assigned = [verbs[rng.randrange(len(verbs))] for _ in range(users)]
+
+    started = time.perf_counter()
+    for verb in assigned:
+        legacy_translation_quiz(verbs, verb)
+        legacy_infinitivo_quiz(verbs, verb)
+    legacy = 2 * users / (time.perf_counter() - started)
+
+    started = time.perf_counter()
+    generator = QuizGenerator(loader)
+    build_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    generator.generate_translation_quizzes(assigned)
+    generator.generate_infinitivo_quizzes(assigned)
+    batched = 2 * users / (time.perf_counter() - started)
+
+    return len(verbs), legacy, build_time, batched
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=20000, help='пользователей в слоте')
+    parser.add_argument('--synthetic', type=int, default=10000, help='размер синтетического набора')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        synthetic = os.path.join(tmp_dir, 'verbs_synthetic.csv')
+        write_synthetic_csv(synthetic, args.synthetic)
+
+        print(f"{'verbs':>7} {'legacy, quiz/s':>15} {'pools build, ms':>16} {'batched, quiz/s':>16}")
+        for csv_file in (CSV_FILE, synthetic):
+            verbs, legacy, build_time, batched = measure(csv_file, args.users)
+            print(f"{verbs:>7} {legacy:>15,.0f} {build_time * 1000:>16.1f} {batched:>16,.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Бенчмарк статистики квизов: запись ответов в журнал с обновлением
+агрегатов и задержка чтения /stats и отчёта администратора.
+
+Ответы записываются пакетами --batch, как их пишет QuizResultLog
+(одна транзакция на пакет: строки журнала и агрегаты пользователей,
+глаголов и итогов). После записи --answers ответов измеряются чтение
+статистики пользователя и сводки из агрегатов и, для сравнения, те же
+величины, посчитанные по журналу (полный просмотр таблицы).
+
+Запуск из корня проекта:
+    python benchmarks/bench_quiz_results.py
+    python benchmarks/bench_quiz_results.py --answers 1000000 --users 10000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from state_manager import StateManager  # noqa: E402
+
+
+def answers(count: int, users: int, verbs: int, batch: int):
+    """Пакеты синтетических ответов в порядке времени"""
+    rng = random.Random(42)
+    names = [f'verb{verb:05d}' for verb in range(verbs)]
+    started = datetime(2026, 1, 1)
+    for start in range(0, count, batch):
+        answered_at = (started + timedelta(seconds=start)).isoformat()
+        size = min(batch, count - start)
+        yield [
+            (user_id, name, 'quiz1', correct < 0.7, answered_at)
+            for user_id, name, correct in zip(
+                rng.choices(range(1, users + 1), k=size), rng.choices(names, k=size), [rng.random() for _ in range(size)]
+            )
+        ]
+
+
+def latencies_ms(func, calls) -> list:
+    times = []
+    for args in calls:
+        started = time.perf_counter()
+        func(*args)
+        times.append((time.perf_counter() - started) * 1000)
+    return sorted(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--answers', type=int, default=10_000_000)
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--verbs', type=int, default=300)
+    parser.add_argument('--batch', type=int, default=500, help='ответов в одной транзакции')
+    parser.add_argument('--queries', type=int, default=2000, help='запросов /stats')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_file = os.path.join(tmp_dir, 'results.db')
+        state_manager = StateManager(db_file)
+
+        batch_times = []
+        started = time.perf_counter()
+        for batch in answers(args.answers, args.users, args.verbs, args.batch):
+            batch_started = time.perf_counter()
+            state_manager.record_quiz_results(batch)
+            batch_times.append(time.perf_counter() - batch_started)
+        elapsed = time.perf_counter() - started
+        print(
+            f"Ingest: {args.answers:,} answers in {elapsed:.1f}s ({args.answers / sum(batch_times):,.0f} answers/s "
+            f"in transactions), batch of {args.batch}: p50 {statistics.median(batch_times) * 1000:.2f} ms, "
+            f"DB size {os.path.getsize(db_file) / 2 ** 20:.0f} MB"
+        )
+
+        rng = random.Random(7)
+        user_ids = [(rng.randint(1, args.users),) for _ in range(args.queries)]
+        times = latencies_ms(state_manager.get_user_quiz_stats, user_ids)
+        print(f"/stats (aggregates): p50 {statistics.median(times):.3f} ms, p99 {times[int(len(times) * 0.99)]:.3f} ms")
+        times = latencies_ms(state_manager.get_quiz_report, [()] * 100)
+        print(f"Report (aggregates): p50 {statistics.median(times):.3f} ms")
+
+        with state_manager._get_connection() as conn:
+            def user_scan(user_id: int):
+                conn.execute(
+                    'SELECT COUNT(*), SUM(is_correct) FROM quiz_results WHERE user_id = ?', (user_id,)
+                ).fetchone()
+
+            def report_scan():
+                conn.execute(
+                    'SELECT infinitivo, COUNT(*), SUM(is_correct) FROM quiz_results GROUP BY infinitivo'
+                ).fetchall()
+
+            times = latencies_ms(user_scan, user_ids[:3])
+            print(f"/stats (scan of the log): p50 {statistics.median(times):.0f} ms")
+            times = latencies_ms(report_scan, [()])
+            print(f"Report (scan of the log): {times[0]:.0f} ms")
+        state_manager.close()
+
+
+if __name__ == '__main__':
+    main()
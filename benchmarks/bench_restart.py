@@ -0,0 +1,77 @@
+"""
+Бенчмарк перезапуска: время от создания бота до готовности (post_init)
+в зависимости от числа пользователей. Пропущенные за сегодня слоты
+досылаются в фоне и во время готовности не входят.
+
+Запуск из корня проекта:
+    python benchmarks/bench_restart.py
+    python benchmarks/bench_restart.py --users 1000 100000
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot import SpanishVerbBot  # noqa: E402
+from state_manager import StateManager  # noqa: E402
+
+CSV_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'verbs.csv')
+
+
+class FakeBot:
+    """Заглушка Telegram Bot API: сообщения догоняющей рассылки никуда не уходят"""
+
+    async def send_message(self, chat_id, **kwargs):
+        return None
+
+
+def populate(db_file: str, users: int):
+    """Создать БД с заданным количеством пользователей"""
+    state_manager = StateManager(db_file)
+    today = datetime.now().date().isoformat()
+    with state_manager._get_connection() as conn:
+        conn.executemany(
+            'INSERT OR IGNORE INTO users (user_id, created_at, last_interaction) VALUES (?, ?, ?)',
+            ((user_id, '2024-01-01T00:00:00', today) for user_id in range(1, users + 1))
+        )
+    state_manager.close()
+
+
+async def restart(db_file: str):
+    """Создать бота поверх существующей БД и дождаться готовности"""
+    started = time.perf_counter()
+    bot = SpanishVerbBot(CSV_FILE, db_file)
+    application = SimpleNamespace(bot=FakeBot())
+    await bot.post_init(application)
+    ready = time.perf_counter() - started
+    jobs = len(bot.scheduler.get_jobs())
+    await bot.post_shutdown(application)
+    return ready, jobs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--runs', type=int, default=3, help='перезапусков на каждый размер')
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    print(f"{'users':>8} {'jobs':>6} {'ready, ms':>10}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for users in args.users:
+            db_file = os.path.join(tmp_dir, f'restart_{users}.db')
+            populate(db_file, users)
+            results = [asyncio.run(restart(db_file)) for _ in range(args.runs)]
+            ready = min(result[0] for result in results)
+            print(f"{users:>8} {results[0][1]:>6} {ready * 1000:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
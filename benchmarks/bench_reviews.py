@@ -0,0 +1,148 @@
+"""
+Бенчмарк интервальных повторений: выбор глаголов дня для всех
+пользователей в 09:00 и запись ответов на квизы.
+
+База заполняется синтетической историей: у каждого пользователя
+--verbs повторённых глаголов со случайными датами повторения. Выбор
+глаголов дня идёт страницами по DISPATCH_BATCH_SIZE пользователей, как
+в слоте: один запрос get_due_verbs по индексу (user_id, due) на страницу.
+Для сравнения измеряется прежний подход - чтение всей истории каждого
+пользователя и выбор самого просроченного глагола в Python (на выборке
+пользователей, время пересчитано на всех).
+
+Запуск из корня проекта:
+    python benchmarks/bench_reviews.py
+    python benchmarks/bench_reviews.py --users 10000 --verbs 300
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot import DISPATCH_BATCH_SIZE  # noqa: E402
+from state_manager import StateManager  # noqa: E402
+
+
+def populate(state_manager: StateManager, users: int, verbs: int, today: date):
+    """Синтетическая история: даты повторения от 30 дней назад до 60 дней вперёд"""
+    rng = random.Random(42)
+    days = [(today + timedelta(days=offset)).isoformat() for offset in range(-30, 61)]
+    last_review = (today - timedelta(days=1)).isoformat()
+    names = [f'verb{verb:05d}' for verb in range(verbs)]
+
+    def rows():
+        for user_id in range(1, users + 1):
+            for name, due in zip(names, rng.choices(days, k=verbs)):
+                yield user_id, name, 2.5, 6, 2, due, last_review, 2, 0
+
+    with state_manager._get_connection() as conn:
+        conn.executemany(
+            'INSERT INTO users (user_id, created_at, last_interaction) VALUES (?, ?, ?)',
+            ((user_id, '2024-01-01T00:00:00', today.isoformat()) for user_id in range(1, users + 1))
+        )
+        conn.executemany(
+            '''
+            INSERT INTO verb_reviews
+            (user_id, infinitivo, ease, interval, repetitions, due, last_review, reviews, lapses)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''',
+            rows()
+        )
+
+
+def select_due_paged(state_manager: StateManager, users: int, today: str):
+    """Выбор глаголов для всех пользователей страницами, как в слоте 09:00"""
+    page_times = []
+    due = 0
+    for start in range(1, users + 1, DISPATCH_BATCH_SIZE):
+        user_ids = list(range(start, min(start + DISPATCH_BATCH_SIZE, users + 1)))
+        started = time.perf_counter()
+        due += len(state_manager.get_due_verbs(user_ids, today))
+        page_times.append(time.perf_counter() - started)
+    return due, page_times
+
+
+def select_due_scan(state_manager: StateManager, user_ids, today: str) -> float:
+    """Прежний подход: вся история пользователя, выбор в Python"""
+    started = time.perf_counter()
+    with state_manager._get_connection() as conn:
+        for user_id in user_ids:
+            history = conn.execute(
+                'SELECT infinitivo, due FROM verb_reviews WHERE user_id = ?', (user_id,)
+            ).fetchall()
+            overdue = [(due, infinitivo) for infinitivo, due in history if due <= today]
+            min(overdue, default=None)
+    return time.perf_counter() - started
+
+
+def measure_reviews(state_manager: StateManager, users: int, verbs: int, count: int, today: str):
+    """Задержки record_review в микросекундах"""
+    rng = random.Random(7)
+    latencies = []
+    for _ in range(count):
+        user_id = rng.randint(1, users)
+        infinitivo = f'verb{rng.randrange(verbs + 50):05d}'  # часть глаголов - новые
+        started = time.perf_counter()
+        state_manager.record_review(user_id, infinitivo, rng.random() < 0.8, today)
+        latencies.append((time.perf_counter() - started) * 1e6)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--verbs', type=int, default=300, help='повторённых глаголов у пользователя')
+    parser.add_argument('--scan-sample', type=int, default=2000, help='пользователей для прежнего подхода')
+    parser.add_argument('--reviews', type=int, default=5000, help='записей ответов')
+    args = parser.parse_args()
+
+    today = date.today()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_file = os.path.join(tmp_dir, 'reviews.db')
+        state_manager = StateManager(db_file)
+
+        started = time.perf_counter()
+        populate(state_manager, args.users, args.verbs, today)
+        print(f"Populated {args.users * args.verbs:,} reviews in {time.perf_counter() - started:.1f}s, "
+              f"DB size {os.path.getsize(db_file) / 2 ** 20:.0f} MB")
+
+        with state_manager._get_connection() as conn:
+            plan = conn.execute(
+                '''
+                EXPLAIN QUERY PLAN SELECT u.user_id, (
+                    SELECT r.infinitivo FROM verb_reviews r
+                    WHERE r.user_id = u.user_id AND r.due <= ? ORDER BY r.due LIMIT 1
+                )
+                FROM users u WHERE u.user_id IN (1, 2, 3)
+                ''',
+                (today.isoformat(),)
+            ).fetchall()
+        print(f"Query plan: {'; '.join(row[-1] for row in plan)}")
+
+        due, page_times = select_due_paged(state_manager, args.users, today.isoformat())
+        total = sum(page_times)
+        print(
+            f"09:00 selection (indexed): {total:.2f}s for {args.users} users, {due} with due verbs, "
+            f"{len(page_times)} pages, p50 {statistics.median(page_times) * 1000:.1f} ms/page"
+        )
+
+        sample = random.Random(1).sample(range(1, args.users + 1), min(args.scan_sample, args.users))
+        scan = select_due_scan(state_manager, sample, today.isoformat()) / len(sample) * args.users
+        print(f"09:00 selection (per-user scan, extrapolated): {scan:.2f}s ({scan / total:.1f}x slower)")
+
+        latencies = sorted(measure_reviews(state_manager, args.users, args.verbs, args.reviews, today.isoformat()))
+        print(
+            f"record_review: p50 {statistics.median(latencies):.0f} us, "
+            f"p99 {latencies[int(len(latencies) * 0.99)]:.0f} us"
+        )
+        state_manager.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Бенчмарк регистрации расписания: время старта и память планировщика
+для прежней схемы (14 задач на пользователя) и для схемы со слотами.
+
+Запуск из корня проекта:
+    python benchmarks/bench_scheduler.py
+    python benchmarks/bench_scheduler.py --users 1000 10000 --legacy-max 10000
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from apscheduler.triggers.cron import CronTrigger  # noqa: E402
+
+from bot import SpanishVerbBot, TIMEZONE, TENSE_HOURS  # noqa: E402
+
+CSV_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'verbs.csv')
+
+
+def create_bot(tmp_dir: str, users: int) -> SpanishVerbBot:
+    """Создать бота с временной БД и заданным количеством пользователей"""
+    bot = SpanishVerbBot(CSV_FILE, os.path.join(tmp_dir, f'bench_{users}.db'))
+    today = datetime.now().date().isoformat()
+    with bot.state_manager.state_manager._get_connection() as conn:
+        conn.executemany(
+            'INSERT OR IGNORE INTO users (user_id, created_at, last_interaction) VALUES (?, ?, ?)',
+            ((user_id, '2024-01-01T00:00:00', today) for user_id in range(1, users + 1))
+        )
+    return bot
+
+
+def schedule_legacy(bot: SpanishVerbBot):
+    """Прежняя схема: отдельные CronTrigger-задачи на каждого пользователя"""
+    for user_id in bot.state_manager.state_manager.get_all_users():
+        bot.scheduler.add_job(bot.send_verb_of_the_day, CronTrigger(hour=9, minute=0, timezone=TIMEZONE),
+                              args=[user_id], id=f"verb_of_day_{user_id}", replace_existing=True)
+        bot.scheduler.add_job(bot.send_quiz_1, CronTrigger(hour=10, minute=0, timezone=TIMEZONE),
+                              args=[user_id], id=f"quiz1_{user_id}", replace_existing=True)
+        bot.scheduler.add_job(bot.send_quiz_2, CronTrigger(hour=11, minute=0, timezone=TIMEZONE),
+                              args=[user_id], id=f"quiz2_{user_id}", replace_existing=True)
+        for hour in TENSE_HOURS:
+            bot.scheduler.add_job(bot.send_next_tense, CronTrigger(hour=hour, minute=0, timezone=TIMEZONE),
+                                  args=[user_id], id=f"tense_{user_id}_{hour}", replace_existing=True)
+
+
+async def start_scheduler(bot: SpanishVerbBot, legacy: bool, trace_memory: bool):
+    """
+    Зарегистрировать задачи и запустить планировщик.
+    Возвращает время старта, число задач и объём памяти, занятой задачами.
+    """
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    if legacy:
+        schedule_legacy(bot)
+    else:
+        bot.schedule_jobs()
+    bot.scheduler.start(paused=True)
+    elapsed = time.perf_counter() - started
+    memory = 0
+    if trace_memory:
+        memory, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    jobs = len(bot.scheduler.get_jobs())
+    bot.scheduler.shutdown(wait=False)
+    return elapsed, jobs, memory
+
+
+async def dispatch_slot(bot: SpanishVerbBot) -> float:
+    """Прогнать один слот по всем пользователям с пустым обработчиком"""
+    async def noop(user_ids):
+        pass
+
+    started = time.perf_counter()
+    await bot.dispatcher.run('bench', noop)
+    return time.perf_counter() - started
+
+
+def measure(tmp_dir: str, users: int, legacy: bool):
+    """Время меряется без tracemalloc, память - отдельным прогоном"""
+    bot = create_bot(tmp_dir, users)
+    elapsed, jobs, _ = asyncio.run(start_scheduler(bot, legacy, trace_memory=False))
+    dispatch = None
+    if not legacy:
+        dispatch = asyncio.run(dispatch_slot(bot))
+
+    bot = create_bot(tmp_dir, users)
+    _, _, memory = asyncio.run(start_scheduler(bot, legacy, trace_memory=True))
+    return elapsed, memory, jobs, dispatch
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--legacy-max', type=int, default=1000,
+                        help='не запускать прежнюю схему для большего числа пользователей')
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    print(f"{'users':>8} {'mode':>7} {'jobs':>9} {'startup, s':>11} {'memory, MB':>11} {'slot, s':>8}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for users in args.users:
+            modes = ['slots'] + (['legacy'] if users <= args.legacy_max else [])
+            for mode in modes:
+                elapsed, memory, jobs, dispatch = measure(tmp_dir, users, mode == 'legacy')
+                slot = f"{dispatch:8.2f}" if dispatch is not None else f"{'-':>8}"
+                print(f"{users:>8} {mode:>7} {jobs:>9} {elapsed:>11.3f} {memory / 1024 / 1024:>11.2f} {slot}")
+
+
+if __name__ == '__main__':
+    main()
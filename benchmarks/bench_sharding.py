@@ -0,0 +1,125 @@
+"""
+Бенчмарк шардирования: пропускная способность рассылки слота (квиз №1)
+при разном числе процессов-шардов. Сообщения уходят в локальную заглушку
+Telegram Bot API без ограничения частоты, поэтому измеряется собственная
+производительность бота: генерация квизов, запись сессий и HTTP-запросы.
+Масштабирование ограничено числом ядер процессора.
+
+Запуск из корня проекта:
+    python benchmarks/bench_sharding.py
+    python benchmarks/bench_sharding.py --users 50000 --shards 1 2 4 8
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot import OUTBOUND_SENDERS, SpanishVerbBot  # noqa: E402
+from fake_telegram import FakeTelegramProcess  # noqa: E402
+from outbound import OutboundQueue  # noqa: E402
+from sharding import ShardWorker  # noqa: E402
+from state_manager import StateManager  # noqa: E402
+
+CSV_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'verbs.csv')
+TOKEN = '123456:bench'
+UNLIMITED = 1e9
+
+
+def populate(db_file: str, users: int):
+    """Пользователи с глаголом дня на сегодня"""
+    bot = SpanishVerbBot(CSV_FILE, db_file)
+    state_manager: StateManager = bot.state_manager.state_manager
+    today = datetime.now().date().isoformat()
+    with state_manager._get_connection() as conn:
+        conn.executemany(
+            'INSERT OR IGNORE INTO users (user_id, created_at, last_interaction) VALUES (?, ?, ?)',
+            ((user_id, '2024-01-01T00:00:00', today) for user_id in range(1, users + 1))
+        )
+    state_manager.set_verbs_of_the_day(
+        (user_id, bot.data_loader.get_random_verb().infinitivo) for user_id in range(1, users + 1)
+    )
+    state_manager.close()
+
+
+def bench_shard(index: int, count: int, db_file: str, base_url: str, barrier, results):
+    """Процесс-шард: дождаться остальных и разослать квиз своим пользователям"""
+    logging.getLogger().setLevel(logging.WARNING)
+
+    async def main():
+        worker = ShardWorker(index, count, CSV_FILE, db_file, TOKEN, base_url)
+        await worker.telegram.initialize()
+        bot = worker.bot
+        bot.outbound = OutboundQueue(
+            worker.telegram, senders=OUTBOUND_SENDERS,
+            global_rate=UNLIMITED, global_burst=UNLIMITED, chat_rate=UNLIMITED, chat_burst=UNLIMITED
+        )
+        await bot.outbound.start()
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, barrier.wait)
+        started = time.perf_counter()
+        await bot.run_slot('quiz1', bot.send_quiz_1_batch)
+        elapsed = time.perf_counter() - started
+        results.put((bot.outbound.stats()['sent'], elapsed))
+
+        await bot.outbound.stop()
+        await bot.state_manager.close()
+        await worker.telegram.shutdown()
+
+    asyncio.run(main())
+
+
+def measure(tmp_dir: str, users: int, shards: int):
+    db_file = os.path.join(tmp_dir, f'shards_{shards}.db')
+    populate(db_file, users)
+
+    api = FakeTelegramProcess()
+    api.start()
+    context = multiprocessing.get_context('spawn')
+    barrier = context.Barrier(shards)
+    results = context.Queue()
+    processes = [
+        context.Process(target=bench_shard, args=(index, shards, db_file, f'{api.url}/bot', barrier, results))
+        for index in range(shards)
+    ]
+    try:
+        for process in processes:
+            process.start()
+        shard_results = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+    finally:
+        api.stop()
+
+    sent = sum(result[0] for result in shard_results)
+    elapsed = max(result[1] for result in shard_results)
+    return sent, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--shards', type=int, nargs='+', default=[1, 2, 4])
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    print(f"CPU cores: {os.cpu_count()}")
+    print(f"{'shards':>7} {'sent':>8} {'slot, s':>8} {'msg/s':>9} {'speedup':>8}")
+    baseline = None
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for shards in args.shards:
+            sent, elapsed = measure(tmp_dir, args.users, shards)
+            throughput = sent / elapsed
+            baseline = baseline or throughput
+            print(f"{shards:>7} {sent:>8} {elapsed:>8.2f} {throughput:>9,.0f} {throughput / baseline:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
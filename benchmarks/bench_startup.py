@@ -0,0 +1,99 @@
+"""
+Бенчмарк старта VerbDataLoader: разбор CSV при каждом старте (прежняя
+схема) против скомпилированного набора, открываемого через mmap.
+
+Для каждого набора (текущий verbs.csv и синтетический на 10k глаголов)
+измеряются: разбор CSV с созданием всех записей, первый старт (компиляция
+в .bin), повторный старт (файл уже собран), повторный старт с первой
+сотней поисков и полная загрузка всех записей (её делает, например,
+построение пулов вариантов ответа при первом квизе).
+
+Запуск из корня проекта:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --synthetic 50000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_data_loader import write_synthetic_csv  # noqa: E402
+from data_loader import Verb, VerbDataLoader  # noqa: E402
+from verb_dataset import read_csv  # noqa: E402
+
+CSV_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'verbs.csv')
+
+
+def parse_csv(csv_file: str, compiled_file: str):
+    """Прежний старт: разбор CSV и создание записей всех глаголов"""
+    tenses, records = read_csv(csv_file)
+    verbs = [Verb(verb_id, *record) for verb_id, record in enumerate(records)]
+    return {verb.infinitivo: verb for verb in reversed(verbs)}
+
+
+def cold_start(csv_file: str, compiled_file: str):
+    if os.path.exists(compiled_file):
+        os.unlink(compiled_file)
+    return VerbDataLoader(csv_file, compiled_file)
+
+
+def warm_start(csv_file: str, compiled_file: str):
+    return VerbDataLoader(csv_file, compiled_file)
+
+
+def warm_start_lookups(names):
+    def run(csv_file: str, compiled_file: str):
+        loader = VerbDataLoader(csv_file, compiled_file)
+        for name in names:
+            loader.get_verb_by_infinitivo(name)
+        return loader
+    return run
+
+
+def full_load(csv_file: str, compiled_file: str):
+    loader = VerbDataLoader(csv_file, compiled_file)
+    return loader.get_all_verbs()
+
+
+def median_ms(func, csv_file: str, compiled_file: str, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(csv_file, compiled_file)
+        times.append(time.perf_counter() - started)
+    return statistics.median(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--synthetic', type=int, default=10000, help='размер синтетического набора')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        synthetic = os.path.join(tmp_dir, 'verbs_synthetic.csv')
+        write_synthetic_csv(synthetic, args.synthetic)
+
+        print(f"{'dataset':>12} {'start':>22} {'time, ms':>9}")
+        for name, csv_file in (('verbs.csv', CSV_FILE), (f'{args.synthetic} verbs', synthetic)):
+            compiled_file = os.path.join(tmp_dir, f'{os.path.basename(csv_file)}.bin')
+            _, records = read_csv(csv_file)
+            names = [record[1] for record in random.Random(42).sample(records, min(100, len(records)))]
+            for label, func in (
+                ('parse CSV (legacy)', parse_csv),
+                ('cold: compile .bin', cold_start),
+                ('warm: mmap .bin', warm_start),
+                ('warm + 100 lookups', warm_start_lookups(names)),
+                ('warm + all records', full_load),
+            ):
+                print(f"{name:>12} {label:>22} {median_ms(func, csv_file, compiled_file, args.repeat):>9.2f}")
+            print(f"{'':>12} {'.bin size, KB':>22} {os.path.getsize(compiled_file) / 1024:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
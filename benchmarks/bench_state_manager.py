@@ -0,0 +1,98 @@
+"""
+Микробенчмарк StateManager: задержка одной операции для прежней схемы
+(новое соединение и PRAGMA на каждый вызов) и для долгоживущего соединения.
+
+Запуск из корня проекта:
+    python benchmarks/bench_state_manager.py
+    python benchmarks/bench_state_manager.py --users 10000 --ops 20000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from state_manager import StateManager  # noqa: E402
+
+
+class LegacyStateManager(StateManager):
+    """StateManager с прежним соединением на каждый вызов"""
+
+    @contextmanager
+    def _get_connection(self):
+        conn = sqlite3.connect(self.db_file, timeout=10.0)
+        conn.execute('PRAGMA journal_mode=WAL')
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+
+OPERATIONS = [
+    ('user_exists', lambda sm, user_id: sm.user_exists(user_id)),
+    ('get_current_verb', lambda sm, user_id: sm.get_current_verb(user_id)),
+    ('get_sent_tenses', lambda sm, user_id: sm.get_sent_tenses(user_id)),
+    ('mark_tense_sent', lambda sm, user_id: sm.mark_tense_sent(user_id, 'Presente')),
+    ('set_verb_of_the_day', lambda sm, user_id: sm.set_verb_of_the_day(user_id, 'hablar')),
+]
+
+
+def populate(state_manager: StateManager, users: int):
+    today = datetime.now().date().isoformat()
+    with state_manager._get_connection() as conn:
+        conn.executemany(
+            'INSERT OR IGNORE INTO users (user_id, created_at, last_interaction) VALUES (?, ?, ?)',
+            ((user_id, '2024-01-01T00:00:00', today) for user_id in range(1, users + 1))
+        )
+
+
+def measure(state_manager: StateManager, operation, users: int, ops: int):
+    """Вернуть задержки одной операции в микросекундах"""
+    rng = random.Random(42)
+    latencies = []
+    for _ in range(ops):
+        user_id = rng.randint(1, users)
+        started = time.perf_counter()
+        operation(state_manager, user_id)
+        latencies.append((time.perf_counter() - started) * 1e6)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--ops', type=int, default=2000, help='операций каждого типа')
+    args = parser.parse_args()
+
+    print(f"{'operation':>20} {'legacy p50, us':>15} {'pooled p50, us':>15} {'legacy p99, us':>15} {'pooled p99, us':>15}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        legacy = LegacyStateManager(os.path.join(tmp_dir, 'legacy.db'))
+        pooled = StateManager(os.path.join(tmp_dir, 'pooled.db'))
+        populate(legacy, args.users)
+        populate(pooled, args.users)
+
+        for name, operation in OPERATIONS:
+            results = []
+            for state_manager in (legacy, pooled):
+                latencies = measure(state_manager, operation, args.users, args.ops)
+                results.append((statistics.median(latencies), statistics.quantiles(latencies, n=100)[98]))
+            print(f"{name:>20} {results[0][0]:>15.1f} {results[1][0]:>15.1f} "
+                  f"{results[0][1]:>15.1f} {results[1][1]:>15.1f}")
+
+        legacy.close()
+        pooled.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Бенчмарк расписания по часовым поясам: время тика планировщика и пиковая
+нагрузка, когда пользователи распределены по нескольким поясам.
+
+Тик группирует пояса по смещению от UTC, поэтому его время зависит от
+числа поясов, а не от числа пользователей. Пиковая нагрузка - наибольшее
+число получателей одного тика за сутки (всех слотов тика и одного слота;
+при одном поясе это вся база).
+
+Запуск из корня проекта:
+    python benchmarks/bench_timezones.py
+    python benchmarks/bench_timezones.py --users 100000 --zones 1 4 16 64
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot import SLOT_TICK_MINUTES, SpanishVerbBot  # noqa: E402
+
+CSV_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'verbs.csv')
+
+
+def pick_zones(count: int):
+    """count поясов с разными смещениями от UTC"""
+    zones, offsets = [], set()
+    day = datetime(2024, 1, 15, tzinfo=pytz.utc)
+    for name in pytz.common_timezones:
+        offset = day.astimezone(pytz.timezone(name)).utcoffset()
+        if offset not in offsets:
+            offsets.add(offset)
+            zones.append(name)
+    # Поясов с разными смещениями около 40, остальные делят смещение с уже выбранными
+    zones.extend(name for name in pytz.common_timezones if name not in zones)
+    return zones[:count]
+
+
+def create_bot(tmp_dir: str, users: int, zones) -> SpanishVerbBot:
+    bot = SpanishVerbBot(CSV_FILE, os.path.join(tmp_dir, f'bench_{users}_{len(zones)}.db'))
+    today = datetime.now().date().isoformat()
+    with bot.state_manager.state_manager._get_connection() as conn:
+        conn.executemany(
+            'INSERT OR IGNORE INTO users (user_id, created_at, timezone, last_interaction) VALUES (?, ?, ?, ?)',
+            (
+                (user_id, '2024-01-01T00:00:00', zones[user_id % len(zones)], today)
+                for user_id in range(1, users + 1)
+            )
+        )
+        conn.executemany('INSERT OR IGNORE INTO timezones (timezone) VALUES (?)', ((zone,) for zone in zones))
+    return bot
+
+
+async def measure(bot: SpanishVerbBot, zones):
+    """Среднее время тика без рассылки и пиковое число получателей тика и слота в тике за сутки"""
+    started_slots = []
+    bot._start_slot = lambda slot_name, handler, timezone: started_slots.append((slot_name, timezone))
+
+    with bot.state_manager.state_manager._get_connection() as conn:
+        users_by_zone = Counter(dict(conn.execute('SELECT timezone, COUNT(*) FROM users GROUP BY timezone')))
+
+    day = datetime(2024, 1, 15, tzinfo=pytz.utc)
+    ticks = 24 * 60 // SLOT_TICK_MINUTES
+    peak = slot_peak = 0
+    elapsed = 0.0
+    for tick in range(ticks):
+        started_slots.clear()
+        started = time.perf_counter()
+        await bot.run_tick(day + timedelta(minutes=tick * SLOT_TICK_MINUTES))
+        elapsed += time.perf_counter() - started
+        by_slot = Counter()
+        for slot_name, zone in started_slots:
+            by_slot[slot_name] += users_by_zone[zone]
+        peak = max(peak, sum(by_slot.values()))
+        slot_peak = max(slot_peak, max(by_slot.values(), default=0))
+    await bot.state_manager.close()
+    return elapsed / ticks, peak, slot_peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--zones', type=int, nargs='+', default=[1, 8, 32, 128])
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    print(f"{'users':>8} {'zones':>6} {'tick, ms':>9} {'peak users/tick':>16} {'peak users/slot':>16}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for users in args.users:
+            for count in args.zones:
+                zones = pick_zones(count)
+                bot = create_bot(tmp_dir, users, zones)
+                tick, peak, slot_peak = asyncio.run(measure(bot, zones))
+                print(f"{users:>8} {count:>6} {tick * 1000:>9.2f} {peak:>16} {slot_peak:>16}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+Бенчмарк кэша состояния пользователей: чтение горячих данных
+(user_exists, get_current_verb, get_sent_tenses) из памяти против
+SQLite и число транзакций на поток изменений при отложенной записи.
+
+Чтения из БД идут через AsyncStateManager (поток БД и group commit), как
+в боте, и последовательно - это задержка одного обработчика. Записи -
+отметки отправленных времён и обращений к боту по одной на событие:
+без кэша каждая становится транзакцией в потоке БД, с кэшем
+изменения пишутся пакетом при сбросе.
+
+Запуск из корня проекта:
+    python benchmarks/bench_user_cache.py
+    python benchmarks/bench_user_cache.py --users 100000 --reads 50000
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from async_state_manager import AsyncStateManager  # noqa: E402
+from state_manager import StateManager  # noqa: E402
+from user_state_cache import DURABILITY_JOURNAL, DURABILITY_MEMORY, DURABILITY_SYNC, UserStateCache  # noqa: E402
+
+TENSES = ['Presente', 'Futuro', 'Imperfecto', 'Pretérito']
+
+
+def populate(state_manager: StateManager, users: int, today: str):
+    """Пользователи с глаголом дня и двумя отправленными временами"""
+    with state_manager._get_connection() as conn:
+        conn.executemany(
+            'INSERT INTO users (user_id, created_at, last_interaction) VALUES (?, ?, ?)',
+            ((user_id, '2024-01-01T00:00:00', today) for user_id in range(1, users + 1))
+        )
+        conn.executemany(
+            'INSERT INTO verb_of_day (user_id, infinitivo, date) VALUES (?, ?, ?)',
+            ((user_id, 'hablar', today) for user_id in range(1, users + 1))
+        )
+        conn.executemany(
+            'INSERT INTO sent_tenses (user_id, tense, date) VALUES (?, ?, ?)',
+            ((user_id, tense, today) for user_id in range(1, users + 1) for tense in TENSES[:2])
+        )
+
+
+async def measure_reads(state, user_ids, today: str) -> float:
+    """Среднее время одного чтения трёх горячих значений, мкс"""
+    started = time.perf_counter()
+    for user_id in user_ids:
+        await state.user_exists(user_id)
+        await state.get_current_verb(user_id, today)
+        await state.get_sent_tenses(user_id, today)
+    return (time.perf_counter() - started) / (len(user_ids) * 3) * 1e6
+
+
+async def measure_writes(state, user_ids, today: str):
+    """Изменения по одному на событие, каждое дожидается записи: (время, транзакций)"""
+    transactions = 0
+    commit = state.state_manager._get_connection
+
+    def counting_connection():
+        nonlocal transactions
+        if not state.state_manager._depth:
+            transactions += 1
+        return commit()
+
+    state.state_manager._get_connection = counting_connection
+    started = time.perf_counter()
+    for index, user_id in enumerate(user_ids):
+        await state.mark_tense_sent(user_id, TENSES[2 + index % 2], today)
+        await state.touch_user(user_id, today)
+    if isinstance(state, UserStateCache):
+        await state.flush()
+    elapsed = time.perf_counter() - started
+    state.state_manager._get_connection = commit
+    return elapsed, transactions
+
+
+async def run(args, db_file: str, durability):
+    today = date.today().isoformat()
+    if durability is None:
+        state = AsyncStateManager(StateManager(db_file))
+        label = 'sqlite'
+    else:
+        state = UserStateCache(StateManager(db_file), durability=durability, flush_interval=args.flush_interval)
+        started = time.perf_counter()
+        await state.start()
+        await state.wait_loaded()
+        label = f'cache/{durability}'
+        print(f"{label:>14}: loaded {args.users} users in {time.perf_counter() - started:.2f}s")
+
+    rng = random.Random(42)
+    read_ids = [rng.randint(1, args.users) for _ in range(args.reads)]
+    write_ids = [rng.randint(1, args.users) for _ in range(args.writes)]
+    read_us = await measure_reads(state, read_ids, today)
+    elapsed, transactions = await measure_writes(state, write_ids, today)
+    print(
+        f"{label:>14}: read {read_us:8.2f} us/op, {args.writes * 2} writes in {elapsed:.2f}s, "
+        f"{transactions} transactions"
+    )
+    await state.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--reads', type=int, default=20000, help='пользователей для чтения')
+    parser.add_argument('--writes', type=int, default=20000, help='событий записи (по два изменения)')
+    parser.add_argument('--flush-interval', type=float, default=1.0)
+    args = parser.parse_args()
+
+    for durability in (None, DURABILITY_SYNC, DURABILITY_JOURNAL, DURABILITY_MEMORY):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_file = os.path.join(tmp_dir, 'state.db')
+            state_manager = StateManager(db_file)
+            populate(state_manager, args.users, date.today().isoformat())
+            state_manager.close()
+            asyncio.run(run(args, db_file, durability))
+
+
+if __name__ == '__main__':
+    main()
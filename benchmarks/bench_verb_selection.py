@@ -0,0 +1,124 @@
+"""
+Бенчмарк выбора глагола дня: сохранение в БД (VERB_SELECTION=stored)
+против вычисления из user_id и даты (VERB_SELECTION=deterministic).
+
+Пользователи обрабатываются страницами по DISPATCH_BATCH_SIZE, как в
+слотах. Для stored слот 09:00 - это get_due_verbs и set_verbs_of_the_day
+на страницу (у каждого пользователя --reviews повторённых глаголов), а
+квизы и времена читают глаголы через get_current_verbs. Для
+deterministic и то и другое - VerbDataLoader.get_verbs_of_the_day. Выводятся
+время слота 09:00, число изменённых строк БД и время получения глаголов
+в последующем слоте. Отдельно проверяется, что за --days дней подряд
+глаголы пользователя не повторяются, пока не пройден весь словарь.
+
+Запуск из корня проекта:
+    python benchmarks/bench_verb_selection.py
+    python benchmarks/bench_verb_selection.py --users 100000 --reviews 50
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_reviews import populate  # noqa: E402
+from bot import DISPATCH_BATCH_SIZE  # noqa: E402
+from data_loader import VerbDataLoader  # noqa: E402
+from state_manager import StateManager  # noqa: E402
+from verb_schedule import cycle_position, daily_verb_id, day_number  # noqa: E402
+
+CSV_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'verbs.csv')
+
+
+def pages(users: int):
+    for start in range(1, users + 1, DISPATCH_BATCH_SIZE):
+        yield list(range(start, min(start + DISPATCH_BATCH_SIZE, users + 1)))
+
+
+def timed_pages(func, users: int) -> list:
+    times = []
+    for user_ids in pages(users):
+        started = time.perf_counter()
+        func(user_ids)
+        times.append(time.perf_counter() - started)
+    return times
+
+
+def report(name: str, times: list, writes: int = 0):
+    print(
+        f"{name:>28}: {sum(times):7.3f}s, p50 {statistics.median(times) * 1000:6.2f} ms/page, "
+        f"{writes:,} rows written"
+    )
+
+
+def check_repeats(count: int, users: int, days: int, today: date) -> int:
+    """Пользователи, у которых глагол повторился внутри цикла из count дней"""
+    first_day = day_number(today.isoformat())
+    repeats = 0
+    for user_id in range(1, users + 1):
+        seen = set()
+        for day in range(first_day, first_day + days):
+            key = (cycle_position(user_id, day, count)[0], daily_verb_id(user_id, day, count))
+            if key in seen:
+                repeats += 1
+                break
+            seen.add(key)
+    return repeats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=50000)
+    parser.add_argument('--reviews', type=int, default=20, help='повторённых глаголов у пользователя')
+    parser.add_argument('--days', type=int, default=365, help='дней для проверки повторов')
+    parser.add_argument('--repeat-users', type=int, default=1000, help='пользователей для проверки повторов')
+    args = parser.parse_args()
+
+    today = date.today()
+    loader = VerbDataLoader(CSV_FILE)
+    names = [verb.infinitivo for verb in loader.get_all_verbs()]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        state_manager = StateManager(os.path.join(tmp_dir, 'selection.db'))
+        populate(state_manager, args.users, args.reviews, today)
+        rng = random.Random(42)
+        day = today.isoformat()
+
+        def stored_select(user_ids):
+            due = state_manager.get_due_verbs(user_ids, day)
+            state_manager.set_verbs_of_the_day(
+                [(user_id, due.get(user_id) or rng.choice(names)) for user_id in user_ids], day
+            )
+
+        def deterministic_select(user_ids):
+            {user_id: verb.infinitivo for user_id, verb in loader.get_verbs_of_the_day(user_ids, day).items()}
+
+        with state_manager._get_connection() as conn:
+            changes = conn.total_changes
+            times = timed_pages(stored_select, args.users)
+            writes = conn.total_changes - changes
+        report('stored 09:00 selection', times, writes)
+        report('stored later-slot lookup', timed_pages(lambda ids: state_manager.get_current_verbs(ids, day), args.users))
+
+        with state_manager._get_connection() as conn:
+            changes = conn.total_changes
+            times = timed_pages(deterministic_select, args.users)
+            writes = conn.total_changes - changes
+        report('deterministic 09:00 selection', times, writes)
+        report('deterministic later-slot', timed_pages(deterministic_select, args.users))
+        state_manager.close()
+
+    started = time.perf_counter()
+    repeats = check_repeats(len(names), args.repeat_users, args.days, today - timedelta(days=args.days // 2))
+    print(
+        f"Repeats within a cycle of {len(names)} verbs over {args.days} days: {repeats} of {args.repeat_users} "
+        f"users ({time.perf_counter() - started:.1f}s)"
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""
+Нагрузочный тест получения обновлений: задержка обработки команд и
+ответов на квизы в режимах polling и webhook.
+
+Поток обновлений (чередование /status и нажатий кнопок квиза) проигрывается
+с заданной частотой через локальную заглушку Telegram Bot API, запущенную
+в отдельном процессе. Задержка - время от появления обновления на
+"сервере Telegram" до первого ответа бота.
+Поток можно записать в JSONL (--record) и проиграть повторно (--updates).
+
+Запуск из корня проекта:
+    python benchmarks/bench_webhook.py
+    python benchmarks/bench_webhook.py --count 2000 --rate 200
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import sys
+import tempfile
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram.ext import Application  # noqa: E402
+
+from bot import ALLOWED_UPDATES, SpanishVerbBot  # noqa: E402
+from fake_telegram import FakeTelegramProcess, callback_update, message_update, percentile  # noqa: E402
+
+CSV_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'verbs.csv')
+TOKEN = '123456:bench'
+SECRET = 'bench-secret'
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def prepare_state(bot: SpanishVerbBot, users: int):
+    """Пользователи с глаголом дня и по одному неотвеченному квизу"""
+    today = datetime.now().date().isoformat()
+    with bot.state_manager.state_manager._get_connection() as conn:
+        conn.executemany(
+            'INSERT OR IGNORE INTO users (user_id, created_at, last_interaction) VALUES (?, ?, ?)',
+            ((user_id, '2024-01-01T00:00:00', today) for user_id in range(1, users + 1))
+        )
+    verb = bot.data_loader.get_all_verbs()[0]
+    await bot.state_manager.set_verbs_of_the_day((user_id, verb.infinitivo) for user_id in range(1, users + 1))
+    options = bot.quiz_generator.generate_translation_quiz(verb)
+    return await bot.quiz_sessions.create_many(
+        (user_id, 'q1', verb.infinitivo, options, options.index(verb.translation_ru))
+        for user_id in range(1, users + 1)
+    )
+
+
+def generate_updates(sessions, count: int):
+    """Синтетический поток: каждый пользователь присылает одно обновление"""
+    updates = []
+    for index, session in enumerate(sessions[:count]):
+        if index % 2:
+            updates.append(callback_update(session.user_id, f'cq{index}', session.callback_data(0)))
+        else:
+            updates.append(message_update(session.user_id, '/status'))
+    return updates
+
+
+async def run_mode(mode: str, tmp_dir: str, api: FakeTelegramProcess, args, recorded):
+    bot = SpanishVerbBot(CSV_FILE, os.path.join(tmp_dir, f'{mode}.db'))
+    sessions = await prepare_state(bot, args.count)
+    updates = recorded if recorded is not None else generate_updates(sessions, args.count)
+
+    application = bot.build_application(Application.builder().token(TOKEN).base_url(f'{api.url}/bot'))
+    await application.initialize()
+    await application.start()
+    if mode == 'webhook':
+        port = free_port()
+        await application.updater.start_webhook(
+            listen='127.0.0.1', port=port, url_path='telegram',
+            webhook_url=f'http://127.0.0.1:{port}/telegram',
+            secret_token=SECRET, allowed_updates=ALLOWED_UPDATES
+        )
+    else:
+        await application.updater.start_polling(poll_interval=0.0, timeout=10, allowed_updates=ALLOWED_UPDATES)
+
+    # Проигрывание идёт в процессе заглушки, event loop бота продолжает работать
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(None, api.replay, updates, args.rate, args.timeout)
+
+    await application.updater.stop()
+    await application.stop()
+    await application.shutdown()
+    await bot.state_manager.close()
+    return updates, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=1000, help='обновлений в потоке')
+    parser.add_argument('--rate', type=float, default=100, help='обновлений в секунду')
+    parser.add_argument('--timeout', type=float, default=30, help='ожидание ответов после проигрывания, с')
+    parser.add_argument('--record', help='записать сгенерированный поток в JSONL')
+    parser.add_argument('--updates', help='проиграть поток из JSONL вместо генерации')
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    recorded = None
+    if args.updates:
+        with open(args.updates, encoding='utf-8') as f:
+            recorded = [json.loads(line) for line in f if line.strip()]
+
+    print(f"{'mode':>8} {'updates':>8} {'answered':>9} {'p50, ms':>8} {'p99, ms':>8} {'max, ms':>8} {'total, s':>9}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for mode in ('polling', 'webhook'):
+            api = FakeTelegramProcess()
+            api.start()
+            try:
+                updates, result = asyncio.run(run_mode(mode, tmp_dir, api, args, recorded))
+            finally:
+                api.stop()
+            if args.record and mode == 'polling':
+                with open(args.record, 'w', encoding='utf-8') as f:
+                    f.writelines(json.dumps(update, ensure_ascii=False) + '\n' for update in updates)
+
+            latencies = result['latencies']
+            print(
+                f"{mode:>8} {len(updates):>8} {len(latencies):>9} "
+                f"{percentile(latencies, 0.5) * 1000:>8.1f} {percentile(latencies, 0.99) * 1000:>8.1f} "
+                f"{max(latencies, default=0) * 1000:>8.1f} {result['elapsed']:>9.2f}"
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,416 @@
+"""
+Локальная заглушка Telegram Bot API для нагрузочных тестов.
+
+HTTP-сервер на asyncio без внешних зависимостей. Отвечает на методы,
+которые вызывает бот (getMe, getUpdates, setWebhook, sendMessage,
+answerCallbackQuery, editMessageText и т.д.), отдаёт обновления через
+long polling или отправляет их на webhook бота и измеряет задержку от
+появления обновления до ответа бота на него. Может имитировать задержку
+сети, flood control (ответ 429 с retry_after) и чаты, заблокировавшие
+бота (ответ 403). FakeTelegramProcess
+запускает заглушку в отдельном процессе.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import multiprocessing
+import time
+from collections import Counter, deque
+from typing import Deque, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+# Задержка считается до первого ответа бота: sendMessage в тот же чат
+# для сообщения и answerCallbackQuery для нажатия кнопки
+_REPLY_METHODS = {'sendmessage', 'answercallbackquery'}
+
+
+def _update_key(update: dict) -> Optional[Tuple[str, object]]:
+    """Ключ, по которому ответ бота сопоставляется с обновлением"""
+    if 'callback_query' in update:
+        return 'callback', update['callback_query']['id']
+    message = update.get('message')
+    if message:
+        return 'chat', message['chat']['id']
+    return None
+
+
+def _reply_key(method: str, params: dict) -> Optional[Tuple[str, object]]:
+    if method == 'answercallbackquery':
+        return 'callback', params.get('callback_query_id')
+    if method == 'sendmessage':
+        try:
+            return 'chat', int(params.get('chat_id'))
+        except (TypeError, ValueError):
+            return None
+    return None
+
+
+def message_update(user_id: int, text: str, message_id: int = 1) -> dict:
+    """Обновление с текстовым сообщением (или командой) от пользователя"""
+    message = {
+        'message_id': message_id,
+        'date': int(time.time()),
+        'chat': {'id': user_id, 'type': 'private'},
+        'from': {'id': user_id, 'is_bot': False, 'first_name': f'user{user_id}'},
+        'text': text,
+    }
+    if text.startswith('/'):
+        message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+    return {'message': message}
+
+
+def callback_update(user_id: int, callback_id: str, data: str, text: str = 'quiz') -> dict:
+    """Обновление с нажатием inline-кнопки"""
+    return {
+        'callback_query': {
+            'id': callback_id,
+            'from': {'id': user_id, 'is_bot': False, 'first_name': f'user{user_id}'},
+            'chat_instance': str(user_id),
+            'data': data,
+            'message': {
+                'message_id': 1,
+                'date': int(time.time()),
+                'chat': {'id': user_id, 'type': 'private'},
+                'text': text,
+            },
+        }
+    }
+
+
+async def _read_response(reader: asyncio.StreamReader) -> int:
+    """Прочитать HTTP-ответ с телом фиксированной длины, вернуть код статуса"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('connection closed')
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    await reader.readexactly(length)
+    return int(status_line.split()[1])
+
+
+def percentile(values: List[float], share: float) -> float:
+    """Перцентиль по отсортированной копии значений"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * share), len(ordered) - 1)]
+
+
+class FakeTelegramAPI:
+    """Заглушка Bot API: базовый URL для бота - f'{api.url}/bot'"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0):
+        self.host = host
+        self.port = port
+        self.calls: Counter = Counter()
+        self.latencies: List[float] = []
+        self.messages: List[Tuple[int, str]] = []
+        # Для долгих прогонов тексты можно не хранить, счётчики вызовов ведутся всегда
+        self.record_messages = True
+        # Имитация условий Telegram: задержка ответа на отправку, в секундах,
+        # и ответ 429 на каждый flood_every-й sendMessage (0 - без ошибок)
+        self.send_latency = 0.0
+        self.flood_every = 0
+        self.flood_retry_after = 1
+        # Чаты, в которые sendMessage отвечает 403 (пользователь заблокировал бота)
+        self.blocked_chats = set()
+        self._sends = itertools.count(1)
+        self._server: Optional[asyncio.base_events.Server] = None
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._updates: Deque[dict] = deque()
+        self._new_updates = asyncio.Event()
+        self._pending: Dict[Tuple[str, object], float] = {}
+        self._webhook: Optional[dict] = None
+        self._webhook_queue: asyncio.Queue = asyncio.Queue()
+        self._webhook_workers: List[asyncio.Task] = []
+
+    @property
+    def url(self) -> str:
+        return f'http://{self.host}:{self.port}'
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._serve, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self._stop_webhook()
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    def push_update(self, update: dict):
+        """Новое обновление: в очередь getUpdates или сразу на webhook"""
+        update = dict(update, update_id=next(self._update_ids))
+        key = _update_key(update)
+        if key is not None:
+            self._pending[key] = time.perf_counter()
+
+        if self._webhook is not None:
+            self._webhook_queue.put_nowait(update)
+        else:
+            self._updates.append(update)
+            self._new_updates.set()
+
+    @property
+    def pending(self) -> int:
+        """Обновления, на которые бот ещё не ответил"""
+        return len(self._pending)
+
+    def _start_webhook(self, params: dict):
+        """Как и Telegram, доставлять обновления не более чем max_connections запросами сразу"""
+        self._stop_webhook()
+        self._webhook = params
+        max_connections = int(params.get('max_connections') or 40)
+        self._webhook_workers = [
+            asyncio.create_task(self._webhook_worker(params)) for _ in range(max_connections)
+        ]
+
+    def _stop_webhook(self):
+        self._webhook = None
+        for task in self._webhook_workers:
+            task.cancel()
+        self._webhook_workers = []
+
+    async def _webhook_worker(self, params: dict):
+        """
+        Доставка обновлений на webhook по одному keep-alive соединению.
+        Минимальный HTTP-клиент на asyncio: у клиента httpx стоимость
+        запроса растёт с числом соединений в пуле, и заглушка сама
+        становилась узким местом.
+        """
+        url = urlsplit(params['url'])
+        headers = f'Host: {url.netloc}\r\nContent-Type: application/json\r\n'
+        if params.get('secret_token'):
+            headers += f"X-Telegram-Bot-Api-Secret-Token: {params['secret_token']}\r\n"
+        reader = writer = None
+        try:
+            while True:
+                update = await self._webhook_queue.get()
+                body = json.dumps(update).encode()
+                request = (
+                    f'POST {url.path} HTTP/1.1\r\n{headers}Content-Length: {len(body)}\r\n\r\n'.encode() + body
+                )
+                try:
+                    if writer is None:
+                        reader, writer = await asyncio.open_connection(url.hostname, url.port)
+                    writer.write(request)
+                    await writer.drain()
+                    await _read_response(reader)
+                except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+                    self.calls['webhook_error'] += 1
+                    if writer is not None:
+                        writer.close()
+                    reader = writer = None
+        finally:
+            if writer is not None:
+                writer.close()
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Обработка keep-alive соединения HTTP/1.1"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    return
+                _, target, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+                status, payload = await self._handle(target, headers.get('content-type', ''), body)
+                data = json.dumps(payload).encode()
+                writer.write(
+                    f'HTTP/1.1 {status}\r\nContent-Type: application/json\r\n'
+                    f'Content-Length: {len(data)}\r\n\r\n'.encode() + data
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            # Клиент закрыл соединение или сервер останавливается
+            pass
+        finally:
+            writer.close()
+
+    async def _handle(self, target: str, content_type: str, body: bytes) -> Tuple[str, dict]:
+        method = urlsplit(target).path.rsplit('/', 1)[-1].lower()
+        if content_type.startswith('application/json'):
+            params = json.loads(body or b'{}')
+        else:
+            params = dict(parse_qsl(body.decode()))
+        self.calls[method] += 1
+
+        if method in _REPLY_METHODS:
+            key = _reply_key(method, params)
+            started = self._pending.pop(key, None)
+            if started is not None:
+                self.latencies.append(time.perf_counter() - started)
+
+        status, result = await self.respond(method, params)
+        if status != '200 OK':
+            return status, result
+        return status, {'ok': True, 'result': result}
+
+    async def respond(self, method: str, params: dict) -> Tuple[str, object]:
+        """Ответ на вызов метода Bot API: (HTTP-статус, result)"""
+        if method == 'getme':
+            return '200 OK', {
+                'id': 1, 'is_bot': True, 'first_name': 'Fake', 'username': 'fake_bot',
+                'can_join_groups': False, 'can_read_all_group_messages': False,
+                'supports_inline_queries': False,
+            }
+        if method == 'getupdates':
+            return '200 OK', await self._get_updates(params)
+        if method == 'setwebhook':
+            self._start_webhook(params)
+            return '200 OK', True
+        if method == 'deletewebhook':
+            self._stop_webhook()
+            return '200 OK', True
+        if method == 'sendmessage':
+            if self.send_latency:
+                await asyncio.sleep(self.send_latency)
+            if self.flood_every and next(self._sends) % self.flood_every == 0:
+                self.calls['flood'] += 1
+                return '429 Too Many Requests', {
+                    'ok': False,
+                    'error_code': 429,
+                    'description': f'Too Many Requests: retry after {self.flood_retry_after}',
+                    'parameters': {'retry_after': self.flood_retry_after},
+                }
+            if int(params.get('chat_id') or 0) in self.blocked_chats:
+                self.calls['blocked'] += 1
+                return '403 Forbidden', {
+                    'ok': False,
+                    'error_code': 403,
+                    'description': 'Forbidden: bot was blocked by the user',
+                }
+        if method in ('sendmessage', 'editmessagetext'):
+            chat_id = int(params.get('chat_id') or 0)
+            if self.record_messages:
+                self.messages.append((chat_id, params.get('text', '')))
+            return '200 OK', {
+                'message_id': next(self._message_ids),
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'},
+                'text': params.get('text', ''),
+            }
+        return '200 OK', True
+
+    async def _get_updates(self, params: dict) -> List[dict]:
+        offset = int(params.get('offset') or 0)
+        limit = int(params.get('limit') or 100)
+        timeout = float(params.get('timeout') or 0)
+
+        # Обновления с update_id < offset бот уже подтвердил
+        while self._updates and self._updates[0]['update_id'] < offset:
+            self._updates.popleft()
+        if not self._updates and timeout > 0:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return list(itertools.islice(self._updates, limit))
+
+
+def _serve_process(connection, host: str):
+    """Дочерний процесс: заглушка API, управляемая командами из connection"""
+    logging.getLogger().setLevel(logging.WARNING)
+
+    async def main():
+        api = FakeTelegramAPI(host)
+        await api.start()
+        connection.send(api.port)
+        loop = asyncio.get_running_loop()
+        while True:
+            command, args = await loop.run_in_executor(None, connection.recv)
+            if command == 'stop':
+                break
+            if command == 'configure':
+                for name, value in args.items():
+                    setattr(api, name, value)
+                connection.send(None)
+            elif command == 'stats':
+                connection.send({'calls': dict(api.calls), 'messages': len(api.messages)})
+                if args:
+                    api.calls.clear()
+                    api.messages = []
+            elif command == 'replay':
+                updates, rate, timeout = args
+                api.latencies = []
+                started = time.perf_counter()
+                for index, update in enumerate(updates):
+                    delay = started + index / rate - time.perf_counter()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    api.push_update(update)
+                deadline = time.perf_counter() + timeout
+                while api.pending and time.perf_counter() < deadline:
+                    await asyncio.sleep(0.01)
+                connection.send({
+                    'latencies': api.latencies,
+                    'pending': api.pending,
+                    'elapsed': time.perf_counter() - started,
+                    'calls': dict(api.calls),
+                })
+        await api.stop()
+
+    asyncio.run(main())
+
+
+class FakeTelegramProcess:
+    """
+    Заглушка API в отдельном процессе, чтобы её собственная нагрузка
+    (HTTP-сервер, доставка webhook) не делила event loop с ботом.
+    """
+
+    def __init__(self, host: str = '127.0.0.1'):
+        self.host = host
+        self.port = None
+        self._connection = None
+        self._process = None
+
+    @property
+    def url(self) -> str:
+        return f'http://{self.host}:{self.port}'
+
+    def start(self):
+        context = multiprocessing.get_context('spawn')
+        self._connection, child = context.Pipe()
+        self._process = context.Process(target=_serve_process, args=(child, self.host), daemon=True)
+        self._process.start()
+        self.port = self._connection.recv()
+
+    def configure(self, **attributes):
+        """Установить атрибуты заглушки в дочернем процессе"""
+        self._connection.send(('configure', attributes))
+        self._connection.recv()
+
+    def stats(self, reset: bool = False) -> dict:
+        """Счётчики вызовов методов и число принятых сообщений"""
+        self._connection.send(('stats', reset))
+        return self._connection.recv()
+
+    def replay(self, updates: List[dict], rate: float, timeout: float) -> dict:
+        """Проиграть обновления с частотой rate и дождаться ответов (блокирующий вызов)"""
+        self._connection.send(('replay', (updates, rate, timeout)))
+        return self._connection.recv()
+
+    def stop(self):
+        if self._process is None:
+            return
+        self._connection.send(('stop', None))
+        self._process.join(timeout=10)
+        self._process = None
@@ -1,18 +1,32 @@
+import asyncio
+import functools
 import logging
 import os
 import sys
-from datetime import time, datetime, timedelta
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes
+from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes, TypeHandler
+from telegram.error import TimedOut
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.date import DateTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 import pytz
 from dotenv import load_dotenv
 
-from data_loader import VerbDataLoader
-from state_manager import StateManager
+from data_loader import Verb, VerbDataLoader
+from dispatcher import SlotDispatcher
+from metrics import REGISTRY, MetricsServer, enable_metrics, timed
+from outbound import OutboundQueue, may_be_delivered
+from state_manager import SLOT_DONE, SLOT_RUNNING, SLOT_SKIPPED, StateManager
+from user_state_cache import UserStateCache
 from quiz_generator import QuizGenerator
+from quiz_results import QuizResultLog
+from quiz_sessions import QuizSession, QuizSessionStore, parse_callback_data
+from renderer import MessageRenderer
+from telegram_client import TelegramRequest
 
 # Загрузка переменных окружения из .env файла
 load_dotenv()
@@ -26,23 +40,173 @@ logger = logging.getLogger(__name__)
 
 # Константы
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
-TIMEZONE = pytz.timezone('Europe/Moscow')  # Измените на ваш часовой пояс
+TIMEZONE = pytz.timezone('Europe/Moscow')  # Часовой пояс по умолчанию для новых пользователей
+
+# Пользователи, которым доступна команда /report (id через запятую)
+ADMIN_USER_IDS = {int(user_id) for user_id in os.getenv('ADMIN_USER_IDS', '').split(',') if user_id.strip()}
+
+# Получение обновлений: polling (по умолчанию) или webhook
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')  # Публичный адрес бота, например https://bot.example.com
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', 'telegram')
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('PORT', '8443'))  # Railway передаёт порт в переменной PORT
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET')
+
+# Бот обрабатывает только команды и нажатия кнопок
+ALLOWED_UPDATES = [Update.MESSAGE, Update.CALLBACK_QUERY]
+# Сколько обновлений обрабатывается одновременно
+CONCURRENT_UPDATES = int(os.getenv('CONCURRENT_UPDATES', '64'))
+
+# Число процессов-шардов рассылки (1 - всё в одном процессе)
+SHARDS = int(os.getenv('SHARDS', '1'))
+
+# Слоты расписания
+VERB_OF_DAY_HOUR = 9
+QUIZ_1_HOUR = 10
+QUIZ_2_HOUR = 11
+TENSE_HOURS = range(13, 24)
+
+# Выбор глагола дня: stored - глагол для повторения (SM-2) или случайный, сохраняется в БД;
+# deterministic - вычисляется из user_id и даты (своя перестановка словаря у каждого пользователя)
+# без записи в 09:00 и чтения в остальных слотах, интервальные повторения выбор не меняют
+VERB_SELECTION = os.getenv('VERB_SELECTION', 'stored')
+
+# Ежедневная очистка старых записей: час запуска и срок хранения в днях
+RETENTION_HOUR = 4
+RETENTION_DAYS = int(os.getenv('RETENTION_DAYS', '7'))
+
+# Как часто проверять, не изменился ли verbs.csv, в секундах (0 - без горячей перезагрузки)
+VERBS_RELOAD_INTERVAL = int(os.getenv('VERBS_RELOAD_INTERVAL', '60'))
+
+# Пользователи, не обращавшиеся к боту столько дней, не получают рассылку (0 - рассылать всем)
+INACTIVE_DAYS = int(os.getenv('INACTIVE_DAYS', '30'))
+
+# Кэш состояния пользователей в памяти: надёжность отложенной записи (sync, journal, memory),
+# интервал сброса изменений в SQLite в секундах и число изменений, после которого сброс идёт сразу
+STATE_DURABILITY = os.getenv('STATE_DURABILITY', 'journal')
+STATE_FLUSH_INTERVAL = float(os.getenv('STATE_FLUSH_INTERVAL', '1.0'))
+STATE_FLUSH_THRESHOLD = int(os.getenv('STATE_FLUSH_THRESHOLD', '1000'))
+
+# Рассылка слота: размер страницы пользователей и число одновременно обрабатываемых страниц
+DISPATCH_BATCH_SIZE = int(os.getenv('DISPATCH_BATCH_SIZE', '500'))
+DISPATCH_WORKERS = int(os.getenv('DISPATCH_WORKERS', '2'))
+
+# Исходящие сообщения: число конкурентных отправителей и лимиты Telegram (сообщений в секунду)
+OUTBOUND_SENDERS = int(os.getenv('OUTBOUND_SENDERS', '8'))
+OUTBOUND_GLOBAL_RATE = float(os.getenv('OUTBOUND_GLOBAL_RATE', '30'))
+OUTBOUND_CHAT_RATE = float(os.getenv('OUTBOUND_CHAT_RATE', '1'))
+
+# HTTP-клиенты Bot API: отдельные пулы соединений для getUpdates и для остальных вызовов
+# (рассылка и ответы на обновления). По умолчанию в пуле по соединению на отправителя и обработчик
+TELEGRAM_POOL_SIZE = int(os.getenv('TELEGRAM_POOL_SIZE', str(OUTBOUND_SENDERS + CONCURRENT_UPDATES)))
+TELEGRAM_POOL_TIMEOUT = float(os.getenv('TELEGRAM_POOL_TIMEOUT', '5'))  # ожидание свободного соединения, с
+TELEGRAM_CONNECT_TIMEOUT = float(os.getenv('TELEGRAM_CONNECT_TIMEOUT', '5'))
+TELEGRAM_READ_TIMEOUT = float(os.getenv('TELEGRAM_READ_TIMEOUT', '5'))
+TELEGRAM_WRITE_TIMEOUT = float(os.getenv('TELEGRAM_WRITE_TIMEOUT', '5'))  # отправка тела запроса, с
+TELEGRAM_KEEPALIVE = float(os.getenv('TELEGRAM_KEEPALIVE', '60'))  # сколько держать простаивающее соединение, с
+TELEGRAM_HTTP_VERSION = os.getenv('TELEGRAM_HTTP_VERSION', '1.1')  # 2 - HTTP/2 (нужен python-telegram-bot[http2])
+GET_UPDATES_POOL_SIZE = int(os.getenv('GET_UPDATES_POOL_SIZE', '1'))
+GET_UPDATES_CONNECT_TIMEOUT = float(os.getenv('GET_UPDATES_CONNECT_TIMEOUT', '5'))
+GET_UPDATES_READ_TIMEOUT = float(os.getenv('GET_UPDATES_READ_TIMEOUT', '5'))  # сверх таймаута long polling
+
+# Слоты проверяются каждые SLOT_TICK_MINUTES минут по UTC (кратно 15 - есть пояса со смещением :30 и :45)
+SLOT_TICK_MINUTES = 15
+
+# Допустимое опоздание срабатывания слота в секундах (например, при занятом event loop)
+SLOT_MISFIRE_GRACE_TIME = int(os.getenv('SLOT_MISFIRE_GRACE_TIME', '900'))
+# Догоняющая рассылка после перезапуска: сколько пропущенных часовых слотов времён дослать
+CATCHUP_MAX_TENSE_SLOTS = int(os.getenv('CATCHUP_MAX_TENSE_SLOTS', '2'))
+# Глагол дня и квизы досылаются, только если опоздание не больше стольких часов
+CATCHUP_MAX_DELAY_HOURS = float(os.getenv('CATCHUP_MAX_DELAY_HOURS', '2'))
+
+# Метрики Prometheus на http://METRICS_HOST:METRICS_PORT/metrics (0 - метрики выключены).
+# В шардированном режиме шард i слушает порт METRICS_PORT + i + 1
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+
+HANDLER_SECONDS = REGISTRY.histogram('bot_handler_seconds', 'Update handler latency', ['handler'])
+HANDLER_ERRORS = REGISTRY.counter('bot_handler_errors_total', 'Update handler errors', ['handler'])
+QUIZ_ANSWERS = REGISTRY.counter('bot_quiz_answers_total', 'Quiz callbacks by result', ['result'])
+DELIVERY_SECONDS = REGISTRY.histogram(
+    'bot_delivery_seconds', 'Time to render and send one scheduled message', ['kind']
+)
+DELIVERY_ERRORS = REGISTRY.counter('bot_delivery_errors_total', 'Failed scheduled messages', ['kind'])
+SLOT_SECONDS = REGISTRY.histogram('bot_slot_seconds', 'Slot run time including queue drain', ['slot'])
+SLOT_USERS = REGISTRY.counter('bot_slot_users_total', 'Users processed by slot runs', ['slot'])
+
+
+def outbound_request(pool_size: int = TELEGRAM_POOL_SIZE) -> TelegramRequest:
+    """HTTP-клиент для вызовов Bot API, кроме getUpdates"""
+    return TelegramRequest(
+        pool_size,
+        keepalive_expiry=TELEGRAM_KEEPALIVE,
+        connect_timeout=TELEGRAM_CONNECT_TIMEOUT,
+        read_timeout=TELEGRAM_READ_TIMEOUT,
+        write_timeout=TELEGRAM_WRITE_TIMEOUT,
+        pool_timeout=TELEGRAM_POOL_TIMEOUT,
+        http_version=TELEGRAM_HTTP_VERSION
+    )
+
+
+def get_updates_request() -> TelegramRequest:
+    """HTTP-клиент для long polling: свой пул, чтобы getUpdates не ждал соединения за рассылкой"""
+    return TelegramRequest(
+        GET_UPDATES_POOL_SIZE,
+        keepalive_expiry=TELEGRAM_KEEPALIVE,
+        connect_timeout=GET_UPDATES_CONNECT_TIMEOUT,
+        read_timeout=GET_UPDATES_READ_TIMEOUT,
+        http_version=TELEGRAM_HTTP_VERSION
+    )
 
 
 class SpanishVerbBot:
-    def __init__(self):
-        self.data_loader = VerbDataLoader('verbs.csv')
-        self.state_manager = StateManager('bot_state.db')
+    def __init__(self, csv_file: str = 'verbs.csv', db_file: str = 'bot_state.db',
+                 shard: Optional[Tuple[int, int]] = None):
+        self.started = time.monotonic()
+        # Строки outbox, зарезервированные до этого момента, оставил предыдущий запуск
+        self.started_at = datetime.now().isoformat()
+        # (index, count): процесс рассылает только пользователей с user_id % count == index
+        self.shard = shard
+        self.data_loader = VerbDataLoader(csv_file)
+        # Кэш включается в post_init (start); шарды и координатор читают БД напрямую
+        self.state_manager = UserStateCache(
+            StateManager(db_file),
+            durability=STATE_DURABILITY,
+            flush_interval=STATE_FLUSH_INTERVAL,
+            flush_threshold=STATE_FLUSH_THRESHOLD
+        )
         self.quiz_generator = QuizGenerator(self.data_loader)
+        self.quiz_sessions = QuizSessionStore(self.state_manager)
+        self.quiz_results = QuizResultLog(self.state_manager)
+        self.renderer = MessageRenderer(self.data_loader)
         self.scheduler = AsyncIOScheduler(timezone=TIMEZONE)
-
+        self.dispatcher = SlotDispatcher(
+            self.state_manager, workers=DISPATCH_WORKERS, batch_size=DISPATCH_BATCH_SIZE, shard=shard
+        )
+        self._running_slots = set()
+        self._slot_tasks = set()
+        self._catch_up_task: Optional[asyncio.Task] = None
+        # Часовые пояса пользователей, обновляются из БД на каждом тике
+        self.timezones: List[str] = []
+        self.metrics_server: Optional[MetricsServer] = None
+        # Чаты с постоянной ошибкой доставки, ожидающие записи в БД
+        self._blocked_users = set()
+        self._block_task: Optional[asyncio.Task] = None
+        # Пользователи, чьё обращение к боту сегодня уже записано
+        self._seen_users = set()
+        self._seen_date: Optional[str] = None
+        if METRICS_PORT:
+            enable_metrics()
+
+    @timed(HANDLER_SECONDS, 'start', errors=HANDLER_ERRORS)
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработчик команды /start"""
         user_id = update.effective_user.id
 
         # Инициализация пользователя
-        if not self.state_manager.user_exists(user_id):
-            self.state_manager.create_user(user_id)
+        if not await self.state_manager.user_exists(user_id):
+            await self.state_manager.create_user(user_id, TIMEZONE.zone)
             await update.message.reply_text(
                 "¡Hola! 👋\n\n"
                 "Я помогу тебе учить испанские глаголы!\n\n"
@@ -50,45 +214,174 @@ class SpanishVerbBot:
                 "Затем в течение дня ты получишь:\n"
                 "- Квизы на перевод (в 10:00 и 11:00)\n"
                 "- Все формы глагола по временам (начиная с 13:00, каждый час)\n\n"
+                f"Время указано по часовому поясу {TIMEZONE.zone}, изменить его можно командой /timezone.\n"
                 "Используй /status чтобы узнать текущий глагол дня."
             )
         else:
+            # Повторный /start возвращает в рассылку заблокировавшего бота пользователя
+            if await self.state_manager.reactivate_user(user_id):
+                logger.info(f"User {user_id} reactivated")
             await update.message.reply_text(
                 "С возвращением! 👋\n\n"
                 "Используй /status чтобы узнать текущий глагол дня."
             )
 
+    async def track_activity(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Запись даты последнего обращения пользователя (раз в день на пользователя)"""
+        user = update.effective_user
+        if user is None:
+            return
+        today = datetime.now().date().isoformat()
+        if today != self._seen_date:
+            self._seen_users.clear()
+            self._seen_date = today
+        if user.id in self._seen_users:
+            return
+        self._seen_users.add(user.id)
+        try:
+            await self.state_manager.touch_user(user.id, today)
+        except Exception as e:
+            self._seen_users.discard(user.id)
+            logger.error(f"Error recording activity of user {user.id}: {e}")
+
+    def mark_blocked(self, user_id: int):
+        """Исключить чат из рассылки после постоянной ошибки доставки (вызывается очередью отправки)"""
+        self._blocked_users.add(user_id)
+        if self._block_task is None:
+            self._block_task = asyncio.create_task(self._save_blocked())
+
+    async def _save_blocked(self):
+        """Запись накопившихся заблокированных чатов одной транзакцией"""
+        try:
+            while self._blocked_users:
+                user_ids, self._blocked_users = list(self._blocked_users), set()
+                await self.state_manager.block_users(user_ids)
+                logger.info(f"Excluded {len(user_ids)} blocked users from delivery")
+        except Exception as e:
+            logger.error(f"Error saving blocked users: {e}")
+        finally:
+            self._block_task = None
+
+    @staticmethod
+    def active_since() -> Optional[str]:
+        """Дата, начиная с которой пользователь считается активным (None - все активны)"""
+        if not INACTIVE_DAYS:
+            return None
+        return (datetime.now().date() - timedelta(days=INACTIVE_DAYS)).isoformat()
+
+    @timed(HANDLER_SECONDS, 'status', errors=HANDLER_ERRORS)
     async def status_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработчик команды /status"""
         user_id = update.effective_user.id
 
-        if not self.state_manager.user_exists(user_id):
+        if not await self.state_manager.user_exists(user_id):
             await update.message.reply_text(
                 "Используй /start чтобы начать!"
             )
             return
 
-        current_verb = self.state_manager.get_current_verb(user_id)
+        verbs = await self.current_verbs([user_id], await self.user_today(user_id))
+        current_verb = verbs.get(user_id)
 
         if current_verb:
             verb_data = self.data_loader.get_verb_by_infinitivo(current_verb)
             if verb_data:
                 await update.message.reply_text(
                     f"📚 Глагол дня:\n\n"
-                    f"🇪🇸 {verb_data['infinitivo']}\n"
-                    f"🇷🇺 {verb_data['translation_ru']}"
+                    f"🇪🇸 {verb_data.infinitivo}\n"
+                    f"🇷🇺 {verb_data.translation_ru}"
                 )
         else:
             await update.message.reply_text(
                 "Глагол дня ещё не выбран. Жди утреннего сообщения в 09:00!"
             )
 
+    @timed(HANDLER_SECONDS, 'stats', errors=HANDLER_ERRORS)
+    async def stats_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Обработчик команды /stats: результаты квизов пользователя"""
+        user_id = update.effective_user.id
+
+        stats = await self.quiz_results.get_user_stats(user_id)
+        if stats is None:
+            await update.message.reply_text(
+                "Ответов на квизы пока нет. Первый квиз придёт в 10:00!"
+            )
+            return
+
+        attempts, correct, streak, best_streak, _ = stats
+        await update.message.reply_text(
+            f"📊 Твоя статистика квизов:\n\n"
+            f"Ответов: {attempts}\n"
+            f"Верных: {correct} ({correct * 100 // attempts}%)\n"
+            f"Верных подряд: {streak} (рекорд: {best_streak})"
+        )
+
+    @timed(HANDLER_SECONDS, 'report', errors=HANDLER_ERRORS)
+    async def report_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Обработчик команды /report: сводка по квизам для администраторов"""
+        if update.effective_user.id not in ADMIN_USER_IDS:
+            await update.message.reply_text("Команда доступна только администраторам.")
+            return
+
+        report = await self.quiz_results.get_report()
+        attempts, correct = report['attempts'], report['correct']
+        lines = [
+            "📈 Квизы:\n",
+            f"Учеников: {report['learners']}",
+            f"Ответов: {attempts}",
+            f"Верных: {correct} ({correct * 100 // attempts if attempts else 0}%)",
+        ]
+        if report['hardest']:
+            lines.append("\nСамые трудные глаголы:")
+            lines.extend(
+                f"{infinitivo} — {verb_correct * 100 // verb_attempts}% из {verb_attempts}"
+                for infinitivo, verb_attempts, verb_correct in report['hardest']
+            )
+        await update.message.reply_text("\n".join(lines))
+
+    @timed(HANDLER_SECONDS, 'timezone', errors=HANDLER_ERRORS)
+    async def timezone_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Обработчик команды /timezone: показать или изменить часовой пояс"""
+        user_id = update.effective_user.id
+
+        if not await self.state_manager.user_exists(user_id):
+            await update.message.reply_text(
+                "Используй /start чтобы начать!"
+            )
+            return
+
+        if not context.args:
+            timezone = await self.state_manager.get_user_timezone(user_id)
+            await update.message.reply_text(
+                f"🕘 Твой часовой пояс: {timezone}\n\n"
+                "Чтобы изменить его, укажи название пояса, например:\n"
+                "/timezone Europe/Madrid"
+            )
+            return
+
+        try:
+            timezone = pytz.timezone(context.args[0]).zone
+        except pytz.UnknownTimeZoneError:
+            await update.message.reply_text(
+                "Неизвестный часовой пояс. Укажи название из базы IANA, например Europe/Madrid"
+            )
+            return
+
+        await self.state_manager.set_user_timezone(user_id, timezone)
+        if timezone not in self.timezones:
+            self.timezones.append(timezone)
+        await update.message.reply_text(
+            f"✅ Часовой пояс изменён: {timezone}\n"
+            f"Сейчас там {datetime.now(pytz.timezone(timezone)):%H:%M}."
+        )
+
+    @timed(HANDLER_SECONDS, 'test', errors=HANDLER_ERRORS)
     async def test_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Тестовая команда для прохождения дневного флоу с интервалом 1 минута"""
         user_id = update.effective_user.id
 
-        if not self.state_manager.user_exists(user_id):
-            self.state_manager.create_user(user_id)
+        if not await self.state_manager.user_exists(user_id):
+            await self.state_manager.create_user(user_id, TIMEZONE.zone)
 
         await update.message.reply_text(
             "🧪 Запускаю тестовый дневной флоу!\n\n"
@@ -99,8 +392,12 @@ class SpanishVerbBot:
             "- Времена глаголов (с 3-й минуты, каждую минуту)"
         )
 
+        await self.start_test_flow(user_id)
+
+    async def start_test_flow(self, user_id: int):
+        """Сброс состояния и планирование тестового дневного флоу для пользователя"""
         # Сбрасываем состояние времен для пользователя
-        self.state_manager.reset_sent_tenses(user_id)
+        await self.state_manager.reset_sent_tenses(user_id, await self.user_today(user_id))
 
         # Отправляем глагол дня немедленно
         await self.send_verb_of_the_day(user_id)
@@ -142,290 +439,655 @@ class SpanishVerbBot:
 
     async def send_verb_of_the_day(self, user_id: int):
         """Отправка глагола дня (09:00)"""
+        await self.send_verb_of_the_day_batch([user_id], await self.user_today(user_id))
+
+    async def send_verb_of_the_day_batch(self, user_ids: List[int], today: Optional[str] = None,
+                                         notify: bool = True):
+        """
+        Выбор и отправка глагола дня для страницы пользователей (today - их локальная дата).
+        Пользователь получает самый просроченный глагол из интервальных повторений,
+        а если повторять нечего - случайный. При VERB_SELECTION=deterministic глагол
+        вычисляется из user_id и даты и не сохраняется.
+        notify=False - только выбрать глагол (для времён и квизов), не отправляя сообщение.
+        """
+        if VERB_SELECTION == 'deterministic':
+            verbs = await self.current_verbs(user_ids, today)
+        else:
+            due = await self.state_manager.get_due_verbs(user_ids, today)
+            assignments = [
+                (user_id, self._due_or_random_verb(due.get(user_id)))
+                for user_id in user_ids
+            ]
+            # Сохраняем глаголы одной транзакцией
+            verbs = await self.state_manager.set_verbs_of_the_day(assignments, today)
+
+        if not notify:
+            return
+        await asyncio.gather(*(
+            self._deliver_verb_of_the_day(user_id, infinitivo)
+            for user_id, infinitivo in verbs.items()
+        ))
+
+    async def current_verbs(self, user_ids: List[int], today: Optional[str] = None) -> Dict[int, str]:
+        """Глаголы дня пользователей на дату today: {user_id: infinitivo}"""
+        if VERB_SELECTION == 'deterministic':
+            today = today or datetime.now().date().isoformat()
+            verbs = self.data_loader.get_verbs_of_the_day(user_ids, today)
+            return {user_id: verb.infinitivo for user_id, verb in verbs.items()}
+        return await self.state_manager.get_current_verbs(user_ids, today)
+
+    def _due_or_random_verb(self, due_verb: Optional[str]) -> str:
+        """Глагол для повторения, если он есть в словаре, иначе случайный"""
+        if due_verb and self.data_loader.get_verb_by_infinitivo(due_verb):
+            return due_verb
+        return self.data_loader.get_random_verb().infinitivo
+
+    @timed(DELIVERY_SECONDS, 'verb_of_day')
+    async def _deliver_verb_of_the_day(self, user_id: int, infinitivo: str):
         try:
-            # Выбираем случайный глагол
-            verb_data = self.data_loader.get_random_verb()
-
-            # Сохраняем глагол дня для пользователя
-            self.state_manager.set_verb_of_the_day(user_id, verb_data['infinitivo'])
+            verb_data = self.data_loader.get_verb_by_infinitivo(infinitivo)
+            if not verb_data:
+                return
 
-            # Отправляем сообщение
-            await self.application.bot.send_message(
+            await self.outbound.send_message(
                 chat_id=user_id,
-                text=f"📚 Глагол дня:\n\n🇪🇸 {verb_data['infinitivo']} — 🇷🇺 {verb_data['translation_ru']}"
+                text=self.renderer.verb_of_the_day(verb_data)
             )
 
-            logger.info(f"Sent verb of the day to user {user_id}: {verb_data['infinitivo']}")
+            logger.info(f"Sent verb of the day to user {user_id}: {verb_data.infinitivo}")
         except Exception as e:
+            DELIVERY_ERRORS.inc('verb_of_day')
             logger.error(f"Error sending verb of the day to user {user_id}: {e}")
 
     async def send_quiz_1(self, user_id: int):
         """Отправка квиза №1: инфинитив → перевод (10:00)"""
-        try:
-            current_verb = self.state_manager.get_current_verb(user_id)
-            if not current_verb:
-                return
+        await self.send_quiz_1_batch([user_id], await self.user_today(user_id))
+
+    async def send_quiz_1_batch(self, user_ids: List[int], today: Optional[str] = None):
+        """Отправка квиза №1 странице пользователей"""
+        verbs = await self.current_verbs(user_ids, today)
+        recipients = []
+        for user_id, infinitivo in verbs.items():
+            verb_data = self.data_loader.get_verb_by_infinitivo(infinitivo)
+            if verb_data:
+                recipients.append((user_id, verb_data))
 
-            verb_data = self.data_loader.get_verb_by_infinitivo(current_verb)
-            if not verb_data:
-                return
+        # Генерируем квизы для всей страницы за один проход
+        quizzes = self.quiz_generator.generate_translation_quizzes(verb_data for _, verb_data in recipients)
+
+        # Сессии страницы сохраняются одной транзакцией
+        sessions = await self.quiz_sessions.create_many(
+            (user_id, 'q1', verb_data.infinitivo, options, options.index(verb_data.translation_ru))
+            for (user_id, verb_data), options in zip(recipients, quizzes)
+        )
 
-            # Генерируем квиз
-            options = self.quiz_generator.generate_translation_quiz(verb_data)
-            correct_answer = verb_data['translation_ru']
+        await asyncio.gather(*(
+            self._deliver_quiz_1(session, verb_data)
+            for (_, verb_data), session in zip(recipients, sessions)
+        ))
 
-            # Создаём кнопки
-            keyboard = []
-            for option in options:
-                callback_data = f"q1_{user_id}_{option == correct_answer}_{correct_answer}"
-                keyboard.append([InlineKeyboardButton(option, callback_data=callback_data)])
+    @timed(DELIVERY_SECONDS, 'quiz1')
+    async def _deliver_quiz_1(self, session: QuizSession, verb_data: Verb):
+        user_id = session.user_id
+        try:
+            # Создаём кнопки: в callback data только id сессии и номер варианта
+            keyboard = [
+                [InlineKeyboardButton(option, callback_data=session.callback_data(index))]
+                for index, option in enumerate(session.options)
+            ]
 
             reply_markup = InlineKeyboardMarkup(keyboard)
 
-            await self.application.bot.send_message(
+            await self.outbound.send_message(
                 chat_id=user_id,
-                text=f"🎯 Квиз №1\n\nГлагол: {verb_data['infinitivo']}\nВыбери верный перевод:",
+                text=self.renderer.quiz_1_prompt(verb_data),
                 reply_markup=reply_markup
             )
 
             logger.info(f"Sent quiz 1 to user {user_id}")
         except Exception as e:
+            DELIVERY_ERRORS.inc('quiz1')
             logger.error(f"Error sending quiz 1 to user {user_id}: {e}")
 
     async def send_quiz_2(self, user_id: int):
         """Отправка квиза №2: перевод → инфинитив (11:00)"""
-        try:
-            current_verb = self.state_manager.get_current_verb(user_id)
-            if not current_verb:
-                return
+        await self.send_quiz_2_batch([user_id], await self.user_today(user_id))
+
+    async def send_quiz_2_batch(self, user_ids: List[int], today: Optional[str] = None):
+        """Отправка квиза №2 странице пользователей"""
+        verbs = await self.current_verbs(user_ids, today)
+        recipients = []
+        for user_id, infinitivo in verbs.items():
+            verb_data = self.data_loader.get_verb_by_infinitivo(infinitivo)
+            if verb_data:
+                recipients.append((user_id, verb_data))
 
-            verb_data = self.data_loader.get_verb_by_infinitivo(current_verb)
-            if not verb_data:
-                return
+        # Генерируем квизы для всей страницы за один проход
+        quizzes = self.quiz_generator.generate_infinitivo_quizzes(verb_data for _, verb_data in recipients)
+
+        # Сессии страницы сохраняются одной транзакцией
+        sessions = await self.quiz_sessions.create_many(
+            (user_id, 'q2', verb_data.infinitivo, options, options.index(verb_data.infinitivo))
+            for (user_id, verb_data), options in zip(recipients, quizzes)
+        )
 
-            # Генерируем квиз
-            options = self.quiz_generator.generate_infinitivo_quiz(verb_data)
-            correct_answer = verb_data['infinitivo']
+        await asyncio.gather(*(
+            self._deliver_quiz_2(session, verb_data)
+            for (_, verb_data), session in zip(recipients, sessions)
+        ))
 
-            # Создаём кнопки
-            keyboard = []
-            for option in options:
-                callback_data = f"q2_{user_id}_{option == correct_answer}_{correct_answer}"
-                keyboard.append([InlineKeyboardButton(option, callback_data=callback_data)])
+    @timed(DELIVERY_SECONDS, 'quiz2')
+    async def _deliver_quiz_2(self, session: QuizSession, verb_data: Verb):
+        user_id = session.user_id
+        try:
+            # Создаём кнопки: в callback data только id сессии и номер варианта
+            keyboard = [
+                [InlineKeyboardButton(option, callback_data=session.callback_data(index))]
+                for index, option in enumerate(session.options)
+            ]
 
             reply_markup = InlineKeyboardMarkup(keyboard)
 
-            await self.application.bot.send_message(
+            await self.outbound.send_message(
                 chat_id=user_id,
-                text=f"🎯 Квиз №2\n\nЗначение: {verb_data['translation_ru']}\nВыбери правильный инфинитив:",
+                text=self.renderer.quiz_2_prompt(verb_data),
                 reply_markup=reply_markup
             )
 
             logger.info(f"Sent quiz 2 to user {user_id}")
         except Exception as e:
+            DELIVERY_ERRORS.inc('quiz2')
             logger.error(f"Error sending quiz 2 to user {user_id}: {e}")
 
     async def send_next_tense(self, user_id: int):
         """Отправка следующего времени (начиная с 13:00, каждый час)"""
-        try:
-            current_verb = self.state_manager.get_current_verb(user_id)
-            if not current_verb:
-                return
+        await self.send_next_tense_batch([user_id], await self.user_today(user_id))
+
+    async def send_next_tense_batch(self, user_ids: List[int], today: Optional[str] = None,
+                                    slot: Optional[str] = None):
+        """
+        Отправка следующего времени странице пользователей через outbox.
+        Следующие времена сначала резервируются одной транзакцией, поэтому
+        пересекающиеся прогоны (слот и /test) не отправят одно время дважды,
+        повторный прогон слота slot не отправит пользователю второе время,
+        а зарезервированное, но не отправленное из-за падения время дошлёт
+        догоняющая рассылка.
+        """
+        verbs = await self.current_verbs(user_ids, today) if VERB_SELECTION == 'deterministic' else None
+        claims = await self.state_manager.claim_next_tenses(
+            user_ids, self.data_loader.get_tenses(), today, slot, verbs
+        )
+        await self.deliver_tense_claims(claims, today)
+
+    async def deliver_tense_claims(self, claims: List[Tuple[int, str, str]], today: Optional[str] = None):
+        """Отправить зарезервированные времена и завершить строки outbox одной транзакцией"""
+        delivered = await asyncio.gather(*(
+            self._deliver_next_tense(user_id, infinitivo, tense)
+            for user_id, infinitivo, tense in claims
+        ))
+        await self.state_manager.complete_tense_claims(
+            [(user_id, tense) for (user_id, _, tense), ok in zip(claims, delivered) if ok],
+            [(user_id, tense) for (user_id, _, tense), ok in zip(claims, delivered) if not ok],
+            today
+        )
 
+    async def drain_tense_outbox(self, timezone: str):
+        """Дослать времена, зарезервированные предыдущим запуском бота, но не доставленные"""
+        today = self.local_date(timezone)
+        total = 0
+        while True:
+            claims = await self.state_manager.get_pending_tenses(
+                today, timezone, self.shard, self.started_at, DISPATCH_BATCH_SIZE
+            )
+            if not claims:
+                break
+            await self.deliver_tense_claims(claims, today)
+            total += len(claims)
+        if total:
+            logger.info(f"Delivered {total} pending tenses from outbox in {timezone}")
+
+    @timed(DELIVERY_SECONDS, 'tense')
+    async def _deliver_next_tense(self, user_id: int, current_verb: str, tense: str) -> bool:
+        """Отправить зарезервированное время, вернуть True при успешной отправке"""
+        try:
             verb_data = self.data_loader.get_verb_by_infinitivo(current_verb)
             if not verb_data:
-                return
-
-            # Получаем список уже отправленных времён
-            sent_tenses = self.state_manager.get_sent_tenses(user_id)
-
-            # Получаем все доступные времена
-            all_tenses = self.data_loader.get_tenses()
-
-            # Находим следующее время
-            next_tense = None
-            for tense in all_tenses:
-                if tense not in sent_tenses:
-                    next_tense = tense
-                    break
-
-            if not next_tense:
-                # Все времена уже отправлены
-                return
-
-            # Получаем формы для этого времени
-            forms = self.data_loader.get_tense_forms(verb_data, next_tense)
-
-            # Форматируем сообщение
-            message = f"📖 {next_tense}\n\n"
-            pronouns = ['yo', 'tú', 'él/ella', 'nosotros', 'vosotros', 'ellos/ellas']
-            for pronoun, form in zip(pronouns, forms):
-                message += f"{pronoun} — {form}\n"
+                return False
 
-            await self.application.bot.send_message(
+            # Текст формируется один раз на (глагол, время) для всех пользователей
+            await self.outbound.send_message(
                 chat_id=user_id,
-                text=message
+                text=self.renderer.tense_message(verb_data, tense)
             )
 
-            # Отмечаем время как отправленное
-            self.state_manager.mark_tense_sent(user_id, next_tense)
-
-            logger.info(f"Sent tense {next_tense} to user {user_id}")
+            logger.info(f"Sent tense {tense} to user {user_id}")
+            return True
         except Exception as e:
+            DELIVERY_ERRORS.inc('tense')
+            if isinstance(e, TimedOut) and may_be_delivered(e):
+                # Время могло дойти: строка outbox завершается, чтобы следующий слот не прислал его снова
+                logger.warning(f"Tense {tense} to user {user_id} timed out and may have been delivered")
+                return True
             logger.error(f"Error sending tense to user {user_id}: {e}")
+            return False
 
+    @timed(HANDLER_SECONDS, 'quiz_callback')
     async def handle_quiz_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработчик ответов на квизы"""
         query = update.callback_query
-        await query.answer()
 
         try:
-            # Валидация callback data
-            data = query.data.split('_')
-
-            # Проверяем минимальную длину (quiz_type, user_id, is_correct, correct_answer)
-            if len(data) < 4:
-                logger.warning(f"Invalid callback data format: {query.data}")
-                await query.answer("Неверный формат данных", show_alert=True)
-                return
-
-            # Извлекаем и валидируем компоненты
-            quiz_type = data[0]
-
-            # Валидация типа квиза
-            if quiz_type not in ['q1', 'q2']:
-                logger.warning(f"Invalid quiz type: {quiz_type}")
-                await query.answer("Неверный тип квиза", show_alert=True)
-                return
-
-            # Валидация user_id
-            try:
-                target_user_id = int(data[1])
-            except ValueError:
-                logger.warning(f"Invalid user_id in callback data: {data[1]}")
-                await query.answer("Неверный формат данных", show_alert=True)
-                return
-
-            # Валидация is_correct
-            if data[2] not in ['True', 'False']:
-                logger.warning(f"Invalid is_correct value: {data[2]}")
-                await query.answer("Неверный формат данных", show_alert=True)
-                return
-
-            is_correct = data[2] == 'True'
-            correct_answer = '_'.join(data[3:])
-
-            # Валидация correct_answer
-            if not correct_answer or len(correct_answer) > 200:
-                logger.warning(f"Invalid correct_answer: {correct_answer}")
-                await query.answer("Неверный формат данных", show_alert=True)
-                return
-
-            # Проверяем, что пользователь отвечает на свой квиз
-            if query.from_user.id != target_user_id:
-                await query.answer("Это не твой квиз!", show_alert=True)
-                return
-
-            if is_correct:
-                await query.edit_message_text(
-                    text=query.message.text + f"\n\n✅ Верно!"
-                )
-            else:
-                await query.edit_message_text(
-                    text=query.message.text + f"\n\n❌ Неверно. Правильный ответ: {correct_answer}"
-                )
+            text, show_alert, verdict = await self.answer_quiz(query.from_user.id, query.data)
+            await query.answer(text, show_alert=show_alert)
+            if verdict:
+                await query.edit_message_text(text=query.message.text + verdict)
         except Exception as e:
+            HANDLER_ERRORS.inc('quiz_callback')
             logger.error(f"Error handling quiz callback: {e}")
             await query.answer("Произошла ошибка при обработке ответа", show_alert=True)
 
-    def schedule_jobs(self):
-        """Настройка расписания задач"""
-        # Получаем всех пользователей
-        users = self.state_manager.get_all_users()
-
-        for user_id in users:
-            # 09:00 - Глагол дня
-            self.scheduler.add_job(
-                self.send_verb_of_the_day,
-                CronTrigger(hour=9, minute=0, timezone=TIMEZONE),
-                args=[user_id],
-                id=f"verb_of_day_{user_id}",
-                replace_existing=True
+    async def answer_quiz(self, user_id: int, data: str) -> Tuple[Optional[str], bool, Optional[str]]:
+        """
+        Проверка и запись ответа на квиз.
+        Возвращает (текст ответа на нажатие, показать ли его как alert,
+        строку с результатом для добавления к сообщению квиза или None).
+        """
+        # Валидация callback data: "qa:<session_id>:<номер варианта>"
+        parsed = parse_callback_data(data)
+        if parsed is None:
+            QUIZ_ANSWERS.inc('invalid')
+            logger.warning(f"Invalid callback data format: {data}")
+            return "Неверный формат данных", True, None
+
+        session_id, option_index = parsed
+        session = await self.quiz_sessions.get(session_id)
+        if session is None:
+            QUIZ_ANSWERS.inc('not_found')
+            return "Квиз не найден или устарел", True, None
+
+        # Проверяем, что пользователь отвечает на свой квиз
+        if user_id != session.user_id:
+            QUIZ_ANSWERS.inc('foreign')
+            return "Это не твой квиз!", True, None
+
+        if not 0 <= option_index < len(session.options):
+            QUIZ_ANSWERS.inc('invalid')
+            logger.warning(f"Invalid option index in callback data: {data}")
+            return "Неверный формат данных", True, None
+
+        is_correct = option_index == session.correct_index
+        if not await self.quiz_sessions.record_answer(session, option_index, is_correct):
+            QUIZ_ANSWERS.inc('duplicate')
+            return "Ответ на этот квиз уже принят", False, None
+
+        QUIZ_ANSWERS.inc('correct' if is_correct else 'wrong')
+        self.quiz_results.append(user_id, session.infinitivo, session.quiz_type, is_correct)
+        try:
+            await self.state_manager.record_review(
+                user_id, session.infinitivo, is_correct, await self.user_today(user_id)
             )
+        except Exception as e:
+            logger.error(f"Error recording review of {session.infinitivo} for user {user_id}: {e}")
+        if is_correct:
+            return None, False, "\n\n✅ Верно!"
+        return None, False, f"\n\n❌ Неверно. Правильный ответ: {session.correct_answer}"
+
+    def slots(self):
+        """Слоты расписания по порядку: (имя, пакетный обработчик, час)"""
+        slots = [
+            ('verb_of_day', self.send_verb_of_the_day_batch, VERB_OF_DAY_HOUR),
+            ('quiz1', self.send_quiz_1_batch, QUIZ_1_HOUR),
+            ('quiz2', self.send_quiz_2_batch, QUIZ_2_HOUR),
+        ]
+        slots.extend(
+            (f'tense_{hour}', functools.partial(self.send_next_tense_batch, slot=f'tense_{hour}'), hour)
+            for hour in TENSE_HOURS
+        )
+        return slots
 
-            # 10:00 - Квиз №1
-            self.scheduler.add_job(
-                self.send_quiz_1,
-                CronTrigger(hour=10, minute=0, timezone=TIMEZONE),
-                args=[user_id],
-                id=f"quiz1_{user_id}",
-                replace_existing=True
-            )
+    def schedule_jobs(self):
+        """
+        Настройка расписания задач.
+        Слоты привязаны к местному времени пользователей, поэтому вместо задачи
+        на каждый слот регистрируется одна задача-тик каждые SLOT_TICK_MINUTES
+        минут по UTC. Тик группирует часовые пояса по текущему смещению от UTC
+        и запускает слоты тех групп, у которых наступил час слота. Размер
+        планировщика не зависит ни от числа пользователей, ни от числа поясов.
+        09:00 - глагол дня, 10:00 - квиз №1, 11:00 - квиз №2,
+        13:00-23:00 - времена глаголов (каждый час).
+        """
+        self.scheduler.add_job(
+            self.run_tick,
+            CronTrigger(minute=f'*/{SLOT_TICK_MINUTES}', timezone=pytz.utc),
+            id="slot_tick",
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True,
+            misfire_grace_time=SLOT_MISFIRE_GRACE_TIME
+        )
 
-            # 11:00 - Квиз №2
+        if VERBS_RELOAD_INTERVAL:
             self.scheduler.add_job(
-                self.send_quiz_2,
-                CronTrigger(hour=11, minute=0, timezone=TIMEZONE),
-                args=[user_id],
-                id=f"quiz2_{user_id}",
-                replace_existing=True
+                self.reload_verbs,
+                IntervalTrigger(seconds=VERBS_RELOAD_INTERVAL),
+                id="reload_verbs",
+                replace_existing=True,
+                max_instances=1,
+                coalesce=True
             )
 
-            # 13:00-23:00 - Времена глаголов (каждый час)
-            for hour in range(13, 24):
-                self.scheduler.add_job(
-                    self.send_next_tense,
-                    CronTrigger(hour=hour, minute=0, timezone=TIMEZONE),
-                    args=[user_id],
-                    id=f"tense_{user_id}_{hour}",
-                    replace_existing=True
-                )
-
-    def add_user_schedule(self, user_id: int):
-        """Добавление расписания для нового пользователя"""
-        # 09:00 - Глагол дня
+        # 04:00 - Очистка старых записей (в шардированном режиме - только в шарде 0)
+        if self.shard is not None and self.shard[0] != 0:
+            return
         self.scheduler.add_job(
-            self.send_verb_of_the_day,
-            CronTrigger(hour=9, minute=0, timezone=TIMEZONE),
-            args=[user_id],
-            id=f"verb_of_day_{user_id}",
-            replace_existing=True
+            self.run_retention,
+            CronTrigger(hour=RETENTION_HOUR, minute=0, timezone=TIMEZONE),
+            id="retention",
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
         )
 
-        # 10:00 - Квиз №1
-        self.scheduler.add_job(
-            self.send_quiz_1,
-            CronTrigger(hour=10, minute=0, timezone=TIMEZONE),
-            args=[user_id],
-            id=f"quiz1_{user_id}",
-            replace_existing=True
+    def zone_buckets(self, now: datetime) -> Dict[timedelta, List[str]]:
+        """Группы часовых поясов с одинаковым смещением от UTC в момент now"""
+        buckets = {}
+        for timezone in self.timezones:
+            offset = now.astimezone(pytz.timezone(timezone)).utcoffset()
+            buckets.setdefault(offset, []).append(timezone)
+        return buckets
+
+    async def run_tick(self, now: Optional[datetime] = None):
+        """
+        Тик расписания: запуск слотов в группах поясов, где сейчас начало часа слота.
+        Работа тика - O(число поясов), рассылка идёт в фоне, чтобы долгий
+        слот не задерживал следующий тик.
+        """
+        now = now or datetime.now(pytz.utc)
+        # Тик мог сработать с опозданием - округляем до его планового времени
+        now = now.replace(minute=now.minute - now.minute % SLOT_TICK_MINUTES, second=0, microsecond=0)
+        self.timezones = await self.state_manager.get_timezones()
+
+        slots_by_hour = {}
+        for slot_name, handler, hour in self.slots():
+            slots_by_hour.setdefault(hour, []).append((slot_name, handler))
+
+        for offset, timezones in self.zone_buckets(now).items():
+            local = now + offset
+            if local.minute != 0:
+                continue
+            for slot_name, handler in slots_by_hour.get(local.hour, []):
+                logger.info(f"Slot {slot_name} is due in {len(timezones)} timezones with UTC offset {offset}")
+                for timezone in timezones:
+                    self._start_slot(slot_name, handler, timezone)
+
+    def _start_slot(self, slot_name: str, handler, timezone: str):
+        task = asyncio.create_task(self.run_slot(slot_name, handler, timezone))
+        self._slot_tasks.add(task)
+        task.add_done_callback(self._slot_done)
+
+    def _slot_done(self, task: asyncio.Task):
+        self._slot_tasks.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.error(f"Error running slot: {task.exception()}")
+
+    @staticmethod
+    def local_date(timezone: str) -> str:
+        """Текущая дата в часовом поясе timezone"""
+        return datetime.now(pytz.timezone(timezone)).date().isoformat()
+
+    async def user_today(self, user_id: int) -> str:
+        """Текущая дата пользователя по его часовому поясу"""
+        timezone = await self.state_manager.get_user_timezone(user_id)
+        return self.local_date(timezone or TIMEZONE.zone)
+
+    def slot_key(self, slot_name: str, timezone: Optional[str] = None) -> str:
+        """
+        Имя прогона слота в БД: у каждого часового пояса и каждого шарда
+        свой прогон и курсор
+        """
+        key = slot_name if timezone is None else f"{slot_name}@{timezone}"
+        if self.shard is None:
+            return key
+        index, count = self.shard
+        return f"{key}#{index}/{count}"
+
+    async def run_slot(self, slot_name: str, handler, timezone: Optional[str] = None):
+        """
+        Рассылка слота пользователям часового пояса timezone (всем, если не
+        задан) с отчётом по очереди отправки.
+        Прогон слота сохраняется в БД по местной дате пояса: уже разосланный
+        сегодня слот не повторяется, а прерванный продолжается с последнего курсора.
+        """
+        slot_key = self.slot_key(slot_name, timezone)
+        if slot_key in self._running_slots:
+            logger.info(f"Slot {slot_key} is already running")
+            return
+
+        today = self.local_date(timezone) if timezone else None
+        self._running_slots.add(slot_key)
+        try:
+            status, cursor = await self.state_manager.begin_slot_run(slot_key, today)
+            if status != SLOT_RUNNING:
+                logger.info(f"Slot {slot_key} already {status} today")
+                return
+            if cursor is not None:
+                logger.info(f"Resuming slot {slot_key} after user {cursor}")
+
+            async def save_cursor(last_user_id: int):
+                await self.state_manager.save_slot_cursor(slot_key, last_user_id, today)
+
+            # Слоты разных поясов могут идти одновременно, поэтому счётчики очереди не сбрасываются
+            before = self.outbound.stats()
+            started = time.perf_counter()
+            count = await self.dispatcher.run(
+                slot_key, functools.partial(handler, today=today),
+                after_user_id=cursor, on_progress=save_cursor, timezone=timezone,
+                active_since=self.active_since()
+            )
+            drain_time = await self.outbound.drain()
+            await self.state_manager.finish_slot_run(slot_key, today=today)
+            SLOT_SECONDS.observe(time.perf_counter() - started, slot_name)
+            SLOT_USERS.inc(slot_name, amount=count)
+        finally:
+            self._running_slots.discard(slot_key)
+
+        stats = self.outbound.stats()
+        sent, failed, blocked, retried, flood_waits = (
+            stats[key] - before[key] for key in ('sent', 'failed', 'blocked', 'retried', 'flood_waits')
         )
+        logger.info(
+            f"Slot {slot_key}: {count} users, sent {sent}, failed {failed} (blocked {blocked}), "
+            f"retried {retried}, flood waits {flood_waits}, "
+            f"max queue depth {stats['max_depth']}, drain time {drain_time:.2f}s"
+        )
+        logger.info(f"Render cache: {self.renderer.stats()}")
+
+    async def catch_up_missed_slots(self):
+        """
+        Догоняющая рассылка слотов, пропущенных сегодня (например, во время перезапуска).
+        Каждый часовой пояс догоняется по своему местному времени, пояса - параллельно.
+        """
+        added = await self.state_manager.get_timezones_added()
+        self.timezones = list(added)
+        await asyncio.gather(*(self._catch_up_timezone(timezone, added[timezone]) for timezone in self.timezones))
+
+    async def _catch_up_timezone(self, timezone: str, added_at: Optional[str] = None):
+        """
+        Догоняющая рассылка одного пояса.
+        Слоты, час которых прошёл до появления пояса в боте (added_at, UTC) -
+        например, при первом запуске после миграции или после /timezone с новым
+        поясом, - не пропущены, а ещё не велись: они отмечаются пропущенными без
+        рассылки. Из пропущенных слотов времён досылаются только последние
+        CATCHUP_MAX_TENSE_SLOTS, а глагол дня и квизы - только при опоздании не
+        больше CATCHUP_MAX_DELAY_HOURS, чтобы не присылать пользователю пачку
+        сообщений разом. Если глагол дня не досылается, он всё равно выбирается
+        (без сообщения), чтобы остальные слоты дня было о чём слать.
+        """
+        # Сначала досылаем времена, зарезервированные до перезапуска
+        await self.drain_tense_outbox(timezone)
+
+        zone = pytz.timezone(timezone)
+        now = datetime.now(zone)
+        today = now.date().isoformat()
+        tracked_since = pytz.utc.localize(datetime.fromisoformat(added_at)) if added_at else None
+        runs = await self.state_manager.get_slot_runs(today)
+        missed, skipped = [], []
+        for slot_name, handler, hour in self.slots():
+            if hour > now.hour or runs.get(self.slot_key(slot_name, timezone), (None, None))[0] in (
+                SLOT_DONE, SLOT_SKIPPED
+            ):
+                continue
+            slot_time = zone.localize(now.replace(tzinfo=None, hour=hour, minute=0, second=0, microsecond=0))
+            if tracked_since is not None and slot_time < tracked_since:
+                skipped.append(slot_name)
+            else:
+                missed.append((slot_name, handler, slot_time))
+        if not missed and not skipped:
+            return
 
-        # 11:00 - Квиз №2
-        self.scheduler.add_job(
-            self.send_quiz_2,
-            CronTrigger(hour=11, minute=0, timezone=TIMEZONE),
-            args=[user_id],
-            id=f"quiz2_{user_id}",
-            replace_existing=True
+        tense_slots = [slot_name for slot_name, _, _ in missed if slot_name.startswith('tense_')]
+        late_tenses = set(tense_slots[:max(len(tense_slots) - CATCHUP_MAX_TENSE_SLOTS, 0)])
+        backlog = []
+        for slot_name, handler, slot_time in missed:
+            if slot_name in late_tenses or (
+                not slot_name.startswith('tense_')
+                and now - slot_time > timedelta(hours=CATCHUP_MAX_DELAY_HOURS)
+            ):
+                skipped.append(slot_name)
+            else:
+                backlog.append((slot_name, handler))
+        if 'verb_of_day' in skipped and VERB_SELECTION != 'deterministic':
+            skipped.remove('verb_of_day')
+            backlog.insert(0, ('verb_of_day', functools.partial(self.send_verb_of_the_day_batch, notify=False)))
+
+        for slot_name in skipped:
+            await self.state_manager.finish_slot_run(self.slot_key(slot_name, timezone), SLOT_SKIPPED, today)
+        logger.info(
+            f"Catching up {len(backlog)} missed slots in {timezone}: {[slot_name for slot_name, _ in backlog]}, "
+            f"skipped {skipped}"
         )
+        for slot_name, handler in backlog:
+            await self.run_slot(slot_name, handler, timezone)
+
+    async def reload_verbs(self):
+        """
+        Горячая перезагрузка словаря без перезапуска бота.
+        Новый набор собирается в потоке, а подменяется в event loop вместе
+        со сбросом кэша текстов и пулов вариантов ответа.
+        """
+        try:
+            loop = asyncio.get_running_loop()
+            update = await loop.run_in_executor(None, self.data_loader.check_for_update)
+            if update is None:
+                return
+            self.data_loader.use_dataset(*update)
+            self.renderer.clear()
+            self.quiz_generator.reset()
+            logger.info(f"Reloaded verbs from {self.data_loader.csv_file}")
+        except Exception as e:
+            logger.error(f"Error reloading verbs: {e}")
 
-        # 13:00-23:00 - Времена глаголов (каждый час)
-        for hour in range(13, 24):
-            self.scheduler.add_job(
-                self.send_next_tense,
-                CronTrigger(hour=hour, minute=0, timezone=TIMEZONE),
-                args=[user_id],
-                id=f"tense_{user_id}_{hour}",
-                replace_existing=True
-            )
+    async def run_retention(self):
+        """Удаление записей старше RETENTION_DAYS и отчёт о размерах таблиц"""
+        try:
+            deleted = await self.state_manager.prune_old_rows(RETENTION_DAYS)
+            sizes = await self.state_manager.get_table_sizes()
+            users = await self.state_manager.get_user_activity(self.active_since())
+            outbox = await self.state_manager.get_outbox_backlog()
+            logger.info(f"Retention: deleted {deleted}, table sizes {sizes}, users {users}, outbox {outbox}")
+        except Exception as e:
+            logger.error(f"Error running retention: {e}")
 
     async def post_init(self, application: Application):
         """Инициализация после запуска бота"""
         self.application = application
+        await self.start_metrics()
+        await self.state_manager.start(self.active_since())
+        await self.start_delivery(application.bot)
+        logger.info(f"Bot initialized and scheduler started, ready in {time.monotonic() - self.started:.3f}s")
+
+    async def start_delivery(self, bot, global_rate: Optional[float] = None):
+        """Запуск очереди отправки, планировщика слотов и догоняющей рассылки"""
+        if global_rate is None:
+            # Лимит Telegram общий на бота, поэтому шарды делят его поровну
+            global_rate = OUTBOUND_GLOBAL_RATE / (self.shard[1] if self.shard else 1)
+        self.outbound = OutboundQueue(
+            bot,
+            senders=OUTBOUND_SENDERS,
+            global_rate=global_rate,
+            chat_rate=OUTBOUND_CHAT_RATE,
+            on_blocked=self.mark_blocked
+        )
+        await self.outbound.start()
+        await self.quiz_results.start()
         self.schedule_jobs()
         self.scheduler.start()
-        logger.info("Bot initialized and scheduler started")
+
+        # Пропущенные слоты досылаются в фоне: время готовности не зависит от числа пользователей
+        self._catch_up_task = asyncio.create_task(self._catch_up())
+
+    async def start_metrics(self):
+        """Запуск HTTP-сервера /metrics, если задан METRICS_PORT"""
+        if not METRICS_PORT:
+            return
+        port = METRICS_PORT + (self.shard[0] + 1 if self.shard else 0)
+        self.metrics_server = MetricsServer(METRICS_HOST, port)
+        await self.metrics_server.start()
+
+    async def stop_metrics(self):
+        if self.metrics_server:
+            await self.metrics_server.stop()
+
+    async def _catch_up(self):
+        try:
+            await self.catch_up_missed_slots()
+        except Exception as e:
+            logger.error(f"Error catching up missed slots: {e}")
+
+    async def post_shutdown(self, application: Application):
+        """Остановка планировщика, очереди отправки и соединения с БД"""
+        await self.stop_delivery()
+
+    async def stop_delivery(self):
+        """Остановка планировщика, очереди отправки и соединения с БД"""
+        self.scheduler.shutdown(wait=False)
+        if self._catch_up_task:
+            self._catch_up_task.cancel()
+        # Прерванные слоты продолжатся с сохранённого курсора после перезапуска
+        for task in self._slot_tasks:
+            task.cancel()
+        await self.outbound.stop()
+        await self.quiz_results.stop()
+        if self._block_task:
+            await self._block_task
+        await self.stop_metrics()
+        await self.state_manager.close()
+
+    def build_application(self, builder=None) -> Application:
+        """Создание приложения с обработчиками (builder можно передать, например, с другим base_url)"""
+        if builder is None:
+            builder = Application.builder().token(TELEGRAM_TOKEN)
+
+        application = (
+            builder
+            .request(outbound_request())
+            .get_updates_request(get_updates_request())
+            .post_init(self.post_init)
+            .post_shutdown(self.post_shutdown)
+            .concurrent_updates(CONCURRENT_UPDATES)
+            .build()
+        )
+
+        # Добавляем обработчики; учёт активности идёт отдельной группой до остальных обработчиков
+        application.add_handler(TypeHandler(Update, self.track_activity), group=-1)
+        application.add_handler(CommandHandler("start", self.start_command))
+        application.add_handler(CommandHandler("status", self.status_command))
+        application.add_handler(CommandHandler("stats", self.stats_command))
+        application.add_handler(CommandHandler("report", self.report_command))
+        application.add_handler(CommandHandler("timezone", self.timezone_command))
+        application.add_handler(CommandHandler("test", self.test_command))
+        application.add_handler(CallbackQueryHandler(self.handle_quiz_callback))
+        return application
 
     def run(self):
         """Запуск бота"""
@@ -434,24 +1096,41 @@ class SpanishVerbBot:
             logger.error("Please set TELEGRAM_BOT_TOKEN in your .env file or environment")
             sys.exit(1)
 
+        if BOT_MODE not in ('polling', 'webhook'):
+            logger.error(f"Unknown BOT_MODE: {BOT_MODE}, expected polling or webhook")
+            sys.exit(1)
+
+        if BOT_MODE == 'webhook' and not WEBHOOK_URL:
+            logger.error("WEBHOOK_URL must be set when BOT_MODE=webhook")
+            sys.exit(1)
+
         try:
             # Создаём приложение
-            application = Application.builder().token(TELEGRAM_TOKEN).post_init(self.post_init).build()
-
-            # Добавляем обработчики
-            application.add_handler(CommandHandler("start", self.start_command))
-            application.add_handler(CommandHandler("status", self.status_command))
-            application.add_handler(CommandHandler("test", self.test_command))
-            application.add_handler(CallbackQueryHandler(self.handle_quiz_callback))
+            application = self.build_application()
 
             # Запускаем бота
-            logger.info("Starting bot...")
-            application.run_polling(allowed_updates=Update.ALL_TYPES)
+            if BOT_MODE == 'webhook':
+                logger.info(f"Starting bot in webhook mode on {WEBHOOK_LISTEN}:{WEBHOOK_PORT}/{WEBHOOK_PATH}...")
+                application.run_webhook(
+                    listen=WEBHOOK_LISTEN,
+                    port=WEBHOOK_PORT,
+                    url_path=WEBHOOK_PATH,
+                    webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}",
+                    secret_token=WEBHOOK_SECRET,
+                    allowed_updates=ALLOWED_UPDATES
+                )
+            else:
+                logger.info("Starting bot in polling mode...")
+                application.run_polling(allowed_updates=ALLOWED_UPDATES)
         except Exception as e:
             logger.error(f"Failed to start bot: {e}")
             sys.exit(1)
 
 
 if __name__ == '__main__':
-    bot = SpanishVerbBot()
-    bot.run()
+    if SHARDS > 1:
+        from sharding import run_sharded
+        run_sharded(SHARDS)
+    else:
+        bot = SpanishVerbBot()
+        bot.run()
@@ -0,0 +1,134 @@
+"""
+Спряжение правильных глаголов на -ar, -er и -ir.
+
+Формы строятся из инфинитива по окончаниям времени (с орфографическими
+изменениями основы вроде busqué и dirijo), поэтому словарю достаточно
+хранить только формы, отличающиеся от правильных (неправильные глаголы,
+чередования гласных в основе). Результат запоминается: повторное
+спряжение того же глагола - поиск в кэше.
+
+Проверка словаря (сколько времён глаголов совпадает с правильным
+спряжением и какие формы отличаются):
+    python conjugator.py verbs.csv
+"""
+import functools
+import sys
+from typing import Dict, Optional, Tuple
+
+# Окончания по спряжениям: (1s, 2s, 3s, 1p, 2p, 3p), добавляются к основе (инфинитив без -ar/-er/-ir)
+STEM_ENDINGS: Dict[str, Dict[str, Tuple[str, ...]]] = {
+    'Presente': {
+        'ar': ('o', 'as', 'a', 'amos', 'áis', 'an'),
+        'er': ('o', 'es', 'e', 'emos', 'éis', 'en'),
+        'ir': ('o', 'es', 'e', 'imos', 'ís', 'en'),
+    },
+    'PreteritoIndefinido': {
+        'ar': ('é', 'aste', 'ó', 'amos', 'asteis', 'aron'),
+        'er': ('í', 'iste', 'ió', 'imos', 'isteis', 'ieron'),
+        'ir': ('í', 'iste', 'ió', 'imos', 'isteis', 'ieron'),
+    },
+    'PreteritoImperfecto': {
+        'ar': ('aba', 'abas', 'aba', 'ábamos', 'abais', 'aban'),
+        'er': ('ía', 'ías', 'ía', 'íamos', 'íais', 'ían'),
+        'ir': ('ía', 'ías', 'ía', 'íamos', 'íais', 'ían'),
+    },
+    'SubjuntivoPresente': {
+        'ar': ('e', 'es', 'e', 'emos', 'éis', 'en'),
+        'er': ('a', 'as', 'a', 'amos', 'áis', 'an'),
+        'ir': ('a', 'as', 'a', 'amos', 'áis', 'an'),
+    },
+    'SubjuntivoImperfecto': {
+        'ar': ('ara', 'aras', 'ara', 'áramos', 'arais', 'aran'),
+        'er': ('iera', 'ieras', 'iera', 'iéramos', 'ierais', 'ieran'),
+        'ir': ('iera', 'ieras', 'iera', 'iéramos', 'ierais', 'ieran'),
+    },
+}
+
+# Окончания, которые добавляются к инфинитиву целиком
+INFINITIVE_ENDINGS: Dict[str, Tuple[str, ...]] = {
+    'FuturoSimple': ('é', 'ás', 'á', 'emos', 'éis', 'án'),
+    'Condicional': ('ía', 'ías', 'ía', 'íamos', 'íais', 'ían'),
+}
+
+# Сложные времена: формы haber + причастие
+AUXILIARY: Dict[str, Tuple[str, ...]] = {
+    'PreteritoPerfecto': ('he', 'has', 'ha', 'hemos', 'habéis', 'han'),
+    'Pluscuamperfecto': ('había', 'habías', 'había', 'habíamos', 'habíais', 'habían'),
+    'FuturoPerfecto': ('habré', 'habrás', 'habrá', 'habremos', 'habréis', 'habrán'),
+}
+
+PARTICIPLE_ENDINGS = {'ar': 'ado', 'er': 'ido', 'ir': 'ido'}
+
+# Орфографические изменения основы, сохраняющие произношение: перед e у глаголов на -ar
+# (busqué, llegué, empecé) и перед a/o у глаголов на -er/-ir (dirijo, recoja, venzo)
+SPELLING = {
+    'ar': ('eé', {'c': 'qu', 'g': 'gu', 'z': 'c'}),
+    'er': ('ao', {'g': 'j', 'c': 'z'}),
+    'ir': ('ao', {'g': 'j', 'c': 'z'}),
+}
+
+# Времена, которые умеет строить спряжение
+TENSES = (*STEM_ENDINGS, *INFINITIVE_ENDINGS, *AUXILIARY)
+
+# Сколько спряжений (глагол, время) помнит кэш. Записи глаголов хранят только неправильные
+# времена, поэтому кэш - единственное место, где держатся правильные формы: его хватает
+# на глаголы дня и квизов, остальные строятся заново за несколько микросекунд
+CACHE_SIZE = 4096
+
+
+def participle(infinitivo: str) -> Optional[str]:
+    """Правильное причастие: hablar -> hablado, comer -> comido"""
+    ending = infinitivo[-2:]
+    if len(infinitivo) < 3 or ending not in PARTICIPLE_ENDINGS:
+        return None
+    return infinitivo[:-2] + PARTICIPLE_ENDINGS[ending]
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def conjugate(infinitivo: str, tense: str) -> Optional[Tuple[str, ...]]:
+    """
+    Правильные формы глагола во времени tense: (1s, 2s, 3s, 1p, 2p, 3p).
+    None - если время неизвестно или инфинитив не оканчивается на -ar/-er/-ir
+    (например, возвратные глаголы на -se): такие формы хранятся в словаре.
+    """
+    ending = infinitivo[-2:]
+    if len(infinitivo) < 3 or ending not in PARTICIPLE_ENDINGS:
+        return None
+    if tense in STEM_ENDINGS:
+        stem = infinitivo[:-2]
+        vowels, changes = SPELLING[ending]
+        changed = stem[:-1] + changes[stem[-1]] if stem[-1] in changes else stem
+        return tuple(
+            (changed if suffix[0] in vowels else stem) + suffix
+            for suffix in STEM_ENDINGS[tense][ending]
+        )
+    if tense in INFINITIVE_ENDINGS:
+        return tuple(infinitivo + suffix for suffix in INFINITIVE_ENDINGS[tense])
+    if tense in AUXILIARY:
+        past = participle(infinitivo)
+        return tuple(f'{auxiliary} {past}' for auxiliary in AUXILIARY[tense])
+    return None
+
+
+def is_regular(infinitivo: str, tense: str, forms: Tuple[str, ...]) -> bool:
+    """Совпадают ли формы с правильным спряжением"""
+    return tuple(forms) == conjugate(infinitivo, tense)
+
+
+if __name__ == '__main__':
+    from verb_dataset import read_csv
+
+    tenses, records = read_csv(sys.argv[1] if len(sys.argv) > 1 else 'verbs.csv')
+    regular = total = 0
+    for _, infinitivo, _, forms in records:
+        for tense, tense_forms in zip(tenses, forms):
+            expected = conjugate(infinitivo, tense)
+            if expected is None:
+                continue
+            total += 1
+            if expected == tense_forms:
+                regular += 1
+            else:
+                diff = ', '.join(f'{form} ({want})' for form, want in zip(tense_forms, expected) if form != want)
+                print(f"{infinitivo} {tense}: {diff}")
+    print(f"Regular: {regular} of {total} verb tenses ({regular * 100 // max(total, 1)}%)")
@@ -1,76 +1,195 @@
-import csv
+import logging
+import os
 import random
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from conjugator import conjugate
+from metrics import REGISTRY
+from verb_dataset import MISSING_FORM, PERSONS, CompiledVerbs, csv_hash, csv_stat, open_compiled
+from verb_schedule import daily_verb_id, day_number
+
+logger = logging.getLogger(__name__)
+
+# Формы для времени, которого нет у глагола
+MISSING_FORMS = (MISSING_FORM,) * len(PERSONS)
+
+# Для скольких дат помнится порядок глаголов дня: пользователи в разных поясах
+# одновременно живут в соседних датах
+DAILY_SNAPSHOTS = 3
+
+VERB_LOOKUPS = REGISTRY.counter('bot_verb_lookups_total', 'Verb dataset lookups', ['kind', 'result'])
+
+
+class Verb:
+    """
+    Компактная запись глагола.
+    Формы хранятся кортежем кортежей: forms[tense_id][person_id];
+    правильные времена - None, их строит get_tense_forms.
+    """
+
+    __slots__ = ('verb_id', 'popularity', 'infinitivo', 'translation_ru', 'forms')
+
+    def __init__(self, verb_id: int, popularity: str, infinitivo: str,
+                 translation_ru: str, forms: Tuple[Optional[Tuple[str, ...]], ...]):
+        self.verb_id = verb_id
+        self.popularity = popularity
+        self.infinitivo = infinitivo
+        self.translation_ru = translation_ru
+        self.forms = forms
+
+    def __repr__(self):
+        return f"Verb({self.infinitivo!r}, {self.translation_ru!r})"
 
 
 class VerbDataLoader:
-    """Класс для загрузки и работы с данными глаголов из CSV"""
+    """
+    Класс для загрузки и работы с данными глаголов.
 
-    def __init__(self, csv_file: str):
+    CSV компилируется в бинарный файл (см. verb_dataset.py), который
+    открывается через mmap без разбора, поэтому старт не зависит от размера
+    словаря. Записи Verb создаются при первом обращении к глаголу.
+    """
+
+    def __init__(self, csv_file: str, compiled_file: Optional[str] = None):
         self.csv_file = csv_file
-        self.verbs: List[Dict] = []
+        # По умолчанию скомпилированный файл лежит рядом с CSV: verbs.csv -> verbs.bin
+        self.compiled_file = compiled_file or os.path.splitext(csv_file)[0] + '.bin'
         self.tenses: List[str] = []
+        self.tense_ids: Dict[str, int] = {}
+        self._dataset: Optional[CompiledVerbs] = None
+        self._by_id: List[Optional[Verb]] = []
+        self._by_infinitivo: Dict[str, Optional[Verb]] = {}
+        self._all_verbs: Optional[List[Verb]] = None
+        self._infinitivos: Optional[Tuple[str, ...]] = None
+        self._daily_infinitivos: Dict[str, Tuple[str, ...]] = {}
+        self._source_stat = None
         self.load_data()
 
     def load_data(self):
-        """Загрузка данных из CSV файла"""
-        with open(self.csv_file, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            self.verbs = list(reader)
-
-        # Определяем доступные времена из заголовков
-        if self.verbs:
-            # Получаем все ключи, которые содержат времена
-            tense_keys = [key for key in self.verbs[0].keys() if '__' in key]
-            # Извлекаем уникальные названия времён
-            tenses_set = set()
-            for key in tense_keys:
-                tense_name = key.split('__')[0]
-                tenses_set.add(tense_name)
-            self.tenses = sorted(list(tenses_set))
-
-    def get_random_verb(self) -> Dict:
+        """Загрузка скомпилированного набора (с пересборкой, если CSV изменился)"""
+        self.use_dataset(csv_stat(self.csv_file), open_compiled(self.csv_file, self.compiled_file))
+
+    def check_for_update(self) -> Optional[Tuple[tuple, CompiledVerbs]]:
+        """
+        Загрузить новый набор, если CSV изменился, иначе None. Состояние
+        загрузчика не меняется, поэтому проверку можно выполнять в другом потоке.
+        Дешёвая проверка по stat, хеш считается, только если изменились
+        время изменения или размер файла.
+        """
+        source_stat = csv_stat(self.csv_file)
+        if source_stat == self._source_stat:
+            return None
+        if csv_hash(self.csv_file) == self._dataset.source_hash:
+            self._source_stat = source_stat
+            return None
+        return source_stat, open_compiled(self.csv_file, self.compiled_file)
+
+    def reload_if_changed(self) -> bool:
+        """Перезагрузить набор, если CSV изменился"""
+        update = self.check_for_update()
+        if update is None:
+            return False
+        self.use_dataset(*update)
+        return True
+
+    def use_dataset(self, source_stat: tuple, dataset: CompiledVerbs):
+        """Переключиться на набор dataset; записи Verb создаются заново при обращении"""
+        self.tenses = dataset.tenses
+        self.tense_ids = {tense: tense_id for tense_id, tense in enumerate(self.tenses)}
+        self._by_id = [None] * dataset.count
+        self._by_infinitivo = {}
+        self._all_verbs = None
+        self._infinitivos = None
+        self._dataset = dataset
+        self._source_stat = source_stat
+        logger.info(f"Loaded verb dataset {self.compiled_file}: {dataset.count} verbs, {len(self.tenses)} tenses")
+
+    def _verb(self, verb_id: int) -> Verb:
+        """Запись глагола по номеру, создаётся при первом обращении"""
+        verb = self._by_id[verb_id]
+        if verb is None:
+            verb = Verb(verb_id, *self._dataset.record(verb_id))
+            self._by_id[verb_id] = verb
+        return verb
+
+    @property
+    def verbs(self) -> List[Verb]:
+        return self.get_all_verbs()
+
+    def get_random_verb(self) -> Verb:
         """Получить случайный глагол"""
-        return random.choice(self.verbs)
+        VERB_LOOKUPS.inc('random', 'hit')
+        return self._verb(random.randrange(self._dataset.count))
+
+    def _sorted_infinitivos(self) -> Tuple[str, ...]:
+        if self._infinitivos is None:
+            self._infinitivos = self._dataset.sorted_infinitivos()
+        return self._infinitivos
+
+    def _daily_order(self, today: str) -> Tuple[str, ...]:
+        """
+        Порядок глаголов, по которому выбираются глаголы дня на дату today:
+        инфинитивы по алфавиту, зафиксированные при первом выборе на эту дату.
+        Перезагрузка словаря в течение дня не меняет уже выданные глаголы.
+        """
+        infinitivos = self._daily_infinitivos.get(today)
+        if infinitivos is None:
+            infinitivos = self._daily_infinitivos[today] = self._sorted_infinitivos()
+            if len(self._daily_infinitivos) > DAILY_SNAPSHOTS:
+                del self._daily_infinitivos[min(date for date in self._daily_infinitivos if date != today)]
+        return infinitivos
+
+    def get_verbs_of_the_day(self, user_ids: Iterable[int], today: str) -> Dict[int, Verb]:
+        """Глаголы дня пользователей на дату today без обращения к БД (см. verb_schedule.py)"""
+        infinitivos, day = self._daily_order(today), day_number(today)
+        count = len(infinitivos)
+        verbs = {}
+        for user_id in user_ids:
+            verb = self._find(infinitivos[daily_verb_id(user_id, day, count)])
+            if verb is None:
+                # Глагол удалён из словаря после начала дня: выбор по текущему словарю
+                current = self._sorted_infinitivos()
+                verb = self._find(current[daily_verb_id(user_id, day, len(current))])
+            verbs[user_id] = verb
+        VERB_LOOKUPS.inc('daily', 'hit', amount=len(verbs))
+        return verbs
 
-    def get_verb_by_infinitivo(self, infinitivo: str) -> Optional[Dict]:
+    def _find(self, infinitivo: str) -> Optional[Verb]:
+        try:
+            return self._by_infinitivo[infinitivo]
+        except KeyError:
+            # Первое обращение - бинарный поиск по индексу, дальше - словарь
+            verb_id = self._dataset.find(infinitivo)
+            verb = self._by_infinitivo[infinitivo] = self._verb(verb_id) if verb_id is not None else None
+            return verb
+
+    def get_verb_by_infinitivo(self, infinitivo: str) -> Optional[Verb]:
         """Получить глагол по инфинитиву"""
-        for verb in self.verbs:
-            if verb['infinitivo'] == infinitivo:
-                return verb
-        return None
+        verb = self._find(infinitivo)
+        VERB_LOOKUPS.inc('infinitivo', 'hit' if verb is not None else 'miss')
+        return verb
 
     def get_tenses(self) -> List[str]:
         """Получить список всех времён"""
         return self.tenses
 
-    def get_tense_forms(self, verb_data: Dict, tense: str) -> List[str]:
+    def get_tense_forms(self, verb_data: Verb, tense: str) -> Tuple[str, ...]:
         """
         Получить все формы глагола для указанного времени
-        Возвращает список форм: [1s, 2s, 3s, 1p, 2p, 3p]
+        Возвращает кортеж форм: (1s, 2s, 3s, 1p, 2p, 3p)
         """
-        forms = []
-        for person in ['1s', '2s', '3s', '1p', '2p', '3p']:
-            key = f"{tense}__{person}"
-            forms.append(verb_data.get(key, '—'))
+        tense_id = self.tense_ids.get(tense)
+        if tense_id is None:
+            return MISSING_FORMS
+        forms = verb_data.forms[tense_id]
+        if forms is None:
+            # Правильное время: формы из инфинитива, частые глаголы в кэше conjugate()
+            forms = conjugate(verb_data.infinitivo, tense)
         return forms
 
-    def get_all_verbs(self) -> List[Dict]:
+    def get_all_verbs(self) -> List[Verb]:
         """Получить все глаголы"""
-        return self.verbs
-
-    def get_random_translations(self, exclude: str, count: int = 3) -> List[str]:
-        """
-        Получить случайные переводы, исключая указанный
-        Используется для генерации вариантов ответов в квизах
-        """
-        available = [v['translation_ru'] for v in self.verbs if v['translation_ru'] != exclude]
-        return random.sample(available, min(count, len(available)))
-
-    def get_random_infinitivos(self, exclude: str, count: int = 3) -> List[str]:
-        """
-        Получить случайные инфинитивы, исключая указанный
-        Используется для генерации вариантов ответов в квизах
-        """
-        available = [v['infinitivo'] for v in self.verbs if v['infinitivo'] != exclude]
-        return random.sample(available, min(count, len(available)))
+        if self._all_verbs is None:
+            self._dataset.decode_all()
+            self._all_verbs = [self._verb(verb_id) for verb_id in range(self._dataset.count)]
+        return self._all_verbs
@@ -0,0 +1,135 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Попыток обработать страницу и пауза перед первым повтором (удваивается), секунд
+PAGE_ATTEMPTS = 3
+PAGE_RETRY_DELAY = 1.0
+
+
+class SlotDispatcher:
+    """
+    Рассылка одного слота расписания всем пользователям.
+
+    Вместо отдельной задачи планировщика на каждого пользователя слот
+    запускается одной задачей: список пользователей читается из StateManager
+    страницами, и каждая страница целиком передаётся пакетному обработчику.
+    Обработчик работает с состоянием страницы за O(1) транзакций, а
+    одновременно обрабатывается не больше workers страниц.
+    В режиме шардирования (shard = (index, count)) рассылаются только
+    пользователи своего шарда. Заблокировавшие бота пользователи пропускаются.
+    Страница, обработчик которой упал PAGE_ATTEMPTS раз подряд, не сдвигает
+    курсор: прогон завершается ошибкой, а повторный прогон (догоняющая
+    рассылка после перезапуска) продолжает с первой необработанной страницы.
+    """
+
+    def __init__(self, state_manager, workers: int = 2, batch_size: int = 500,
+                 shard: Optional[Tuple[int, int]] = None, retry_delay: float = PAGE_RETRY_DELAY):
+        self.state_manager = state_manager
+        self.workers = workers
+        self.batch_size = batch_size
+        self.shard = shard
+        self.retry_delay = retry_delay
+
+    async def run(self, slot_name: str, handler: Callable[[List[int]], Awaitable[None]],
+                  after_user_id: Optional[int] = None,
+                  on_progress: Optional[Callable[[int], Awaitable[None]]] = None,
+                  timezone: Optional[str] = None, active_since: Optional[str] = None) -> int:
+        """
+        Запустить слот для пользователей после after_user_id (только часового
+        пояса timezone, если он задан, и только обращавшихся к боту с даты
+        active_since), вернуть число обработанных.
+        on_progress получает курсор - user_id, до которого включительно
+        обработаны все страницы (страницы воркеров завершаются не по порядку).
+        Если какую-то страницу обработать не удалось, после остальных страниц
+        выбрасывается RuntimeError, а курсор остаётся перед этой страницей.
+        """
+        started = time.monotonic()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.workers)
+        progress = _Progress(on_progress)
+        workers = [
+            asyncio.create_task(self._worker(slot_name, queue, handler, progress))
+            for _ in range(self.workers)
+        ]
+
+        count = 0
+        try:
+            async for user_ids in self.state_manager.iter_user_batches(
+                self.batch_size, after_user_id, self.shard, timezone,
+                active_only=True, active_since=active_since
+            ):
+                await queue.put((progress.next_page(), user_ids))
+                count += len(user_ids)
+        finally:
+            # Сигнал завершения для каждого воркера
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+
+        if progress.failed:
+            raise RuntimeError(
+                f"Slot {slot_name}: {progress.failed} pages failed, progress saved before the first of them"
+            )
+        logger.info(
+            f"Slot {slot_name} dispatched to {count} users "
+            f"in {time.monotonic() - started:.2f}s"
+        )
+        return count
+
+    async def _worker(self, slot_name: str, queue: asyncio.Queue,
+                      handler: Callable[[List[int]], Awaitable[None]], progress: '_Progress'):
+        """Воркер пула: обрабатывает страницы пользователей до сигнала завершения"""
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            page, user_ids = item
+            for attempt in range(1, PAGE_ATTEMPTS + 1):
+                try:
+                    await handler(user_ids)
+                    break
+                except Exception as e:
+                    logger.error(
+                        f"Error in slot {slot_name} for users {user_ids[0]}..{user_ids[-1]} "
+                        f"(attempt {attempt} of {PAGE_ATTEMPTS}): {e}"
+                    )
+                    if attempt < PAGE_ATTEMPTS:
+                        await asyncio.sleep(self.retry_delay * 2 ** (attempt - 1))
+            else:
+                # Курсор не переходит через необработанную страницу
+                progress.failed += 1
+                continue
+            await progress.done(page, user_ids[-1])
+
+
+class _Progress:
+    """Курсор непрерывно обработанного префикса страниц"""
+
+    def __init__(self, on_progress: Optional[Callable[[int], Awaitable[None]]]):
+        self.on_progress = on_progress
+        self._pages = 0
+        self._next = 0
+        self._finished: Dict[int, int] = {}
+        self.failed = 0
+
+    def next_page(self) -> int:
+        page = self._pages
+        self._pages += 1
+        return page
+
+    async def done(self, page: int, last_user_id: int):
+        if self.on_progress is None:
+            return
+        self._finished[page] = last_user_id
+        cursor = None
+        while self._next in self._finished:
+            cursor = self._finished.pop(self._next)
+            self._next += 1
+        if cursor is not None:
+            try:
+                await self.on_progress(cursor)
+            except Exception as e:
+                logger.error(f"Error saving slot progress at user {cursor}: {e}")
@@ -0,0 +1,105 @@
+import random
+from typing import Dict, FrozenSet, List, Sequence, Tuple
+
+from data_loader import Verb
+
+
+def _meanings(translation: str) -> FrozenSet[str]:
+    """Набор значений перевода: 'быть, находиться' -> {'быть', 'находиться'}"""
+    return frozenset(
+        part.strip().lower()
+        for part in translation.replace(';', ',').split(',')
+        if part.strip()
+    )
+
+
+def _with(indexes: FrozenSet[int], index: int) -> FrozenSet[int]:
+    """Множество с добавленным индексом; без копирования, если он уже есть"""
+    return indexes if index in indexes else indexes | {index}
+
+
+class DistractorEngine:
+    """
+    Предвычисленные пулы неправильных вариантов ответа для квизов.
+
+    Пул кандидатов общий для всех глаголов: кортеж уникальных переводов
+    (или инфинитивов) без повторов. Для каждого глагола заранее вычисляется
+    небольшое множество исключений - сам ответ и его синонимы (глаголы,
+    у которых совпадает хотя бы одно значение перевода, как у ser и estar).
+    Выборка k вариантов делается за O(k) без копирования пула.
+    """
+
+    def __init__(self, verbs: Sequence[Verb], rng: random.Random = None):
+        self.rng = rng or random.Random()
+
+        # Уникальные переводы и инфинитивы в порядке первого появления
+        self.translations: Tuple[str, ...] = tuple(dict.fromkeys(v.translation_ru for v in verbs))
+        self.infinitivos: Tuple[str, ...] = tuple(dict.fromkeys(v.infinitivo for v in verbs))
+        translation_index = {value: index for index, value in enumerate(self.translations)}
+        infinitivo_index = {value: index for index, value in enumerate(self.infinitivos)}
+
+        # Группы синонимов по каждому значению перевода
+        meanings = {v.translation_ru: _meanings(v.translation_ru) for v in verbs}
+        by_meaning: Dict[str, List[Verb]] = {}
+        for verb in verbs:
+            for meaning in meanings[verb.translation_ru]:
+                by_meaning.setdefault(meaning, []).append(verb)
+
+        # Исключения для каждого инфинитива: индексы синонимов в пулах.
+        # Синонимы зависят только от перевода, поэтому считаются один раз на перевод.
+        self._excluded_translations: Dict[str, FrozenSet[int]] = {}
+        self._excluded_infinitivos: Dict[str, FrozenSet[int]] = {}
+        by_translation: Dict[str, Tuple[FrozenSet[int], FrozenSet[int]]] = {}
+        for verb in verbs:
+            excluded = by_translation.get(verb.translation_ru)
+            if excluded is None:
+                synonyms = [
+                    synonym
+                    for meaning in meanings[verb.translation_ru]
+                    for synonym in by_meaning[meaning]
+                ]
+                excluded = (
+                    frozenset(translation_index[synonym.translation_ru] for synonym in synonyms),
+                    frozenset(infinitivo_index[synonym.infinitivo] for synonym in synonyms),
+                )
+                by_translation[verb.translation_ru] = excluded
+
+            # Множества общие для глаголов с одинаковым переводом
+            excluded_translations, excluded_infinitivos = excluded
+            self._excluded_translations.setdefault(
+                verb.infinitivo, _with(excluded_translations, translation_index[verb.translation_ru])
+            )
+            self._excluded_infinitivos.setdefault(
+                verb.infinitivo, _with(excluded_infinitivos, infinitivo_index[verb.infinitivo])
+            )
+
+    def _sample(self, pool: Tuple[str, ...], excluded: FrozenSet[int], count: int) -> List[str]:
+        """Выбрать count различных элементов пула, не входящих в excluded"""
+        available = len(pool) - len(excluded)
+        count = min(count, available)
+        if count <= 0:
+            return []
+
+        if available < 2 * count:
+            # Кандидатов почти не осталось: случайные попадания стали бы редкими
+            candidates = [value for index, value in enumerate(pool) if index not in excluded]
+            return self.rng.sample(candidates, count)
+
+        chosen: Dict[int, None] = {}
+        randrange = self.rng.randrange
+        size = len(pool)
+        while len(chosen) < count:
+            index = randrange(size)
+            if index not in excluded:
+                chosen[index] = None
+        return [pool[index] for index in chosen]
+
+    def translation_distractors(self, verb: Verb, count: int = 3) -> List[str]:
+        """Неправильные переводы для квиза инфинитив → перевод"""
+        excluded = self._excluded_translations.get(verb.infinitivo, frozenset())
+        return self._sample(self.translations, excluded, count)
+
+    def infinitivo_distractors(self, verb: Verb, count: int = 3) -> List[str]:
+        """Неправильные инфинитивы для квиза перевод → инфинитив"""
+        excluded = self._excluded_infinitivos.get(verb.infinitivo, frozenset())
+        return self._sample(self.infinitivos, excluded, count)
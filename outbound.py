@@ -0,0 +1,285 @@
+import asyncio
+import logging
+import time
+from typing import Callable, Dict, Optional
+
+import httpx
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TimedOut
+
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+SEND_SECONDS = REGISTRY.histogram('bot_telegram_send_seconds', 'Telegram sendMessage call latency')
+OUTBOUND_MESSAGES = REGISTRY.counter(
+    'bot_outbound_messages_total', 'Outbound send attempts by result', ['result']
+)
+QUEUE_DEPTH = REGISTRY.gauge('bot_outbound_queue_depth', 'Messages waiting in the outbound queue')
+
+# BadRequest, после которых отправлять в чат больше нельзя (чат удалён или не существует)
+PERMANENT_BAD_REQUESTS = ('chat not found', 'user not found')
+
+
+def is_permanent_error(error: Exception) -> bool:
+    """Ошибка отправки означает, что чат больше недоступен (бот заблокирован, аккаунт удалён)"""
+    if isinstance(error, Forbidden):
+        return True
+    return isinstance(error, BadRequest) and any(
+        text in error.message.lower() for text in PERMANENT_BAD_REQUESTS
+    )
+
+
+def may_be_delivered(error: TimedOut) -> bool:
+    """
+    Тайм-аут после отправки запроса (ожидание ответа, запись тела): Telegram мог
+    уже доставить сообщение. Тайм-ауты соединения и пула - запрос не отправлялся
+    """
+    return not isinstance(error.__cause__, (httpx.ConnectTimeout, httpx.PoolTimeout))
+
+
+class TokenBucket:
+    """
+    Token bucket для ограничения частоты отправки.
+    Токены резервируются заранее, поэтому конкурентные отправители
+    получают свою очередь без блокировок.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def reserve(self) -> float:
+        """Зарезервировать токен, вернуть задержку в секундах до его появления"""
+        now = time.monotonic()
+        start = max(now, self.paused_until)
+        self._refill(start)
+        self.tokens -= 1
+        delay = start - now
+        if self.tokens < 0:
+            delay += -self.tokens / self.rate
+        return delay
+
+    def pause(self, seconds: float):
+        """Остановить выдачу токенов на указанное время (flood control)"""
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens = min(self.tokens, 0.0)
+        # Пересекающиеся паузы не суммируются, а продлевают друг друга
+        self.paused_until = max(self.paused_until, now + seconds)
+        self.updated = max(self.updated, self.paused_until)
+
+    def is_full(self) -> bool:
+        """Bucket полностью восстановился и его можно забыть"""
+        self._refill(time.monotonic())
+        return self.tokens >= self.capacity
+
+
+class _OutboundMessage:
+    """Сообщение в очереди отправки"""
+
+    __slots__ = ('chat_id', 'kwargs', 'future', 'attempts')
+
+    def __init__(self, chat_id: int, kwargs: dict, future: asyncio.Future):
+        self.chat_id = chat_id
+        self.kwargs = kwargs
+        self.future = future
+        self.attempts = 0
+
+
+class OutboundQueue:
+    """
+    Асинхронная очередь исходящих сообщений.
+
+    Ограничивает частоту отправки глобально для бота и для каждого чата,
+    отправляет сообщения несколькими конкурентными отправителями и повторяет
+    отправку после RetryAfter и сетевых ошибок, не теряя сообщения. Тайм-аут
+    уже отправленного запроса не повторяется, чтобы не прислать сообщение дважды.
+    Чаты с постоянной ошибкой доставки передаются в on_blocked.
+    """
+
+    def __init__(self, bot, senders: int = 8, global_rate: float = 30.0,
+                 global_burst: float = 1.0, chat_rate: float = 1.0, chat_burst: float = 3.0,
+                 max_retries: int = 5, backoff: float = 1.0,
+                 on_blocked: Optional[Callable[[int], None]] = None):
+        self.bot = bot
+        self.on_blocked = on_blocked
+        self.senders = senders
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.chat_buckets: Dict[int, TokenBucket] = {}
+        self._prune_at = 10000
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers = []
+        self._pending = 0
+        self._idle: Optional[asyncio.Event] = None
+        self._busy_since: Optional[float] = None
+
+        # Статистика
+        self.sent = 0
+        self.failed = 0
+        self.blocked = 0
+        self.retried = 0
+        self.flood_waits = 0
+        self.max_depth = 0
+        self.last_drain_time = 0.0
+
+    async def start(self):
+        """Запуск отправителей"""
+        self._queue = asyncio.Queue()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._workers = [asyncio.create_task(self._sender()) for _ in range(self.senders)]
+        QUEUE_DEPTH.set_function(self.queue_depth)
+        logger.info(f"Outbound queue started with {self.senders} senders")
+
+    async def stop(self):
+        """Дождаться отправки оставшихся сообщений и остановить отправителей"""
+        if not self._workers:
+            return
+        await self.drain()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def send_message(self, chat_id: int, **kwargs):
+        """Поставить сообщение в очередь и дождаться результата отправки"""
+        future = asyncio.get_running_loop().create_future()
+        self._enqueue(_OutboundMessage(chat_id, kwargs, future))
+        self._pending += 1
+        if self._busy_since is None:
+            self._busy_since = time.monotonic()
+        self._idle.clear()
+        return await future
+
+    async def drain(self) -> float:
+        """Дождаться опустошения очереди, вернуть время последней разгрузки"""
+        await self._idle.wait()
+        return self.last_drain_time
+
+    def queue_depth(self) -> int:
+        """Количество сообщений, ожидающих отправки"""
+        return self._queue.qsize() if self._queue else 0
+
+    def stats(self) -> dict:
+        """Статистика очереди"""
+        return {
+            'queue_depth': self.queue_depth(),
+            'pending': self._pending,
+            'max_depth': self.max_depth,
+            'sent': self.sent,
+            'failed': self.failed,
+            'blocked': self.blocked,
+            'retried': self.retried,
+            'flood_waits': self.flood_waits,
+            'last_drain_time': self.last_drain_time,
+        }
+
+    def _enqueue(self, message: _OutboundMessage):
+        self._queue.put_nowait(message)
+        self.max_depth = max(self.max_depth, self._queue.qsize())
+
+    def _finish(self, message: _OutboundMessage, result=None, error: Exception = None):
+        """Завершить обработку сообщения и обновить учёт очереди"""
+        if not message.future.done():
+            if error is not None:
+                message.future.set_exception(error)
+            else:
+                message.future.set_result(result)
+        self._pending -= 1
+        if self._pending == 0:
+            self.last_drain_time = time.monotonic() - self._busy_since
+            self._busy_since = None
+            self._idle.set()
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self.chat_buckets) >= self._prune_at:
+                # Забываем восстановившиеся buckets, чтобы словарь не рос бесконечно
+                self.chat_buckets = {
+                    key: value for key, value in self.chat_buckets.items() if not value.is_full()
+                }
+                self._prune_at = max(10000, 2 * len(self.chat_buckets))
+            bucket = TokenBucket(self.chat_rate, self.chat_burst)
+            self.chat_buckets[chat_id] = bucket
+        return bucket
+
+    def _requeue_later(self, message: _OutboundMessage, delay: float):
+        """Вернуть сообщение в очередь через delay секунд"""
+        self.retried += 1
+        asyncio.get_running_loop().call_later(delay, self._enqueue, message)
+
+    def _retry_network(self, message: _OutboundMessage, error: NetworkError):
+        """Повторить отправку после сетевой ошибки с экспоненциальной задержкой"""
+        message.attempts += 1
+        if message.attempts > self.max_retries:
+            self.failed += 1
+            OUTBOUND_MESSAGES.inc('failed')
+            self._finish(message, error=error)
+        else:
+            OUTBOUND_MESSAGES.inc('network_retry')
+            self._requeue_later(message, self.backoff * 2 ** (message.attempts - 1))
+
+    async def _sender(self):
+        """Отправитель: берёт сообщения из очереди с учётом лимитов"""
+        while True:
+            message = await self._queue.get()
+
+            delay = self._chat_bucket(message.chat_id).reserve()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            delay = self.global_bucket.reserve()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            try:
+                with SEND_SECONDS.time():
+                    result = await self.bot.send_message(chat_id=message.chat_id, **message.kwargs)
+            except RetryAfter as e:
+                # Flood control распространяется на весь бот: приостанавливаем всех отправителей
+                self.flood_waits += 1
+                OUTBOUND_MESSAGES.inc('flood_wait')
+                self.global_bucket.pause(e.retry_after)
+                logger.warning(f"Flood control for chat {message.chat_id}, retry in {e.retry_after}s")
+                self._requeue_later(message, e.retry_after)
+            except (Forbidden, BadRequest) as e:
+                self.failed += 1
+                if is_permanent_error(e):
+                    self.blocked += 1
+                    OUTBOUND_MESSAGES.inc('blocked')
+                    if self.on_blocked:
+                        self.on_blocked(message.chat_id)
+                else:
+                    OUTBOUND_MESSAGES.inc('failed')
+                self._finish(message, error=e)
+            except TimedOut as e:
+                if may_be_delivered(e):
+                    self.failed += 1
+                    OUTBOUND_MESSAGES.inc('timed_out')
+                    logger.warning(f"Sending to chat {message.chat_id} timed out after the request, not retrying")
+                    self._finish(message, error=e)
+                else:
+                    self._retry_network(message, e)
+            except NetworkError as e:
+                self._retry_network(message, e)
+            except Exception as e:
+                self.failed += 1
+                OUTBOUND_MESSAGES.inc('failed')
+                self._finish(message, error=e)
+            else:
+                self.sent += 1
+                OUTBOUND_MESSAGES.inc('sent')
+                self._finish(message, result=result)
@@ -1,5 +1,8 @@
 import random
-from typing import Dict, List
+from typing import Iterable, List
+
+from data_loader import Verb
+from distractors import DistractorEngine
 
 
 class QuizGenerator:
@@ -7,29 +10,57 @@ class QuizGenerator:
 
     def __init__(self, data_loader):
         self.data_loader = data_loader
+        self._distractors = None
+
+    @property
+    def distractors(self) -> DistractorEngine:
+        """Пулы неправильных вариантов строятся при первом квизе, а не при старте бота"""
+        if self._distractors is None:
+            self._distractors = DistractorEngine(self.data_loader.get_all_verbs())
+        return self._distractors
 
-    def generate_translation_quiz(self, verb_data: Dict) -> List[str]:
+    def reset(self):
+        """Сбросить пулы (например, после перезагрузки данных глаголов)"""
+        self._distractors = None
+
+    def generate_translation_quiz(self, verb_data: Verb) -> List[str]:
         """
         Генерация квиза №1: инфинитив → перевод
         Возвращает список из 4 вариантов (1 правильный + 3 неправильных)
         """
-        correct = verb_data['translation_ru']
-        wrong = self.data_loader.get_random_translations(exclude=correct, count=3)
-
-        options = [correct] + wrong
+        options = [verb_data.translation_ru] + self.distractors.translation_distractors(verb_data, count=3)
         random.shuffle(options)
 
         return options
 
-    def generate_infinitivo_quiz(self, verb_data: Dict) -> List[str]:
+    def generate_infinitivo_quiz(self, verb_data: Verb) -> List[str]:
         """
         Генерация квиза №2: перевод → инфинитив
         Возвращает список из 4 вариантов (1 правильный + 3 неправильных)
         """
-        correct = verb_data['infinitivo']
-        wrong = self.data_loader.get_random_infinitivos(exclude=correct, count=3)
-
-        options = [correct] + wrong
+        options = [verb_data.infinitivo] + self.distractors.infinitivo_distractors(verb_data, count=3)
         random.shuffle(options)
 
         return options
+
+    def generate_translation_quizzes(self, verbs: Iterable[Verb]) -> List[List[str]]:
+        """Пакетная генерация квиза №1 для многих пользователей за один проход"""
+        distractors = self.distractors.translation_distractors
+        shuffle = random.shuffle
+        quizzes = []
+        for verb in verbs:
+            options = [verb.translation_ru] + distractors(verb, 3)
+            shuffle(options)
+            quizzes.append(options)
+        return quizzes
+
+    def generate_infinitivo_quizzes(self, verbs: Iterable[Verb]) -> List[List[str]]:
+        """Пакетная генерация квиза №2 для многих пользователей за один проход"""
+        distractors = self.distractors.infinitivo_distractors
+        shuffle = random.shuffle
+        quizzes = []
+        for verb in verbs:
+            options = [verb.infinitivo] + distractors(verb, 3)
+            shuffle(options)
+            quizzes.append(options)
+        return quizzes
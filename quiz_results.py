@@ -0,0 +1,83 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+RESULT_BATCHES = REGISTRY.histogram(
+    'bot_quiz_result_batch', 'Quiz answers per results log write',
+    buckets=(1, 10, 50, 100, 500, 1000, 5000)
+)
+
+
+class QuizResultLog:
+    """
+    Журнал ответов на квизы с пакетной записью.
+
+    Ответы копятся в памяти и записываются в SQLite одной транзакцией
+    раз в flush_interval секунд или сразу после batch_size ответов:
+    строки дописываются в журнал quiz_results, а счётчики пользователей
+    и глаголов обновляются в той же транзакции. Перед чтением статистики
+    накопленные ответы записываются, поэтому /stats видит свежий ответ.
+    Сам ответ на квиз к этому моменту уже сохранён в сессии квиза, так
+    что при падении процесса теряется только его учёт в статистике.
+    """
+
+    def __init__(self, state_manager, flush_interval: float = 1.0, batch_size: int = 500):
+        self.state_manager = state_manager
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._pending: List[Tuple[int, str, str, bool, str]] = []
+        self._full = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def append(self, user_id: int, infinitivo: str, quiz_type: str, is_correct: bool):
+        """Добавить ответ в очередь записи"""
+        self._pending.append((user_id, infinitivo, quiz_type, is_correct, datetime.now().isoformat()))
+        if len(self._pending) >= self.batch_size:
+            self._full.set()
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Остановить фоновую запись и записать накопленные ответы"""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._full.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Записать накопленные ответы одной транзакцией"""
+        if not self._pending:
+            return
+        results, self._pending = self._pending, []
+        try:
+            await self.state_manager.record_quiz_results(results)
+            RESULT_BATCHES.observe(len(results))
+        except Exception as e:
+            # Ответы возвращаются в очередь и записываются следующим пакетом
+            logger.error(f"Error writing {len(results)} quiz results: {e}")
+            self._pending[:0] = results
+
+    async def get_user_stats(self, user_id: int) -> Optional[Tuple[int, int, int, int, str]]:
+        """Статистика пользователя: (ответов, верных, текущая серия, лучшая серия, последний ответ)"""
+        await self.flush()
+        return await self.state_manager.get_user_quiz_stats(user_id)
+
+    async def get_report(self, limit: int = 5) -> dict:
+        """Сводка по квизам для администратора"""
+        await self.flush()
+        return await self.state_manager.get_quiz_report(limit)
@@ -0,0 +1,126 @@
+import secrets
+import time
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Tuple
+
+# Префикс callback data ответа на квиз: "qa:<session_id>:<номер варианта>"
+CALLBACK_PREFIX = 'qa'
+
+
+class QuizSession:
+    """Сессия квиза: варианты ответа и правильный ответ хранятся на сервере"""
+
+    __slots__ = ('session_id', 'user_id', 'quiz_type', 'infinitivo', 'options',
+                 'correct_index', 'answered', 'created')
+
+    def __init__(self, session_id: str, user_id: int, quiz_type: str, infinitivo: str,
+                 options: List[str], correct_index: int, answered: bool = False):
+        self.session_id = session_id
+        self.user_id = user_id
+        self.quiz_type = quiz_type
+        self.infinitivo = infinitivo
+        self.options = options
+        self.correct_index = correct_index
+        self.answered = answered
+        self.created = time.monotonic()
+
+    @property
+    def correct_answer(self) -> str:
+        return self.options[self.correct_index]
+
+    def callback_data(self, option_index: int) -> str:
+        """Callback data кнопки варианта: несколько байт вместо ответа целиком"""
+        return f"{CALLBACK_PREFIX}:{self.session_id}:{option_index}"
+
+
+def parse_callback_data(data: str) -> Optional[Tuple[str, int]]:
+    """Разобрать callback data ответа: (session_id, номер варианта) или None"""
+    parts = data.split(':') if data else []
+    if len(parts) != 3 or parts[0] != CALLBACK_PREFIX or not parts[1]:
+        return None
+    try:
+        option_index = int(parts[2])
+    except ValueError:
+        return None
+    return parts[1], option_index
+
+
+class QuizSessionStore:
+    """
+    Хранилище сессий квизов.
+
+    Свежие сессии живут в памяти в LRU-кэше с TTL, поэтому ответ на квиз
+    проверяется за O(1) без обращения к БД. Все сессии и ответы сохраняются
+    в SQLite: это запасной путь после вытеснения из кэша или перезапуска,
+    а также история результатов для статистики.
+    """
+
+    def __init__(self, state_manager, maxsize: int = 100000, ttl: float = 2 * 24 * 3600):
+        self.state_manager = state_manager
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._cache: 'OrderedDict[str, QuizSession]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def new_session_id() -> str:
+        """Короткий случайный идентификатор (8 символов base64url)"""
+        return secrets.token_urlsafe(6)
+
+    async def create_many(self, quizzes: Iterable[Tuple[int, str, str, List[str], int]]) -> List[QuizSession]:
+        """
+        Создать сессии для страницы пользователей одной транзакцией:
+        [(user_id, quiz_type, infinitivo, options, correct_index)]
+        """
+        sessions = [
+            QuizSession(self.new_session_id(), user_id, quiz_type, infinitivo, options, correct_index)
+            for user_id, quiz_type, infinitivo, options, correct_index in quizzes
+        ]
+        await self.state_manager.save_quiz_sessions(
+            (s.session_id, s.user_id, s.quiz_type, s.infinitivo, s.options, s.correct_index)
+            for s in sessions
+        )
+        for session in sessions:
+            self._put(session)
+        return sessions
+
+    async def get(self, session_id: str) -> Optional[QuizSession]:
+        """Найти сессию: сначала в памяти, затем в SQLite"""
+        session = self._cache.get(session_id)
+        if session is not None:
+            if time.monotonic() - session.created <= self.ttl:
+                self._cache.move_to_end(session_id)
+                self.hits += 1
+                return session
+            del self._cache[session_id]
+
+        self.misses += 1
+        row = await self.state_manager.get_quiz_session(session_id)
+        if row is None:
+            return None
+        session = QuizSession(*row)
+        self._put(session)
+        return session
+
+    async def record_answer(self, session: QuizSession, option_index: int, is_correct: bool) -> bool:
+        """Записать ответ; False, если на квиз уже отвечали"""
+        if session.answered:
+            return False
+        # Флаг ставится до записи, чтобы одновременное второе нажатие не засчиталось,
+        # и снимается, если запись не удалась: ответ можно будет дать снова
+        session.answered = True
+        try:
+            return await self.state_manager.record_quiz_answer(session.session_id, option_index, is_correct)
+        except Exception:
+            session.answered = False
+            raise
+
+    def stats(self) -> dict:
+        return {'size': len(self._cache), 'hits': self.hits, 'misses': self.misses}
+
+    def _put(self, session: QuizSession):
+        self._cache[session.session_id] = session
+        self._cache.move_to_end(session.session_id)
+        while len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
@@ -0,0 +1,60 @@
+from functools import lru_cache
+from typing import Dict
+
+from data_loader import Verb
+
+# Местоимения в порядке лиц: 1s, 2s, 3s, 1p, 2p, 3p
+PRONOUNS = ('yo', 'tú', 'él/ella', 'nosotros', 'vosotros', 'ellos/ellas')
+
+
+class MessageRenderer:
+    """
+    Общий кэш текстов сообщений рассылки.
+
+    Тексты зависят только от глагола (и времени), поэтому форматируются один
+    раз для всех пользователей с тем же глаголом и берутся из LRU-кэша.
+    Для каждой пользовательской рассылки остаётся только то, что действительно
+    различается: перемешанные варианты ответа и callback data.
+    """
+
+    def __init__(self, data_loader, maxsize: int = 4096):
+        self.data_loader = data_loader
+        self.verb_of_the_day = lru_cache(maxsize=maxsize)(self._render_verb_of_the_day)
+        self.tense_message = lru_cache(maxsize=maxsize)(self._render_tense_message)
+        self.quiz_1_prompt = lru_cache(maxsize=maxsize)(self._render_quiz_1_prompt)
+        self.quiz_2_prompt = lru_cache(maxsize=maxsize)(self._render_quiz_2_prompt)
+
+    def _render_verb_of_the_day(self, verb: Verb) -> str:
+        return f"📚 Глагол дня:\n\n🇪🇸 {verb.infinitivo} — 🇷🇺 {verb.translation_ru}"
+
+    def _render_tense_message(self, verb: Verb, tense: str) -> str:
+        forms = self.data_loader.get_tense_forms(verb, tense)
+        lines = [f"{pronoun} — {form}" for pronoun, form in zip(PRONOUNS, forms)]
+        return f"📖 {tense}\n\n" + "\n".join(lines) + "\n"
+
+    def _render_quiz_1_prompt(self, verb: Verb) -> str:
+        return f"🎯 Квиз №1\n\nГлагол: {verb.infinitivo}\nВыбери верный перевод:"
+
+    def _render_quiz_2_prompt(self, verb: Verb) -> str:
+        return f"🎯 Квиз №2\n\nЗначение: {verb.translation_ru}\nВыбери правильный инфинитив:"
+
+    def clear(self):
+        """Очистить кэш (например, после перезагрузки данных глаголов)"""
+        for cached in self._caches().values():
+            cached.cache_clear()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Попадания, промахи и размер каждого кэша"""
+        stats = {}
+        for name, cached in self._caches().items():
+            info = cached.cache_info()
+            stats[name] = {'hits': info.hits, 'misses': info.misses, 'size': info.currsize}
+        return stats
+
+    def _caches(self):
+        return {
+            'verb_of_the_day': self.verb_of_the_day,
+            'tense_message': self.tense_message,
+            'quiz_1_prompt': self.quiz_1_prompt,
+            'quiz_2_prompt': self.quiz_2_prompt,
+        }
@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import multiprocessing
+import sys
+from typing import Dict, List, Optional
+
+from telegram import Bot, Update
+from telegram.ext import Application, ContextTypes
+
+from bot import TELEGRAM_TOKEN, SpanishVerbBot, outbound_request
+
+logger = logging.getLogger(__name__)
+
+
+def shard_of(user_id: int, shards: int) -> int:
+    """Номер шарда пользователя (совпадает с фильтром user_id % count в StateManager)"""
+    return user_id % shards
+
+
+class ShardWorker:
+    """
+    Процесс-шард: рассылает слоты своим пользователям через свою очередь
+    отправки и свой планировщик, а также обрабатывает переданные
+    координатором нажатия кнопок своих пользователей. Состояние общее -
+    один файл SQLite в режиме WAL.
+    """
+
+    def __init__(self, index: int, count: int, csv_file: str, db_file: str,
+                 token: str, base_url: Optional[str] = None):
+        self.index = index
+        self.count = count
+        self.bot = SpanishVerbBot(csv_file, db_file, shard=(index, count))
+        kwargs = {'base_url': base_url} if base_url else {}
+        # Соединений хватает и отправителям рассылки, и ответам на нажатия (TELEGRAM_POOL_SIZE)
+        self.telegram = Bot(token, request=outbound_request(), **kwargs)
+
+    async def start(self, global_rate: Optional[float] = None):
+        await self.telegram.initialize()
+        await self.bot.start_metrics()
+        await self.bot.start_delivery(self.telegram, global_rate)
+        logger.info(f"Shard {self.index}/{self.count} started")
+
+    async def stop(self):
+        await self.bot.stop_delivery()
+        await self.telegram.shutdown()
+        logger.info(f"Shard {self.index}/{self.count} stopped")
+
+    async def serve(self, inbox):
+        """Обработка сообщений координатора до команды stop"""
+        loop = asyncio.get_running_loop()
+        tasks = set()
+        while True:
+            kind, payload = await loop.run_in_executor(None, inbox.get)
+            if kind == 'stop':
+                break
+            task = asyncio.create_task(self.handle(kind, payload))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def handle(self, kind: str, payload: Dict):
+        try:
+            if kind == 'callback':
+                await self._answer_callback(payload)
+            elif kind == 'test':
+                await self.bot.start_test_flow(payload['user_id'])
+            else:
+                logger.warning(f"Unknown shard message: {kind}")
+        except Exception as e:
+            logger.error(f"Error handling {kind} in shard {self.index}: {e}")
+            if kind == 'callback':
+                await self.telegram.answer_callback_query(
+                    payload['id'], text="Произошла ошибка при обработке ответа", show_alert=True
+                )
+
+    async def _answer_callback(self, payload: Dict):
+        text, show_alert, verdict = await self.bot.answer_quiz(payload['user_id'], payload['data'])
+        await self.telegram.answer_callback_query(payload['id'], text=text, show_alert=show_alert)
+        if verdict:
+            await self.telegram.edit_message_text(
+                payload['text'] + verdict,
+                chat_id=payload['chat_id'],
+                message_id=payload['message_id']
+            )
+
+
+def run_shard(index: int, count: int, inbox, csv_file: str, db_file: str,
+              token: str, base_url: Optional[str] = None):
+    """Точка входа процесса-шарда"""
+    async def main():
+        worker = ShardWorker(index, count, csv_file, db_file, token, base_url)
+        await worker.start()
+        try:
+            await worker.serve(inbox)
+        finally:
+            await worker.stop()
+
+    asyncio.run(main())
+
+
+class CoordinatorBot(SpanishVerbBot):
+    """
+    Координатор шардированного режима: принимает все обновления Telegram.
+    Команды (/start, /status, /stats и другие) обрабатываются на месте, а ответы на квизы и
+    тестовый флоу передаются шарду пользователя, у которого лежат его
+    сессии квизов и очередь отправки. Рассылку слотов координатор не ведёт.
+    """
+
+    def __init__(self, inboxes: List, csv_file: str = 'verbs.csv', db_file: str = 'bot_state.db'):
+        super().__init__(csv_file, db_file)
+        self.inboxes = inboxes
+
+    def route(self, user_id: int, kind: str, payload: Dict):
+        self.inboxes[shard_of(user_id, len(self.inboxes))].put_nowait((kind, payload))
+
+    async def handle_quiz_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Передача ответа на квиз шарду пользователя"""
+        query = update.callback_query
+        self.route(query.from_user.id, 'callback', {
+            'id': query.id,
+            'user_id': query.from_user.id,
+            'data': query.data,
+            'chat_id': query.message.chat_id,
+            'message_id': query.message.message_id,
+            'text': query.message.text,
+        })
+
+    async def start_test_flow(self, user_id: int):
+        """Тестовый флоу запускается в шарде пользователя"""
+        self.route(user_id, 'test', {'user_id': user_id})
+
+    async def post_init(self, application: Application):
+        self.application = application
+        await self.start_metrics()
+        # Состояние меняют несколько процессов, поэтому кэш не включается;
+        # журнал отложенной записи, оставшийся от запуска без шардов, проигрывается
+        await self.state_manager.recover()
+        logger.info(f"Coordinator initialized with {len(self.inboxes)} shards")
+
+    async def post_shutdown(self, application: Application):
+        await self.stop_metrics()
+        await self.state_manager.close()
+
+
+def run_sharded(shards: int, csv_file: str = 'verbs.csv', db_file: str = 'bot_state.db'):
+    """Запуск координатора и shards процессов-шардов"""
+    if not TELEGRAM_TOKEN:
+        logger.error("TELEGRAM_BOT_TOKEN not set in environment variables")
+        sys.exit(1)
+
+    context = multiprocessing.get_context('spawn')
+    inboxes = [context.Queue() for _ in range(shards)]
+
+    # Координатор создаётся первым: миграции схемы применяются до старта шардов
+    coordinator = CoordinatorBot(inboxes, csv_file, db_file)
+    processes = [
+        context.Process(
+            target=run_shard,
+            args=(index, shards, inboxes[index], csv_file, db_file, TELEGRAM_TOKEN),
+            name=f'shard-{index}',
+            daemon=True
+        )
+        for index in range(shards)
+    ]
+    for process in processes:
+        process.start()
+
+    try:
+        coordinator.run()
+    finally:
+        for inbox in inboxes:
+            inbox.put(('stop', None))
+        for process in processes:
+            process.join(timeout=30)
@@ -0,0 +1,53 @@
+from datetime import date, timedelta
+from typing import NamedTuple
+
+# Оценка ответа по шкале SM-2 (0-5): ответ с оценкой ниже PASS_QUALITY - забытый глагол
+CORRECT_QUALITY = 4
+WRONG_QUALITY = 1
+PASS_QUALITY = 3
+
+INITIAL_EASE = 2.5
+MIN_EASE = 1.3
+
+# Интервалы после первого и второго правильного повторения, в днях
+FIRST_INTERVAL = 1
+SECOND_INTERVAL = 6
+
+
+class ReviewState(NamedTuple):
+    """Состояние повторения глагола пользователем"""
+    ease: float = INITIAL_EASE
+    interval: int = 0
+    repetitions: int = 0
+
+
+def quality_for(is_correct: bool) -> int:
+    """Оценка SM-2 для ответа на квиз: вариантов ответа всего два - верно или нет"""
+    return CORRECT_QUALITY if is_correct else WRONG_QUALITY
+
+
+def review(state: ReviewState, quality: int) -> ReviewState:
+    """
+    Новое состояние после повторения с оценкой quality (алгоритм SM-2):
+    правильный ответ увеличивает интервал (1 день, 6 дней, затем интервал
+    умножается на коэффициент лёгкости), ошибка начинает повторения заново.
+    """
+    if quality >= PASS_QUALITY:
+        if state.repetitions == 0:
+            interval = FIRST_INTERVAL
+        elif state.repetitions == 1:
+            interval = SECOND_INTERVAL
+        else:
+            interval = round(state.interval * state.ease)
+        repetitions = state.repetitions + 1
+    else:
+        interval = FIRST_INTERVAL
+        repetitions = 0
+
+    ease = state.ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)
+    return ReviewState(max(MIN_EASE, ease), interval, repetitions)
+
+
+def due_date(today: str, interval: int) -> str:
+    """Дата следующего повторения: today + interval дней (ISO)"""
+    return (date.fromisoformat(today) + timedelta(days=interval)).isoformat()
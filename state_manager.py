@@ -1,94 +1,617 @@
+import json
 import sqlite3
-from typing import List, Optional
-from datetime import datetime
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from datetime import datetime, timedelta
 from contextlib import contextmanager
 
+from spaced_repetition import PASS_QUALITY, ReviewState, due_date, quality_for, review
+
+# Размер кэша страниц SQLite (отрицательное значение - в КиБ) и размер mmap в байтах
+CACHE_SIZE_KIB = 16 * 1024
+MMAP_SIZE = 64 * 1024 * 1024
+
+# Количество подготовленных выражений, которые sqlite3 держит в кэше соединения
+STATEMENT_CACHE_SIZE = 256
+
+# Максимальное число параметров в одном IN (...) для пакетных запросов
+MAX_BATCH_PARAMS = 900
+
+
+def read_only(method):
+    """
+    Метод StateManager только читает БД: групповая транзакция AsyncStateManager,
+    в которой все вызовы такие, не берёт блокировку записи
+    """
+    method.read_only = True
+    return method
+
+
+def _chunks(items: List, size: int = MAX_BATCH_PARAMS) -> Iterator[List]:
+    """Разбить список на части для пакетных запросов"""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _placeholders(count: int) -> str:
+    return ','.join('?' * count)
+
+
+# Часовой пояс пользователей по умолчанию
+DEFAULT_TIMEZONE = 'Europe/Moscow'
+
+# Версионированные миграции схемы: (версия, выражения).
+# Номер применённой версии хранится в PRAGMA user_version.
+MIGRATIONS = [
+    (1, [
+        # Таблица пользователей
+        '''
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY,
+            created_at TEXT
+        )
+        ''',
+        # Таблица глаголов дня
+        '''
+        CREATE TABLE IF NOT EXISTS verb_of_day (
+            user_id INTEGER PRIMARY KEY,
+            infinitivo TEXT,
+            date TEXT,
+            FOREIGN KEY (user_id) REFERENCES users (user_id)
+        )
+        ''',
+        # Таблица отправленных времён
+        '''
+        CREATE TABLE IF NOT EXISTS sent_tenses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            tense TEXT,
+            date TEXT,
+            FOREIGN KEY (user_id) REFERENCES users (user_id)
+        )
+        ''',
+    ]),
+    (2, [
+        # Удаляем дубликаты, накопившиеся до появления ограничения уникальности
+        '''
+        DELETE FROM sent_tenses
+        WHERE id NOT IN (SELECT MIN(id) FROM sent_tenses GROUP BY user_id, tense, date)
+        ''',
+        # Уникальность (user_id, tense, date); индекс покрывает и выборки по (user_id, date)
+        '''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_sent_tenses_user_date_tense
+        ON sent_tenses (user_id, date, tense)
+        ''',
+        # Индексы по дате для очистки старых записей
+        'CREATE INDEX IF NOT EXISTS idx_sent_tenses_date ON sent_tenses (date)',
+        'CREATE INDEX IF NOT EXISTS idx_verb_of_day_date ON verb_of_day (date)',
+    ]),
+    (3, [
+        # Сессии квизов: варианты и правильный ответ хранятся на сервере,
+        # а в callback data передаётся только короткий session_id
+        '''
+        CREATE TABLE IF NOT EXISTS quiz_sessions (
+            session_id TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            quiz_type TEXT NOT NULL,
+            infinitivo TEXT NOT NULL,
+            options TEXT NOT NULL,
+            correct_index INTEGER NOT NULL,
+            created_at TEXT NOT NULL,
+            answered_at TEXT,
+            chosen_index INTEGER,
+            is_correct INTEGER
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_quiz_sessions_created ON quiz_sessions (created_at)',
+    ]),
+    (4, [
+        # Прогоны слотов расписания: после перезапуска бот знает, какие слоты
+        # за сегодня уже разосланы, и продолжает прерванный слот с курсора
+        '''
+        CREATE TABLE IF NOT EXISTS slot_runs (
+            date TEXT NOT NULL,
+            slot TEXT NOT NULL,
+            status TEXT NOT NULL,
+            cursor INTEGER,
+            started_at TEXT NOT NULL,
+            finished_at TEXT,
+            PRIMARY KEY (date, slot)
+        )
+        ''',
+    ]),
+    (5, [
+        # Часовой пояс пользователя (IANA). Существующие пользователи получают
+        # пояс, который раньше был зашит в бота
+        f"ALTER TABLE users ADD COLUMN timezone TEXT NOT NULL DEFAULT '{DEFAULT_TIMEZONE}'",
+        'CREATE INDEX IF NOT EXISTS idx_users_timezone ON users (timezone, user_id)',
+        # Справочник используемых поясов: планировщик читает его на каждом тике,
+        # не перебирая пользователей
+        'CREATE TABLE IF NOT EXISTS timezones (timezone TEXT PRIMARY KEY)',
+        'INSERT OR IGNORE INTO timezones (timezone) SELECT DISTINCT timezone FROM users',
+    ]),
+    (6, [
+        # Статус доставки и дата последнего обращения пользователя к боту.
+        # Существующим пользователям отсчёт неактивности начинается с миграции
+        "ALTER TABLE users ADD COLUMN status TEXT NOT NULL DEFAULT 'active'",
+        'ALTER TABLE users ADD COLUMN last_interaction TEXT',
+        "UPDATE users SET last_interaction = date('now', 'localtime')",
+        # Рассылка читает только активных пользователей: частичный покрывающий индекс
+        # вместо индекса по всем пользователям пояса
+        'DROP INDEX IF EXISTS idx_users_timezone',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_users_active
+        ON users (timezone, user_id, last_interaction) WHERE status = 'active'
+        ''',
+    ]),
+    (7, [
+        # Outbox рассылки времён: слот сначала резервирует время пользователя
+        # (не больше одной строки на пользователя, время и дату и одной строки
+        # на пользователя, слот и дату), затем отправляет зарезервированные
+        # строки и отмечает их доставленными
+        '''
+        CREATE TABLE IF NOT EXISTS tense_outbox (
+            user_id INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            tense TEXT NOT NULL,
+            infinitivo TEXT NOT NULL,
+            slot TEXT,
+            status TEXT NOT NULL,
+            claimed_at TEXT NOT NULL,
+            delivered_at TEXT,
+            PRIMARY KEY (user_id, date, tense)
+        )
+        ''',
+        # Недоставленные строки: досылка после перезапуска и размер очереди
+        '''
+        CREATE INDEX IF NOT EXISTS idx_tense_outbox_pending
+        ON tense_outbox (date, user_id) WHERE status = 'pending'
+        ''',
+        # Повторный прогон слота (после перезапуска) не резервирует пользователю второе время;
+        # строки без слота (тестовый флоу) не ограничиваются - NULL в уникальном индексе различны
+        'CREATE UNIQUE INDEX IF NOT EXISTS idx_tense_outbox_slot ON tense_outbox (user_id, date, slot)',
+        'CREATE INDEX IF NOT EXISTS idx_tense_outbox_date ON tense_outbox (date)',
+    ]),
+    (8, [
+        # Интервальные повторения (SM-2): состояние каждого глагола, на квиз
+        # по которому отвечал пользователь, и дата следующего повторения
+        '''
+        CREATE TABLE IF NOT EXISTS verb_reviews (
+            user_id INTEGER NOT NULL,
+            infinitivo TEXT NOT NULL,
+            ease REAL NOT NULL,
+            interval INTEGER NOT NULL,
+            repetitions INTEGER NOT NULL,
+            due TEXT NOT NULL,
+            last_review TEXT NOT NULL,
+            reviews INTEGER NOT NULL DEFAULT 0,
+            lapses INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, infinitivo)
+        )
+        ''',
+        # Самый просроченный глагол пользователя - первая запись диапазона (user_id, due <= ?)
+        'CREATE INDEX IF NOT EXISTS idx_verb_reviews_due ON verb_reviews (user_id, due, infinitivo)',
+    ]),
+    (9, [
+        # Журнал ответов на квизы: только дописывается, без вторичных индексов.
+        # Статистика читается не из него, а из агрегатов ниже
+        '''
+        CREATE TABLE IF NOT EXISTS quiz_results (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            infinitivo TEXT NOT NULL,
+            quiz_type TEXT NOT NULL,
+            is_correct INTEGER NOT NULL,
+            answered_at TEXT NOT NULL
+        )
+        ''',
+        # Агрегаты обновляются при записи ответов: /stats и отчёт читают одну строку
+        '''
+        CREATE TABLE IF NOT EXISTS user_quiz_stats (
+            user_id INTEGER PRIMARY KEY,
+            attempts INTEGER NOT NULL,
+            correct INTEGER NOT NULL,
+            streak INTEGER NOT NULL,
+            best_streak INTEGER NOT NULL,
+            last_answer_at TEXT NOT NULL
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS verb_quiz_stats (
+            infinitivo TEXT PRIMARY KEY,
+            attempts INTEGER NOT NULL,
+            correct INTEGER NOT NULL
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS quiz_totals (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            attempts INTEGER NOT NULL,
+            correct INTEGER NOT NULL,
+            learners INTEGER NOT NULL
+        )
+        ''',
+        # Ответы, ещё хранящиеся в сессиях квизов, переносятся в журнал;
+        # серии верных ответов отсчитываются с миграции
+        '''
+        INSERT INTO quiz_results (user_id, infinitivo, quiz_type, is_correct, answered_at)
+        SELECT user_id, infinitivo, quiz_type, is_correct, answered_at FROM quiz_sessions
+        WHERE answered_at IS NOT NULL ORDER BY answered_at
+        ''',
+        '''
+        INSERT INTO user_quiz_stats (user_id, attempts, correct, streak, best_streak, last_answer_at)
+        SELECT user_id, COUNT(*), SUM(is_correct), 0, 0, MAX(answered_at) FROM quiz_results GROUP BY user_id
+        ''',
+        '''
+        INSERT INTO verb_quiz_stats (infinitivo, attempts, correct)
+        SELECT infinitivo, COUNT(*), SUM(is_correct) FROM quiz_results GROUP BY infinitivo
+        ''',
+        '''
+        INSERT INTO quiz_totals (id, attempts, correct, learners)
+        SELECT 1, COUNT(*), COALESCE(SUM(is_correct), 0), COUNT(DISTINCT user_id) FROM quiz_results
+        ''',
+    ]),
+    (10, [
+        # С какого момента (UTC) бот ведёт слоты пояса: слоты, прошедшие раньше, не догоняются.
+        # Существующим поясам отсчёт начинается с миграции
+        'ALTER TABLE timezones ADD COLUMN added_at TEXT',
+        "UPDATE timezones SET added_at = datetime('now')",
+    ]),
+]
+
+# Статусы строки outbox времён
+OUTBOX_PENDING = 'pending'
+OUTBOX_DELIVERED = 'delivered'
+
+# Статусы доставки пользователя
+USER_ACTIVE = 'active'
+USER_BLOCKED = 'blocked'  # Пользователь заблокировал бота или удалил аккаунт
+
+# Состояние пользователя для кэша в памяти: (user_id, timezone, status, глагол дня,
+# его дата, отправленные в эту дату времена через запятую)
+USER_STATE_QUERY = '''
+    SELECT u.user_id, u.timezone, u.status, v.infinitivo, v.date, (
+        SELECT GROUP_CONCAT(s.tense) FROM sent_tenses s
+        WHERE s.user_id = u.user_id AND s.date = v.date
+    )
+    FROM users u
+    LEFT JOIN verb_of_day v ON v.user_id = u.user_id
+'''
+
+# Статусы прогона слота
+SLOT_RUNNING = 'running'
+SLOT_DONE = 'done'
+SLOT_SKIPPED = 'skipped'
+
+# Таблицы, размер которых выводится в отчёте об очистке
+REPORTED_TABLES = [
+    'users', 'verb_of_day', 'sent_tenses', 'tense_outbox', 'quiz_sessions', 'slot_runs', 'verb_reviews',
+    'user_quiz_stats', 'verb_quiz_stats'
+]
+
+# Отчёт по квизам: глаголы с наименьшей долей верных ответов среди отвеченных хотя бы столько раз
+REPORT_MIN_ATTEMPTS = 20
+
 
 class StateManager:
-    """Класс для управления состоянием пользователей в SQLite"""
+    """
+    Класс для управления состоянием пользователей в SQLite.
+    Дневное состояние хранится по локальной дате пользователя: методы
+    принимают необязательный today (по умолчанию - дата сервера).
+    """
 
     def __init__(self, db_file: str):
         self.db_file = db_file
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._conn = self._connect()
         self.init_database()
 
-    @contextmanager
-    def _get_connection(self):
-        """Контекстный менеджер для безопасной работы с соединением БД"""
-        conn = sqlite3.connect(self.db_file, timeout=10.0)
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Открытие долгоживущего соединения.
+        PRAGMA выставляются один раз, подготовленные выражения переиспользуются
+        через кэш выражений соединения.
+        """
+        conn = sqlite3.connect(
+            self.db_file,
+            timeout=10.0,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE
+        )
         conn.execute('PRAGMA journal_mode=WAL')  # Write-Ahead Logging для лучшей конкурентности
-        try:
-            yield conn
-            conn.commit()
-        except Exception:
-            conn.rollback()
-            raise
-        finally:
-            conn.close()
+        conn.execute('PRAGMA synchronous=NORMAL')  # В режиме WAL fsync только на checkpoint
+        conn.execute(f'PRAGMA cache_size=-{CACHE_SIZE_KIB}')
+        conn.execute(f'PRAGMA mmap_size={MMAP_SIZE}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        return conn
+
+    @contextmanager
+    def _get_connection(self, write: bool = True):
+        """
+        Контекстный менеджер для безопасной работы с соединением БД.
+        Каждый блок выполняется в своей транзакции на общем соединении;
+        write=False - транзакция только читает и не ждёт пишущие процессы.
+        Вложенный блок (например, внутри групповой транзакции AsyncStateManager)
+        изолируется savepoint'ом: его ошибка не откатывает соседние операции.
+        """
+        with self._lock:
+            if self._depth:
+                savepoint = f'sp{self._depth}'
+                self._conn.execute(f'SAVEPOINT {savepoint}')
+                self._depth += 1
+                try:
+                    yield self._conn
+                    self._conn.execute(f'RELEASE {savepoint}')
+                except Exception:
+                    self._conn.execute(f'ROLLBACK TO {savepoint}')
+                    self._conn.execute(f'RELEASE {savepoint}')
+                    raise
+                finally:
+                    self._depth -= 1
+                return
+
+            self._depth = 1
+            try:
+                if not self._conn.in_transaction:
+                    # Пишущая транзакция берёт блокировку записи сразу: при отложенном BEGIN
+                    # транзакция, которая сначала читает, а потом пишет, получает "database is
+                    # locked" без ожидания busy_timeout, если другой процесс (шард) успел записать
+                    # между ними. Читающая остаётся отложенной и идёт параллельно с записью (WAL)
+                    self._conn.execute('BEGIN IMMEDIATE' if write else 'BEGIN')
+                yield self._conn
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+            finally:
+                self._depth = 0
+
+    def close(self):
+        """Закрытие соединения с БД"""
+        with self._lock:
+            self._conn.close()
 
     def init_database(self):
-        """Инициализация базы данных"""
+        """
+        Инициализация базы данных.
+        Применяет миграции из MIGRATIONS, которые новее версии схемы БД.
+        """
         with self._get_connection() as conn:
             cursor = conn.cursor()
+            version = cursor.execute('PRAGMA user_version').fetchone()[0]
 
-            # Таблица пользователей
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS users (
-                    user_id INTEGER PRIMARY KEY,
-                    created_at TEXT
-                )
-            ''')
-
-            # Таблица глаголов дня
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS verb_of_day (
-                    user_id INTEGER PRIMARY KEY,
-                    infinitivo TEXT,
-                    date TEXT,
-                    FOREIGN KEY (user_id) REFERENCES users (user_id)
-                )
-            ''')
-
-            # Таблица отправленных времён
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS sent_tenses (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER,
-                    tense TEXT,
-                    date TEXT,
-                    FOREIGN KEY (user_id) REFERENCES users (user_id)
-                )
-            ''')
+            for target_version, statements in MIGRATIONS:
+                if target_version <= version:
+                    continue
+                for statement in statements:
+                    cursor.execute(statement)
+                cursor.execute(f'PRAGMA user_version = {target_version}')
+                version = target_version
+
+    @read_only
+    def get_schema_version(self) -> int:
+        """Текущая версия схемы БД"""
+        with self._get_connection(write=False) as conn:
+            return conn.execute('PRAGMA user_version').fetchone()[0]
 
+    @read_only
     def user_exists(self, user_id: int) -> bool:
         """Проверка существования пользователя"""
-        with self._get_connection() as conn:
+        with self._get_connection(write=False) as conn:
             cursor = conn.cursor()
             cursor.execute('SELECT user_id FROM users WHERE user_id = ?', (user_id,))
             result = cursor.fetchone()
             return result is not None
 
-    def create_user(self, user_id: int):
+    def create_user(self, user_id: int, timezone: str = DEFAULT_TIMEZONE):
         """Создание нового пользователя"""
         with self._get_connection() as conn:
+            cursor = conn.cursor()
+            now = datetime.now()
+            cursor.execute(
+                'INSERT OR IGNORE INTO users (user_id, created_at, timezone, last_interaction) VALUES (?, ?, ?, ?)',
+                (user_id, now.isoformat(), timezone, now.date().isoformat())
+            )
+            cursor.execute(
+                "INSERT OR IGNORE INTO timezones (timezone, added_at) VALUES (?, datetime('now'))", (timezone,)
+            )
+
+    @read_only
+    def get_user_timezone(self, user_id: int) -> Optional[str]:
+        """Часовой пояс пользователя"""
+        with self._get_connection(write=False) as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT timezone FROM users WHERE user_id = ?', (user_id,))
+            result = cursor.fetchone()
+            return result[0] if result else None
+
+    def set_user_timezone(self, user_id: int, timezone: str):
+        """Установить часовой пояс пользователя"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('UPDATE users SET timezone = ? WHERE user_id = ?', (timezone, user_id))
+            cursor.execute(
+                "INSERT OR IGNORE INTO timezones (timezone, added_at) VALUES (?, datetime('now'))", (timezone,)
+            )
+
+    @read_only
+    def get_timezones(self) -> List[str]:
+        """Часовые пояса, которые когда-либо выбирали пользователи"""
+        with self._get_connection(write=False) as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT timezone FROM timezones')
+            return [row[0] for row in cursor.fetchall()]
+
+    @read_only
+    def get_timezones_added(self) -> Dict[str, Optional[str]]:
+        """Часовые пояса и время их появления в боте (UTC, 'YYYY-MM-DD HH:MM:SS')"""
+        with self._get_connection(write=False) as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT timezone, added_at FROM timezones')
+            return dict(cursor.fetchall())
+
+    def touch_user(self, user_id: int, today: Optional[str] = None):
+        """Отметить обращение пользователя к боту (дата пишется не чаще раза в день)"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            today = today or datetime.now().date().isoformat()
+            cursor.execute(
+                '''
+                UPDATE users SET last_interaction = ?
+                WHERE user_id = ? AND (last_interaction IS NULL OR last_interaction < ?)
+                ''',
+                (today, user_id, today)
+            )
+
+    def reactivate_user(self, user_id: int) -> bool:
+        """
+        Вернуть пользователя в рассылку (например, после повторного /start).
+        Возвращает True, если пользователь был заблокирован.
+        """
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                'UPDATE users SET status = ?, last_interaction = ? WHERE user_id = ? AND status != ?',
+                (USER_ACTIVE, datetime.now().date().isoformat(), user_id, USER_ACTIVE)
+            )
+            return cursor.rowcount > 0
+
+    def block_users(self, user_ids: List[int]):
+        """Исключить пользователей из рассылки после постоянной ошибки доставки"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(
+                'UPDATE users SET status = ? WHERE user_id = ?',
+                ((USER_BLOCKED, user_id) for user_id in user_ids)
+            )
+
+    @read_only
+    def get_user_status(self, user_id: int) -> Optional[str]:
+        """Статус доставки пользователя"""
+        with self._get_connection(write=False) as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT status FROM users WHERE user_id = ?', (user_id,))
+            result = cursor.fetchone()
+            return result[0] if result else None
+
+    @read_only
+    def get_user_activity(self, active_since: Optional[str] = None) -> Dict[str, int]:
+        """
+        Количество пользователей по статусу; активные, не обращавшиеся
+        к боту с active_since, считаются отдельно как inactive
+        """
+        with self._get_connection(write=False) as conn:
             cursor = conn.cursor()
             cursor.execute(
-                'INSERT OR IGNORE INTO users (user_id, created_at) VALUES (?, ?)',
-                (user_id, datetime.now().isoformat())
+                '''
+                SELECT CASE WHEN status = ? AND last_interaction < ? THEN 'inactive' ELSE status END, COUNT(*)
+                FROM users GROUP BY 1
+                ''',
+                (USER_ACTIVE, active_since or '')
             )
+            return dict(cursor.fetchall())
 
+    @read_only
+    def get_user_states(self, user_ids: List[int]) -> List[tuple]:
+        """Состояние пользователей user_ids для кэша в памяти (несуществующие пропускаются)"""
+        with self._get_connection(write=False) as conn:
+            cursor = conn.cursor()
+            states = []
+            for chunk in _chunks(user_ids):
+                cursor.execute(
+                    f'{USER_STATE_QUERY} WHERE u.user_id IN ({_placeholders(len(chunk))})', chunk
+                )
+                states.extend(cursor.fetchall())
+            return states
+
+    @read_only
+    def get_active_user_states(self, after_user_id: Optional[int], limit: int,
+                               active_since: Optional[str] = None) -> List[tuple]:
+        """
+        Страница состояний активных пользователей (не заблокировавших бота и
+        обращавшихся к нему с active_since) по возрастанию user_id после
+        after_user_id - для прогрева кэша в памяти
+        """
+        with self._get_connection(write=False) as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f'''
+                {USER_STATE_QUERY}
+                WHERE u.user_id > ? AND u.status = ? AND (? IS NULL OR u.last_interaction >= ?)
+                ORDER BY u.user_id LIMIT ?
+                ''',
+                (after_user_id if after_user_id is not None else -1, USER_ACTIVE, active_since, active_since, limit)
+            )
+            return cursor.fetchall()
+
+    @read_only
     def get_all_users(self) -> List[int]:
         """Получить список всех пользователей"""
-        with self._get_connection() as conn:
+        with self._get_connection(write=False) as conn:
             cursor = conn.cursor()
             cursor.execute('SELECT user_id FROM users')
             users = [row[0] for row in cursor.fetchall()]
             return users
 
-    def set_verb_of_the_day(self, user_id: int, infinitivo: str):
+    @read_only
+    def get_users_page(self, after_user_id: Optional[int], limit: int,
+                       shard: Optional[Tuple[int, int]] = None,
+                       timezone: Optional[str] = None, active_only: bool = False,
+                       active_since: Optional[str] = None) -> List[int]:
+        """
+        Получить следующую страницу пользователей, упорядоченных по user_id.
+        shard = (index, count) оставляет только пользователей с user_id % count == index,
+        timezone - только пользователей с этим часовым поясом,
+        active_only - только не заблокировавших бота, active_since - только
+        обращавшихся к боту не раньше этой даты.
+        """
+        conditions = []
+        params = []
+        if active_only or active_since is not None:
+            # Литерал, а не параметр: иначе SQLite не использует частичный индекс idx_users_active
+            conditions.append(f"status = '{USER_ACTIVE}'")
+        if active_since is not None:
+            conditions.append('last_interaction >= ?')
+            params.append(active_since)
+        if timezone is not None:
+            conditions.append('timezone = ?')
+            params.append(timezone)
+        if after_user_id is not None:
+            conditions.append('user_id > ?')
+            params.append(after_user_id)
+        if shard is not None:
+            conditions.append('user_id % ? = ?')
+            params.extend((shard[1], shard[0]))
+        where = f"WHERE {' AND '.join(conditions)} " if conditions else ''
+
+        with self._get_connection(write=False) as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f'SELECT user_id FROM users {where}ORDER BY user_id LIMIT ?',
+                (*params, limit)
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def iter_users(self, batch_size: int = 1000) -> Iterator[int]:
+        """
+        Потоково перебрать всех пользователей порциями по batch_size.
+        Используется постраничная выборка по user_id, поэтому соединение
+        не держится открытым между порциями.
+        """
+        last_user_id = None
+        while True:
+            batch = self.get_users_page(last_user_id, batch_size)
+            if not batch:
+                return
+            yield from batch
+            last_user_id = batch[-1]
+
+    def set_verb_of_the_day(self, user_id: int, infinitivo: str, today: Optional[str] = None):
         """Установить глагол дня для пользователя"""
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            today = datetime.now().date().isoformat()
+            today = today or datetime.now().date().isoformat()
 
             # Проверяем, есть ли уже глагол на сегодня
             cursor.execute(
@@ -113,11 +636,12 @@ class StateManager:
                 (user_id, today)
             )
 
-    def get_current_verb(self, user_id: int) -> Optional[str]:
+    @read_only
+    def get_current_verb(self, user_id: int, today: Optional[str] = None) -> Optional[str]:
         """Получить текущий глагол дня для пользователя"""
-        with self._get_connection() as conn:
+        with self._get_connection(write=False) as conn:
             cursor = conn.cursor()
-            today = datetime.now().date().isoformat()
+            today = today or datetime.now().date().isoformat()
 
             cursor.execute(
                 'SELECT infinitivo FROM verb_of_day WHERE user_id = ? AND date = ?',
@@ -126,11 +650,12 @@ class StateManager:
             result = cursor.fetchone()
             return result[0] if result else None
 
-    def get_sent_tenses(self, user_id: int) -> List[str]:
+    @read_only
+    def get_sent_tenses(self, user_id: int, today: Optional[str] = None) -> List[str]:
         """Получить список отправленных времён для пользователя на сегодня"""
-        with self._get_connection() as conn:
+        with self._get_connection(write=False) as conn:
             cursor = conn.cursor()
-            today = datetime.now().date().isoformat()
+            today = today or datetime.now().date().isoformat()
 
             cursor.execute(
                 'SELECT tense FROM sent_tenses WHERE user_id = ? AND date = ?',
@@ -139,27 +664,624 @@ class StateManager:
             tenses = [row[0] for row in cursor.fetchall()]
             return tenses
 
-    def mark_tense_sent(self, user_id: int, tense: str):
+    def mark_tense_sent(self, user_id: int, tense: str, today: Optional[str] = None):
         """Отметить время как отправленное"""
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            today = datetime.now().date().isoformat()
+            today = today or datetime.now().date().isoformat()
 
             cursor.execute(
-                'INSERT INTO sent_tenses (user_id, tense, date) VALUES (?, ?, ?)',
+                'INSERT OR IGNORE INTO sent_tenses (user_id, tense, date) VALUES (?, ?, ?)',
                 (user_id, tense, today)
             )
 
+    def set_verbs_of_the_day(self, assignments: Iterable[Tuple[int, str]],
+                             today: Optional[str] = None) -> Dict[int, str]:
+        """
+        Установить глаголы дня для многих пользователей в одной транзакции.
+        Пользователям, у которых глагол на сегодня уже выбран, он не меняется.
+        Возвращает фактические глаголы дня: {user_id: infinitivo}
+        """
+        assignments = list(assignments)
+        if not assignments:
+            return {}
+
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            today = today or datetime.now().date().isoformat()
+
+            cursor.executemany(
+                '''
+                INSERT INTO verb_of_day (user_id, infinitivo, date) VALUES (?, ?, ?)
+                ON CONFLICT (user_id) DO UPDATE
+                SET infinitivo = excluded.infinitivo, date = excluded.date
+                WHERE verb_of_day.date != excluded.date
+                ''',
+                ((user_id, infinitivo, today) for user_id, infinitivo in assignments)
+            )
+
+            # Очищаем отправленные времена предыдущих дней
+            cursor.executemany(
+                'DELETE FROM sent_tenses WHERE user_id = ? AND date != ?',
+                ((user_id, today) for user_id, _ in assignments)
+            )
+
+            return self._select_current_verbs(cursor, [user_id for user_id, _ in assignments], today)
+
+    @read_only
+    def get_current_verbs(self, user_ids: List[int], today: Optional[str] = None) -> Dict[int, str]:
+        """Получить глаголы дня для многих пользователей: {user_id: infinitivo}"""
+        with self._get_connection(write=False) as conn:
+            today = today or datetime.now().date().isoformat()
+            return self._select_current_verbs(conn.cursor(), user_ids, today)
+
+    def _select_current_verbs(self, cursor: sqlite3.Cursor, user_ids: List[int], today: str) -> Dict[int, str]:
+        verbs = {}
+        for chunk in _chunks(user_ids):
+            cursor.execute(
+                f'SELECT user_id, infinitivo FROM verb_of_day '
+                f'WHERE date = ? AND user_id IN ({_placeholders(len(chunk))})',
+                (today, *chunk)
+            )
+            verbs.update(cursor.fetchall())
+        return verbs
+
+    @read_only
+    def get_slot_state(self, user_ids: List[int],
+                       today: Optional[str] = None) -> List[Tuple[int, str, List[str]]]:
+        """
+        Получить состояние слота для многих пользователей одним запросом:
+        список (user_id, infinitivo, отправленные сегодня времена).
+        Пользователи без глагола дня в результат не попадают.
+        """
+        with self._get_connection(write=False) as conn:
+            cursor = conn.cursor()
+            today = today or datetime.now().date().isoformat()
+
+            states = []
+            for chunk in _chunks(user_ids):
+                cursor.execute(
+                    f'''
+                    SELECT v.user_id, v.infinitivo, GROUP_CONCAT(s.tense)
+                    FROM verb_of_day v
+                    LEFT JOIN sent_tenses s ON s.user_id = v.user_id AND s.date = v.date
+                    WHERE v.date = ? AND v.user_id IN ({_placeholders(len(chunk))})
+                    GROUP BY v.user_id
+                    ''',
+                    (today, *chunk)
+                )
+                states.extend(
+                    (user_id, infinitivo, tenses.split(',') if tenses else [])
+                    for user_id, infinitivo, tenses in cursor.fetchall()
+                )
+            return states
+
+    def mark_tenses_sent(self, deliveries: Iterable[Tuple[int, str]], today: Optional[str] = None):
+        """Отметить отправленные времена для многих пользователей: [(user_id, tense)]"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            today = today or datetime.now().date().isoformat()
+
+            cursor.executemany(
+                'INSERT OR IGNORE INTO sent_tenses (user_id, tense, date) VALUES (?, ?, ?)',
+                ((user_id, tense, today) for user_id, tense in deliveries)
+            )
+
+    def claim_next_tenses(self, user_ids: List[int], tenses: List[str], today: Optional[str] = None,
+                          slot: Optional[str] = None,
+                          verbs: Optional[Dict[int, str]] = None) -> List[Tuple[int, str, str]]:
+        """
+        Зарезервировать в outbox следующее время для многих пользователей.
+        Следующим считается первое по порядку tenses время, которое сегодня
+        не отправлено и не зарезервировано. Чтение и резервирование идут в
+        одной транзакции, поэтому параллельные прогоны не получат одно время,
+        а пользователям, которым слот slot сегодня уже резервировал время,
+        новое не резервируется. Глаголы дня берутся из verbs ({user_id: infinitivo},
+        если они вычислены без БД) или из verb_of_day.
+        Возвращает зарезервированные строки: [(user_id, infinitivo, tense)]
+        """
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            today = today or datetime.now().date().isoformat()
+            now = datetime.now().isoformat()
+
+            claims = []
+            # При вычисляемых глаголах список пользователей входит в запрос дважды
+            chunk_size = MAX_BATCH_PARAMS // 2 if verbs is not None else MAX_BATCH_PARAMS
+            for chunk in _chunks(user_ids, chunk_size):
+                placeholders = _placeholders(len(chunk))
+                if verbs is not None:
+                    cursor.execute(
+                        f'''
+                        SELECT user_id, GROUP_CONCAT(tense) FROM (
+                            SELECT user_id, tense FROM sent_tenses WHERE date = ? AND user_id IN ({placeholders})
+                            UNION
+                            SELECT user_id, tense FROM tense_outbox WHERE date = ? AND user_id IN ({placeholders})
+                        )
+                        GROUP BY user_id
+                        ''',
+                        (today, *chunk, today, *chunk)
+                    )
+                    taken_tenses = dict(cursor.fetchall())
+                    rows = [
+                        (user_id, verbs[user_id], taken_tenses.get(user_id))
+                        for user_id in chunk if user_id in verbs
+                    ]
+                else:
+                    cursor.execute(
+                        f'''
+                        SELECT v.user_id, v.infinitivo, (
+                            SELECT GROUP_CONCAT(tense) FROM (
+                                SELECT tense FROM sent_tenses WHERE user_id = v.user_id AND date = v.date
+                                UNION
+                                SELECT tense FROM tense_outbox WHERE user_id = v.user_id AND date = v.date
+                            )
+                        )
+                        FROM verb_of_day v
+                        WHERE v.date = ? AND v.user_id IN ({placeholders})
+                        ''',
+                        (today, *chunk)
+                    )
+                    rows = cursor.fetchall()
+                for user_id, infinitivo, taken in rows:
+                    taken = set(taken.split(',')) if taken else set()
+                    tense = next((tense for tense in tenses if tense not in taken), None)
+                    if tense is not None:
+                        claims.append((user_id, infinitivo, tense))
+
+            claimed = []
+            for user_id, infinitivo, tense in claims:
+                cursor.execute(
+                    '''
+                    INSERT OR IGNORE INTO tense_outbox (user_id, date, tense, infinitivo, slot, status, claimed_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ''',
+                    (user_id, today, tense, infinitivo, slot, OUTBOX_PENDING, now)
+                )
+                # Время или слот уже зарезервированы другим прогоном - строку отправит он
+                if cursor.rowcount:
+                    claimed.append((user_id, infinitivo, tense))
+            return claimed
+
+    def complete_tense_claims(self, delivered: Iterable[Tuple[int, str]], failed: Iterable[Tuple[int, str]],
+                              today: Optional[str] = None):
+        """
+        Завершить зарезервированные строки outbox: доставленные отмечаются
+        (и попадают в sent_tenses), недоставленные снимаются, чтобы время
+        ушло в следующем слоте
+        """
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            today = today or datetime.now().date().isoformat()
+            delivered = list(delivered)
+
+            cursor.executemany(
+                '''
+                UPDATE tense_outbox SET status = ?, delivered_at = ?
+                WHERE user_id = ? AND date = ? AND tense = ?
+                ''',
+                (
+                    (OUTBOX_DELIVERED, datetime.now().isoformat(), user_id, today, tense)
+                    for user_id, tense in delivered
+                )
+            )
+            cursor.executemany(
+                'INSERT OR IGNORE INTO sent_tenses (user_id, tense, date) VALUES (?, ?, ?)',
+                ((user_id, tense, today) for user_id, tense in delivered)
+            )
+            cursor.executemany(
+                'DELETE FROM tense_outbox WHERE user_id = ? AND date = ? AND tense = ? AND status = ?',
+                ((user_id, today, tense, OUTBOX_PENDING) for user_id, tense in failed)
+            )
+
+    @read_only
+    def get_pending_tenses(self, today: Optional[str] = None, timezone: Optional[str] = None,
+                           shard: Optional[Tuple[int, int]] = None,
+                           claimed_before: Optional[str] = None,
+                           limit: int = 1000) -> List[Tuple[int, str, str]]:
+        """
+        Недоставленные строки outbox за дату (например, оставшиеся после
+        падения бота): [(user_id, infinitivo, tense)].
+        timezone и shard ограничивают выборку как в get_users_page,
+        claimed_before - только строки, зарезервированные раньше этого времени.
+        """
+        conditions = ['o.date = ?', f"o.status = '{OUTBOX_PENDING}'"]
+        params = [today or datetime.now().date().isoformat()]
+        if claimed_before is not None:
+            conditions.append('o.claimed_at < ?')
+            params.append(claimed_before)
+        if timezone is not None:
+            conditions.append('u.timezone = ?')
+            params.append(timezone)
+        if shard is not None:
+            conditions.append('o.user_id % ? = ?')
+            params.extend((shard[1], shard[0]))
+
+        with self._get_connection(write=False) as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f'''
+                SELECT o.user_id, o.infinitivo, o.tense
+                FROM tense_outbox o JOIN users u ON u.user_id = o.user_id
+                WHERE {' AND '.join(conditions)}
+                ORDER BY o.user_id LIMIT ?
+                ''',
+                (*params, limit)
+            )
+            return cursor.fetchall()
+
+    @read_only
+    def get_outbox_backlog(self) -> Dict[str, Optional[object]]:
+        """Размер очереди outbox: число недоставленных строк и время самой старой"""
+        with self._get_connection(write=False) as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"SELECT COUNT(*), MIN(claimed_at) FROM tense_outbox WHERE status = '{OUTBOX_PENDING}'"
+            )
+            pending, oldest = cursor.fetchone()
+            return {'pending': pending, 'oldest': oldest}
+
+    def save_quiz_sessions(self, sessions: Iterable[Tuple[str, int, str, str, List[str], int]]):
+        """
+        Сохранить сессии квизов одной транзакцией:
+        [(session_id, user_id, quiz_type, infinitivo, options, correct_index)]
+        """
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            now = datetime.now().isoformat()
+
+            cursor.executemany(
+                '''
+                INSERT OR REPLACE INTO quiz_sessions
+                (session_id, user_id, quiz_type, infinitivo, options, correct_index, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''',
+                (
+                    (session_id, user_id, quiz_type, infinitivo, json.dumps(options, ensure_ascii=False),
+                     correct_index, now)
+                    for session_id, user_id, quiz_type, infinitivo, options, correct_index in sessions
+                )
+            )
+
+    @read_only
+    def get_quiz_session(self, session_id: str) -> Optional[Tuple[str, int, str, str, List[str], int, bool]]:
+        """
+        Получить сессию квиза:
+        (session_id, user_id, quiz_type, infinitivo, options, correct_index, answered)
+        """
+        with self._get_connection(write=False) as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                '''
+                SELECT session_id, user_id, quiz_type, infinitivo, options, correct_index, answered_at
+                FROM quiz_sessions WHERE session_id = ?
+                ''',
+                (session_id,)
+            )
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            return (*row[:4], json.loads(row[4]), row[5], row[6] is not None)
+
+    def record_quiz_answer(self, session_id: str, chosen_index: int, is_correct: bool) -> bool:
+        """
+        Записать ответ на квиз.
+        Возвращает False, если на квиз уже отвечали.
+        """
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                '''
+                UPDATE quiz_sessions SET answered_at = ?, chosen_index = ?, is_correct = ?
+                WHERE session_id = ? AND answered_at IS NULL
+                ''',
+                (datetime.now().isoformat(), chosen_index, int(is_correct), session_id)
+            )
+            return cursor.rowcount > 0
+
+    def record_quiz_results(self, results: Iterable[Tuple[int, str, str, bool, str]]):
+        """
+        Дописать ответы на квизы в журнал и обновить агрегаты одной транзакцией:
+        [(user_id, infinitivo, quiz_type, is_correct, answered_at)] в порядке ответов.
+        Агрегаты считаются по пакету в памяти: одна запись на пользователя и глагол.
+        """
+        results = list(results)
+        if not results:
+            return
+
+        # Пользователь: [ответов, верных, верных подряд в начале пакета, лучшая серия в пакете,
+        # текущая серия в конце пакета, время последнего ответа]
+        users: Dict[int, list] = {}
+        verbs: Dict[str, list] = {}
+        for user_id, infinitivo, _, is_correct, answered_at in results:
+            user = users.get(user_id)
+            if user is None:
+                user = users[user_id] = [0, 0, 0, 0, 0, answered_at]
+            if is_correct:
+                if user[1] == user[0]:
+                    user[2] += 1
+                user[1] += 1
+                user[4] += 1
+                user[3] = max(user[3], user[4])
+            else:
+                user[4] = 0
+            user[0] += 1
+            user[5] = answered_at
+
+            verb = verbs.get(infinitivo)
+            if verb is None:
+                verb = verbs[infinitivo] = [0, 0]
+            verb[0] += 1
+            verb[1] += bool(is_correct)
+
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(
+                'INSERT INTO quiz_results (user_id, infinitivo, quiz_type, is_correct, answered_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (
+                    (user_id, infinitivo, quiz_type, int(is_correct), answered_at)
+                    for user_id, infinitivo, quiz_type, is_correct, answered_at in results
+                )
+            )
+
+            cursor.executemany(
+                'INSERT OR IGNORE INTO user_quiz_stats '
+                '(user_id, attempts, correct, streak, best_streak, last_answer_at) VALUES (?, 0, 0, 0, 0, ?)',
+                ((user_id, user[5]) for user_id, user in users.items())
+            )
+            learners = cursor.rowcount
+            # Выражения UPDATE видят значения строки до обновления: серия, начатая
+            # до пакета, продолжается верными ответами из его начала
+            cursor.executemany(
+                '''
+                UPDATE user_quiz_stats SET
+                    attempts = attempts + ?2,
+                    correct = correct + ?3,
+                    streak = CASE WHEN ?2 = ?3 THEN streak + ?2 ELSE ?5 END,
+                    best_streak = MAX(best_streak, streak + ?4, ?6),
+                    last_answer_at = ?7
+                WHERE user_id = ?1
+                ''',
+                (
+                    (user_id, attempts, correct, leading, trailing, best, answered_at)
+                    for user_id, (attempts, correct, leading, best, trailing, answered_at) in users.items()
+                )
+            )
+
+            cursor.executemany(
+                '''
+                INSERT INTO verb_quiz_stats (infinitivo, attempts, correct) VALUES (?, ?, ?)
+                ON CONFLICT (infinitivo) DO UPDATE SET
+                    attempts = attempts + excluded.attempts,
+                    correct = correct + excluded.correct
+                ''',
+                ((infinitivo, attempts, correct) for infinitivo, (attempts, correct) in verbs.items())
+            )
+
+            cursor.execute(
+                '''
+                INSERT INTO quiz_totals (id, attempts, correct, learners) VALUES (1, ?, ?, ?)
+                ON CONFLICT (id) DO UPDATE SET
+                    attempts = attempts + excluded.attempts,
+                    correct = correct + excluded.correct,
+                    learners = learners + excluded.learners
+                ''',
+                (len(results), sum(verb[1] for verb in verbs.values()), learners)
+            )
+
+    @read_only
+    def get_user_quiz_stats(self, user_id: int) -> Optional[Tuple[int, int, int, int, str]]:
+        """Статистика квизов пользователя: (ответов, верных, текущая серия, лучшая серия, последний ответ)"""
+        with self._get_connection(write=False) as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                'SELECT attempts, correct, streak, best_streak, last_answer_at FROM user_quiz_stats WHERE user_id = ?',
+                (user_id,)
+            )
+            return cursor.fetchone()
+
+    @read_only
+    def get_quiz_report(self, limit: int = 5, min_attempts: int = REPORT_MIN_ATTEMPTS) -> Dict[str, object]:
+        """
+        Сводка по квизам для администратора: всего ответов, верных, учеников
+        и limit самых трудных глаголов [(infinitivo, ответов, верных)].
+        Читаются только агрегаты: строка итогов и по строке на глагол.
+        """
+        with self._get_connection(write=False) as conn:
+            cursor = conn.cursor()
+            totals = cursor.execute('SELECT attempts, correct, learners FROM quiz_totals').fetchone()
+            attempts, correct, learners = totals or (0, 0, 0)
+            cursor.execute(
+                '''
+                SELECT infinitivo, attempts, correct FROM verb_quiz_stats
+                WHERE attempts >= ? ORDER BY CAST(correct AS REAL) / attempts, attempts DESC LIMIT ?
+                ''',
+                (min_attempts, limit)
+            )
+            return {'attempts': attempts, 'correct': correct, 'learners': learners, 'hardest': cursor.fetchall()}
+
+    def record_review(self, user_id: int, infinitivo: str, is_correct: bool,
+                      today: Optional[str] = None) -> str:
+        """
+        Записать ответ на квиз по глаголу и пересчитать дату следующего
+        повторения по SM-2. Повторный правильный ответ в тот же день (на
+        второй квиз) интервал не увеличивает. Возвращает дату повторения.
+        """
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            today = today or datetime.now().date().isoformat()
+            quality = quality_for(is_correct)
+
+            cursor.execute(
+                '''
+                SELECT ease, interval, repetitions, due, last_review FROM verb_reviews
+                WHERE user_id = ? AND infinitivo = ?
+                ''',
+                (user_id, infinitivo)
+            )
+            row = cursor.fetchone()
+            if row is not None and row[4] == today and quality >= PASS_QUALITY:
+                return row[3]
+
+            state = review(ReviewState(*row[:3]) if row else ReviewState(), quality)
+            due = due_date(today, state.interval)
+            cursor.execute(
+                '''
+                INSERT INTO verb_reviews
+                (user_id, infinitivo, ease, interval, repetitions, due, last_review, reviews, lapses)
+                VALUES (?, ?, ?, ?, ?, ?, ?, 1, ?)
+                ON CONFLICT (user_id, infinitivo) DO UPDATE SET
+                    ease = excluded.ease,
+                    interval = excluded.interval,
+                    repetitions = excluded.repetitions,
+                    due = excluded.due,
+                    last_review = excluded.last_review,
+                    reviews = reviews + 1,
+                    lapses = lapses + excluded.lapses
+                ''',
+                (user_id, infinitivo, *state, due, today, int(quality < PASS_QUALITY))
+            )
+            return due
+
+    @read_only
+    def get_due_verbs(self, user_ids: List[int], today: Optional[str] = None) -> Dict[int, str]:
+        """
+        Глаголы, которые пора повторить, для многих пользователей:
+        {user_id: самый просроченный глагол}. Один запрос на порцию
+        пользователей по индексу (user_id, due) без чтения всей истории.
+        """
+        with self._get_connection(write=False) as conn:
+            cursor = conn.cursor()
+            today = today or datetime.now().date().isoformat()
+
+            due = {}
+            for chunk in _chunks(user_ids):
+                # Подзапрос с LIMIT 1 читает по индексу одну запись на пользователя,
+                # а не весь диапазон просроченных глаголов
+                cursor.execute(
+                    f'''
+                    SELECT u.user_id, (
+                        SELECT r.infinitivo FROM verb_reviews r
+                        WHERE r.user_id = u.user_id AND r.due <= ?
+                        ORDER BY r.due LIMIT 1
+                    )
+                    FROM users u WHERE u.user_id IN ({_placeholders(len(chunk))})
+                    ''',
+                    (today, *chunk)
+                )
+                due.update((user_id, infinitivo) for user_id, infinitivo in cursor.fetchall() if infinitivo)
+            return due
+
+    @read_only
+    def get_slot_runs(self, today: Optional[str] = None) -> Dict[str, Tuple[str, Optional[int]]]:
+        """Прогоны слотов за сегодня: {slot: (status, cursor)}"""
+        with self._get_connection(write=False) as conn:
+            cursor = conn.cursor()
+            today = today or datetime.now().date().isoformat()
+            cursor.execute('SELECT slot, status, cursor FROM slot_runs WHERE date = ?', (today,))
+            return {slot: (status, last_user_id) for slot, status, last_user_id in cursor.fetchall()}
+
+    def begin_slot_run(self, slot: str, today: Optional[str] = None) -> Tuple[str, Optional[int]]:
+        """
+        Начать (или продолжить) сегодняшний прогон слота.
+        Возвращает (status, cursor): cursor - последний обработанный user_id
+        прерванного прогона; status, отличный от running, значит, что слот
+        сегодня уже разослан или пропущен.
+        """
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            today = today or datetime.now().date().isoformat()
+            cursor.execute(
+                'INSERT OR IGNORE INTO slot_runs (date, slot, status, started_at) VALUES (?, ?, ?, ?)',
+                (today, slot, SLOT_RUNNING, datetime.now().isoformat())
+            )
+            cursor.execute(
+                'SELECT status, cursor FROM slot_runs WHERE date = ? AND slot = ?',
+                (today, slot)
+            )
+            return cursor.fetchone()
+
+    def save_slot_cursor(self, slot: str, last_user_id: int, today: Optional[str] = None):
+        """Сохранить курсор сегодняшнего прогона слота (курсор только растёт)"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            today = today or datetime.now().date().isoformat()
+            cursor.execute(
+                '''
+                UPDATE slot_runs SET cursor = ?
+                WHERE date = ? AND slot = ? AND (cursor IS NULL OR cursor < ?)
+                ''',
+                (last_user_id, today, slot, last_user_id)
+            )
+
+    def finish_slot_run(self, slot: str, status: str = SLOT_DONE, today: Optional[str] = None):
+        """Отметить сегодняшний прогон слота завершённым (или пропущенным)"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            today = today or datetime.now().date().isoformat()
+            now = datetime.now().isoformat()
+            cursor.execute(
+                '''
+                INSERT INTO slot_runs (date, slot, status, started_at, finished_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (date, slot) DO UPDATE SET
+                    status = excluded.status,
+                    finished_at = excluded.finished_at
+                ''',
+                (today, slot, status, now, now)
+            )
+
+    def prune_old_rows(self, keep_days: int) -> Dict[str, int]:
+        """
+        Удалить записи старше keep_days дней.
+        Возвращает количество удалённых строк по таблицам.
+        """
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cutoff = (datetime.now().date() - timedelta(days=keep_days)).isoformat()
+
+            cursor.execute('DELETE FROM sent_tenses WHERE date < ?', (cutoff,))
+            sent_tenses = cursor.rowcount
+            cursor.execute('DELETE FROM verb_of_day WHERE date < ?', (cutoff,))
+            verb_of_day = cursor.rowcount
+            cursor.execute('DELETE FROM quiz_sessions WHERE created_at < ?', (cutoff,))
+            quiz_sessions = cursor.rowcount
+            cursor.execute('DELETE FROM slot_runs WHERE date < ?', (cutoff,))
+            slot_runs = cursor.rowcount
+            cursor.execute('DELETE FROM tense_outbox WHERE date < ?', (cutoff,))
+            tense_outbox = cursor.rowcount
+
+            return {
+                'sent_tenses': sent_tenses,
+                'verb_of_day': verb_of_day,
+                'quiz_sessions': quiz_sessions,
+                'slot_runs': slot_runs,
+                'tense_outbox': tense_outbox,
+            }
+
+    @read_only
+    def get_table_sizes(self) -> Dict[str, int]:
+        """Количество строк в основных таблицах"""
+        with self._get_connection(write=False) as conn:
+            cursor = conn.cursor()
+            sizes = {}
+            for table in REPORTED_TABLES:
+                sizes[table] = cursor.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+            return sizes
+
     def reset_daily_progress(self, user_id: int):
         """Сброс ежедневного прогресса (для тестирования)"""
         with self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('DELETE FROM verb_of_day WHERE user_id = ?', (user_id,))
             cursor.execute('DELETE FROM sent_tenses WHERE user_id = ?', (user_id,))
+            cursor.execute('DELETE FROM tense_outbox WHERE user_id = ?', (user_id,))
 
-    def reset_sent_tenses(self, user_id: int):
+    def reset_sent_tenses(self, user_id: int, today: Optional[str] = None):
         """Сброс отправленных времён для пользователя"""
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            today = datetime.now().date().isoformat()
+            today = today or datetime.now().date().isoformat()
             cursor.execute('DELETE FROM sent_tenses WHERE user_id = ? AND date = ?', (user_id, today))
+            cursor.execute('DELETE FROM tense_outbox WHERE user_id = ? AND date = ?', (user_id, today))
@@ -0,0 +1,50 @@
+import logging
+from typing import Optional
+
+import httpx
+from telegram.request import HTTPXRequest
+
+logger = logging.getLogger(__name__)
+
+
+class TelegramRequest(HTTPXRequest):
+    """
+    HTTPXRequest с настраиваемым keep-alive.
+
+    Простаивающие соединения пула держатся открытыми keepalive_expiry
+    секунд (в httpx по умолчанию 5), поэтому соседние слоты рассылки и
+    ответы на команды переиспользуют соединения, а не открывают их заново.
+    Остальные параметры (размер пула, таймауты, http_version) - как у HTTPXRequest.
+
+    У HTTPXRequest в python-telegram-bot 20.7 (версия закреплена в
+    requirements.txt) нет параметра для httpx.Limits, поэтому keep-alive
+    подставляется через внутренние _client_kwargs и _build_client. Если после
+    обновления библиотеки они изменятся, в лог пишется предупреждение, а клиент
+    работает с keep-alive httpx по умолчанию.
+    """
+
+    def __init__(self, connection_pool_size: int = 1, keepalive_expiry: Optional[float] = 5.0, **kwargs):
+        # Нужен до super().__init__: там создаётся клиент
+        self.keepalive_expiry = keepalive_expiry
+        self._keepalive_applied = False
+        super().__init__(connection_pool_size, **kwargs)
+        if not self._keepalive_applied:
+            logger.warning(
+                "HTTPXRequest internals changed: keepalive_expiry is not applied, "
+                "update TelegramRequest for the installed python-telegram-bot"
+            )
+
+    def _build_client(self) -> httpx.AsyncClient:
+        limits = getattr(self, '_client_kwargs', {}).get('limits')
+        if isinstance(limits, httpx.Limits):
+            self._client_kwargs['limits'] = httpx.Limits(
+                max_connections=limits.max_connections,
+                max_keepalive_connections=limits.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry
+            )
+            self._keepalive_applied = True
+        return super()._build_client()
+
+    @property
+    def pool_size(self) -> int:
+        return self._client_kwargs['limits'].max_connections
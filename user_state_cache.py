@@ -0,0 +1,513 @@
+import asyncio
+import glob
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from async_state_manager import AsyncStateManager
+from metrics import REGISTRY
+from state_manager import DEFAULT_TIMEZONE, USER_ACTIVE, USER_BLOCKED, StateManager
+
+logger = logging.getLogger(__name__)
+
+# Режимы надёжности записи:
+# sync - запись сразу в SQLite (кэш только для чтения),
+# journal - отложенная запись, каждое изменение дописывается в журнал и переживает падение процесса,
+# memory - отложенная запись без журнала: при падении теряются изменения за последний интервал сброса
+DURABILITY_SYNC = 'sync'
+DURABILITY_JOURNAL = 'journal'
+DURABILITY_MEMORY = 'memory'
+
+# Пользователей на страницу при прогреве кэша
+WARM_PAGE_SIZE = 5000
+
+CACHE_FLUSHES = REGISTRY.counter('bot_state_cache_flushes_total', 'Write-behind flushes by result', ['result'])
+CACHE_FLUSH_OPS = REGISTRY.histogram(
+    'bot_state_cache_flush_ops', 'State writes per write-behind flush',
+    buckets=(1, 10, 100, 1000, 10000, 100000)
+)
+
+
+class _UserState:
+    """Состояние пользователя в памяти: пояс, статус, глагол дня и отправленные времена (битовая маска)"""
+
+    __slots__ = ('timezone', 'status', 'verb', 'date', 'sent')
+
+    def __init__(self, timezone: str, status: str = USER_ACTIVE, verb: Optional[str] = None,
+                 date: Optional[str] = None, sent: int = 0):
+        self.timezone = timezone
+        self.status = status
+        self.verb = verb
+        self.date = date
+        self.sent = sent
+
+
+class _Journal:
+    """
+    Журнал отложенных записей: сегменты <path>.<n> со строками JSON [метод, аргументы].
+    При сбросе текущий сегмент закрывается и начинается следующий; сегменты
+    удаляются после фиксации сброса, а оставшиеся после падения проигрываются при старте.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.sequence = max(self.segments(path), default=(0, None))[0] + 1
+        self._file = open(self._segment(self.sequence), 'a', encoding='utf-8')
+
+    @staticmethod
+    def segments(path: str) -> List[Tuple[int, str]]:
+        """Сегменты журнала по порядку: [(номер, файл)]"""
+        segments = []
+        for name in glob.glob(glob.escape(path) + '.*'):
+            suffix = name[len(path) + 1:]
+            if suffix.isdigit():
+                segments.append((int(suffix), name))
+        return sorted(segments)
+
+    def _segment(self, sequence: int) -> str:
+        return f'{self.path}.{sequence}'
+
+    def append(self, name: str, args: tuple):
+        # Запись уходит в ОС сразу: переживает падение процесса, но не отключение питания
+        self._file.write(json.dumps([name, args], ensure_ascii=False) + '\n')
+        self._file.flush()
+
+    def rotate(self) -> int:
+        """Закрыть текущий сегмент и начать следующий, вернуть номер закрытого"""
+        self._file.close()
+        closed = self.sequence
+        self.sequence += 1
+        self._file = open(self._segment(self.sequence), 'a', encoding='utf-8')
+        return closed
+
+    def remove_through(self, sequence: int):
+        """Удалить сегменты до sequence включительно (их записи зафиксированы в SQLite)"""
+        for number, name in self.segments(self.path):
+            if number <= sequence:
+                os.unlink(name)
+
+    def close(self):
+        self._file.close()
+
+
+def read_journal(path: str) -> List[Tuple[str, list]]:
+    """Записи всех сегментов журнала по порядку; недописанная последняя строка пропускается"""
+    ops = []
+    for _, name in _Journal.segments(path):
+        with open(name, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    ops.append(tuple(json.loads(line)))
+                except ValueError:
+                    logger.warning(f"Skipping truncated record in state journal {name}")
+    return ops
+
+
+class UserStateCache(AsyncStateManager):
+    """
+    Кэш состояния пользователей в памяти перед StateManager.
+
+    После start() существование пользователя, пояс, статус, глагол дня и
+    отправленные сегодня времена читаются из памяти без обращения к БД.
+    start() не ждёт загрузки: активные пользователи загружаются в фоне
+    страницами, а пользователь, которого ещё нет в памяти (не загружен,
+    неактивен или новый), читается из БД при первом обращении и остаётся
+    в памяти.
+    Изменения этих данных применяются к памяти сразу, а в SQLite пишутся
+    пакетом раз в flush_interval секунд или при накоплении flush_threshold
+    изменений - одной транзакцией на сброс вместо транзакции на событие.
+    Перед любым запросом, который идёт в БД, накопленные изменения
+    ставятся в очередь потока БД первыми, поэтому запросы видят их.
+    До start() (например, в шардированном режиме, где состояние меняют
+    несколько процессов) кэш прозрачно передаёт все вызовы в БД.
+    """
+
+    def __init__(self, state_manager: StateManager, durability: str = DURABILITY_JOURNAL,
+                 flush_interval: float = 1.0, flush_threshold: int = 1000,
+                 journal_file: Optional[str] = None, max_batch: int = 512):
+        if durability not in (DURABILITY_SYNC, DURABILITY_JOURNAL, DURABILITY_MEMORY):
+            raise ValueError(f"Unknown state durability: {durability}")
+        super().__init__(state_manager, max_batch)
+        self.durability = durability
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self.journal_file = journal_file or f'{state_manager.db_file}.state-journal'
+        self.started = False
+        self.loaded = False  # Фоновая загрузка активных пользователей завершена
+        self._users: Dict[int, _UserState] = {}
+        self._tense_bits: Dict[str, int] = {}
+        self._tense_names: List[str] = []
+        self._pending: List[Tuple[str, tuple]] = []
+        self._journal: Optional[_Journal] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._warmer: Optional[asyncio.Task] = None
+        self._flushes: set = set()
+
+    # Запуск, сброс и восстановление
+
+    async def recover(self) -> int:
+        """Проиграть журнал, оставшийся после падения, вернуть число записей"""
+        ops = read_journal(self.journal_file)
+        if ops:
+            await super()._submit(self._apply_writes, ops)
+            logger.info(f"Recovered {len(ops)} state writes from {self.journal_file}")
+        if self._journal is None:
+            for _, name in _Journal.segments(self.journal_file):
+                os.unlink(name)
+        return len(ops)
+
+    async def start(self, active_since: Optional[str] = None):
+        """
+        Восстановить журнал, включить кэш и отложенную запись и начать фоновую
+        загрузку активных пользователей (обращавшихся к боту с active_since)
+        """
+        await self.recover()
+        if self.durability == DURABILITY_JOURNAL:
+            self._journal = _Journal(self.journal_file)
+        if self.durability != DURABILITY_SYNC:
+            self._flusher = asyncio.create_task(self._flush_periodically())
+        self.started = True
+        self._warmer = asyncio.create_task(self._warm(active_since))
+
+    async def wait_loaded(self):
+        """Дождаться завершения фоновой загрузки"""
+        if self._warmer:
+            await asyncio.shield(self._warmer)
+
+    async def _warm(self, active_since: Optional[str]):
+        started = time.perf_counter()
+        after_user_id, count = None, 0
+        try:
+            while True:
+                rows = await self._submit(
+                    self.state_manager.get_active_user_states, after_user_id, WARM_PAGE_SIZE, active_since
+                )
+                for row in rows:
+                    self._load(row)
+                count += len(rows)
+                if len(rows) < WARM_PAGE_SIZE:
+                    break
+                after_user_id = rows[-1][0]
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Кэш остаётся рабочим: недостающие пользователи читаются из БД при обращении
+            logger.error(f"Warming state cache failed after {count} users: {e}")
+            return
+        self.loaded = True
+        logger.info(
+            f"Loaded state of {count} active users in {time.perf_counter() - started:.3f}s, "
+            f"durability {self.durability}"
+        )
+
+    async def close(self):
+        """Записать накопленные изменения, закрыть журнал и БД"""
+        if self._warmer:
+            self._warmer.cancel()
+            await asyncio.gather(self._warmer, return_exceptions=True)
+            self._warmer = None
+        if self._flusher:
+            self._flusher.cancel()
+            self._flusher = None
+        if self._pending:
+            self._flush()
+        await asyncio.gather(*self._flushes, return_exceptions=True)
+        if self._journal:
+            self._journal.close()
+            if not self._pending:
+                self._journal.remove_through(self._journal.sequence)
+            self._journal = None
+        await super().close()
+
+    async def flush(self):
+        """Записать накопленные изменения в SQLite и дождаться фиксации"""
+        if self._pending:
+            self._flush()
+        await asyncio.gather(*self._flushes, return_exceptions=True)
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if self._pending:
+                self._flush()
+
+    def _submit(self, func, *args) -> asyncio.Future:
+        # Накопленные изменения выполняются в потоке БД раньше запроса: запрос их видит
+        if self._pending:
+            self._flush()
+        return super()._submit(func, *args)
+
+    def _flush(self):
+        """Поставить накопленные изменения в очередь потока БД одним вызовом"""
+        ops, self._pending = self._pending, []
+        segment = self._journal.rotate() if self._journal else None
+        future = super()._submit(self._apply_writes, ops)
+        self._flushes.add(future)
+        future.add_done_callback(lambda done: self._flushed(done, ops, segment))
+
+    def _flushed(self, future: asyncio.Future, ops: List[Tuple[str, tuple]], segment: Optional[int]):
+        self._flushes.discard(future)
+        if future.cancelled() or future.exception() is not None:
+            # Транзакция не зафиксирована: изменения остаются в памяти (и в журнале) до следующего сброса
+            error = 'cancelled' if future.cancelled() else future.exception()
+            logger.error(f"Flushing {len(ops)} state writes failed: {error}")
+            CACHE_FLUSHES.inc('failed')
+            self._pending[:0] = ops
+            return
+        CACHE_FLUSHES.inc('ok')
+        CACHE_FLUSH_OPS.observe(len(ops))
+        if segment is not None and self._journal:
+            self._journal.remove_through(segment)
+
+    def _apply_writes(self, ops: List[Tuple[str, tuple]]):
+        """Выполняется в потоке БД в одной транзакции; ошибка одной записи не мешает остальным"""
+        for name, args in ops:
+            try:
+                getattr(self.state_manager, name)(*args)
+            except Exception as e:
+                logger.error(f"Dropping state write {name}{tuple(args)}: {e}")
+
+    async def _write(self, name: str, *args):
+        """Изменение, уже применённое к памяти: сразу в БД (sync) или в очередь отложенной записи"""
+        if self.durability == DURABILITY_SYNC:
+            return await super()._submit(getattr(self.state_manager, name), *args)
+        if self._journal:
+            self._journal.append(name, args)
+        self._pending.append((name, args))
+        if len(self._pending) >= self.flush_threshold:
+            self._flush()
+
+    def _bit(self, tense: str) -> int:
+        bit = self._tense_bits.get(tense)
+        if bit is None:
+            bit = self._tense_bits[tense] = 1 << len(self._tense_names)
+            self._tense_names.append(tense)
+        return bit
+
+    @staticmethod
+    def _today(today: Optional[str]) -> str:
+        return today or datetime.now().date().isoformat()
+
+    def _load(self, row: tuple) -> _UserState:
+        """Состояние из строки get_user_states; уже загруженное в память не заменяется"""
+        user_id, timezone, status, verb, date, tenses = row
+        state = self._users.get(user_id)
+        if state is None:
+            sent = 0
+            for tense in tenses.split(',') if tenses else ():
+                sent |= self._bit(tense)
+            state = self._users[user_id] = _UserState(timezone, status, verb, date, sent)
+        return state
+
+    async def _state(self, user_id: int) -> Optional[_UserState]:
+        """
+        Состояние пользователя из памяти или из БД (None - пользователя нет).
+        Изменения тоже загружают пользователя перед тем, как применить себя к
+        памяти: иначе параллельное чтение из БД вернуло бы состояние без них
+        """
+        state = self._users.get(user_id)
+        if state is None:
+            for row in await self._submit(self.state_manager.get_user_states, [user_id]):
+                state = self._load(row)
+        return state
+
+    async def _states(self, user_ids: Iterable[int]):
+        """Загрузить в память тех из user_ids, кого там ещё нет, одним запросом"""
+        missing = [user_id for user_id in user_ids if user_id not in self._users]
+        if missing:
+            for row in await self._submit(self.state_manager.get_user_states, missing):
+                self._load(row)
+
+    # Пользователи
+
+    async def user_exists(self, user_id: int) -> bool:
+        """Проверка существования пользователя"""
+        if not self.started:
+            return await super().user_exists(user_id)
+        return await self._state(user_id) is not None
+
+    async def create_user(self, user_id: int, timezone: str = DEFAULT_TIMEZONE):
+        """Создание нового пользователя"""
+        if not self.started:
+            return await super().create_user(user_id, timezone)
+        if await self._state(user_id) is None:
+            self._users[user_id] = _UserState(timezone)
+            await self._write('create_user', user_id, timezone)
+
+    async def get_user_timezone(self, user_id: int) -> Optional[str]:
+        """Часовой пояс пользователя"""
+        if not self.started:
+            return await super().get_user_timezone(user_id)
+        state = await self._state(user_id)
+        return state.timezone if state else None
+
+    async def set_user_timezone(self, user_id: int, timezone: str):
+        """Установить часовой пояс пользователя"""
+        if not self.started:
+            return await super().set_user_timezone(user_id, timezone)
+        state = await self._state(user_id)
+        if state:
+            state.timezone = timezone
+        await self._write('set_user_timezone', user_id, timezone)
+
+    async def touch_user(self, user_id: int, today: Optional[str] = None):
+        """Отметить обращение пользователя к боту"""
+        if not self.started:
+            return await super().touch_user(user_id, today)
+        await self._write('touch_user', user_id, self._today(today))
+
+    async def reactivate_user(self, user_id: int) -> bool:
+        """Вернуть пользователя в рассылку, True - если он был заблокирован"""
+        if not self.started:
+            return await super().reactivate_user(user_id)
+        state = await self._state(user_id)
+        if state is None or state.status == USER_ACTIVE:
+            return False
+        state.status = USER_ACTIVE
+        await self._write('reactivate_user', user_id)
+        return True
+
+    async def block_users(self, user_ids: List[int]):
+        """Исключить пользователей из рассылки после постоянной ошибки доставки"""
+        if not self.started:
+            return await super().block_users(user_ids)
+        await self._states(user_ids)
+        for user_id in user_ids:
+            state = self._users.get(user_id)
+            if state:
+                state.status = USER_BLOCKED
+        await self._write('block_users', list(user_ids))
+
+    async def get_user_status(self, user_id: int) -> Optional[str]:
+        """Статус доставки пользователя"""
+        if not self.started:
+            return await super().get_user_status(user_id)
+        state = await self._state(user_id)
+        return state.status if state else None
+
+    # Глагол дня и отправленные времена
+
+    def _set_verb(self, user_id: int, infinitivo: str, today: str) -> Optional[str]:
+        """Глагол дня в памяти (не меняется, если уже выбран сегодня), вернуть фактический"""
+        state = self._users.get(user_id)
+        if state is None:
+            return None
+        if state.date != today:
+            state.verb, state.date, state.sent = infinitivo, today, 0
+        return state.verb
+
+    async def set_verb_of_the_day(self, user_id: int, infinitivo: str, today: Optional[str] = None):
+        """Установить глагол дня для пользователя"""
+        if not self.started:
+            return await super().set_verb_of_the_day(user_id, infinitivo, today)
+        today = self._today(today)
+        await self._state(user_id)
+        self._set_verb(user_id, infinitivo, today)
+        await self._write('set_verb_of_the_day', user_id, infinitivo, today)
+
+    async def set_verbs_of_the_day(self, assignments: Iterable[Tuple[int, str]],
+                                   today: Optional[str] = None) -> Dict[int, str]:
+        """Установить глаголы дня для многих пользователей, вернуть фактические"""
+        if not self.started:
+            return await super().set_verbs_of_the_day(assignments, today)
+        today = self._today(today)
+        assignments = list(assignments)
+        await self._states(user_id for user_id, _ in assignments)
+        verbs = {}
+        for user_id, infinitivo in assignments:
+            verb = self._set_verb(user_id, infinitivo, today)
+            if verb is not None:
+                verbs[user_id] = verb
+        if assignments:
+            await self._write('set_verbs_of_the_day', assignments, today)
+        return verbs
+
+    async def get_current_verb(self, user_id: int, today: Optional[str] = None) -> Optional[str]:
+        """Получить текущий глагол дня для пользователя"""
+        if not self.started:
+            return await super().get_current_verb(user_id, today)
+        state = await self._state(user_id)
+        if state is None or state.date != self._today(today):
+            return None
+        return state.verb
+
+    async def get_current_verbs(self, user_ids: List[int], today: Optional[str] = None) -> Dict[int, str]:
+        """Получить глаголы дня для многих пользователей"""
+        if not self.started:
+            return await super().get_current_verbs(user_ids, today)
+        today = self._today(today)
+        await self._states(user_ids)
+        users = self._users
+        verbs = {}
+        for user_id in user_ids:
+            state = users.get(user_id)
+            if state is not None and state.date == today:
+                verbs[user_id] = state.verb
+        return verbs
+
+    async def get_sent_tenses(self, user_id: int, today: Optional[str] = None) -> List[str]:
+        """Получить список отправленных времён для пользователя на сегодня"""
+        if not self.started:
+            return await super().get_sent_tenses(user_id, today)
+        state = await self._state(user_id)
+        if state is None or state.date != self._today(today):
+            return []
+        return [name for index, name in enumerate(self._tense_names) if state.sent >> index & 1]
+
+    def _mark_sent(self, deliveries: Iterable[Tuple[int, str]], today: str):
+        for user_id, tense in deliveries:
+            state = self._users.get(user_id)
+            if state is not None and state.date == today:
+                state.sent |= self._bit(tense)
+
+    async def mark_tense_sent(self, user_id: int, tense: str, today: Optional[str] = None):
+        """Отметить время как отправленное"""
+        if not self.started:
+            return await super().mark_tense_sent(user_id, tense, today)
+        today = self._today(today)
+        await self._state(user_id)
+        self._mark_sent([(user_id, tense)], today)
+        await self._write('mark_tense_sent', user_id, tense, today)
+
+    async def mark_tenses_sent(self, deliveries: Iterable[Tuple[int, str]], today: Optional[str] = None):
+        """Отметить отправленные времена для многих пользователей"""
+        if not self.started:
+            return await super().mark_tenses_sent(deliveries, today)
+        today = self._today(today)
+        deliveries = list(deliveries)
+        await self._states(user_id for user_id, _ in deliveries)
+        self._mark_sent(deliveries, today)
+        await self._write('mark_tenses_sent', deliveries, today)
+
+    async def complete_tense_claims(self, delivered: Iterable[Tuple[int, str]],
+                                    failed: Iterable[Tuple[int, str]], today: Optional[str] = None):
+        """
+        Завершение строк outbox пишется в БД сразу: на нём держится
+        защита от повторной отправки времён после падения
+        """
+        delivered = list(delivered)
+        await super().complete_tense_claims(delivered, failed, today)
+        if self.started:
+            self._mark_sent(delivered, self._today(today))
+
+    async def reset_daily_progress(self, user_id: int):
+        """Сброс ежедневного прогресса (для тестирования)"""
+        if not self.started:
+            return await super().reset_daily_progress(user_id)
+        state = await self._state(user_id)
+        if state:
+            state.verb, state.date, state.sent = None, None, 0
+        await self._write('reset_daily_progress', user_id)
+
+    async def reset_sent_tenses(self, user_id: int, today: Optional[str] = None):
+        """Сброс отправленных времён для пользователя"""
+        if not self.started:
+            return await super().reset_sent_tenses(user_id, today)
+        today = self._today(today)
+        state = await self._state(user_id)
+        if state and state.date == today:
+            state.sent = 0
+        await self._write('reset_sent_tenses', user_id, today)
@@ -0,0 +1,328 @@
+"""
+Скомпилированный набор глаголов.
+
+verbs.csv компилируется в бинарный файл, который открывается через mmap
+без разбора: таблица уникальных строк, записи глаголов фиксированной
+ширины, формы неправильных времён и отсортированный индекс по инфинитиву.
+Правильные времена (совпадающие со спряжением conjugator.py) не хранятся:
+в записи на их месте REGULAR, формы строятся из инфинитива при чтении.
+В CSV такие времена можно оставить пустыми. В заголовке
+хранятся SHA-256, размер и время изменения исходного CSV: файл
+пересобирается только при изменении хеша, а хеш при старте считается,
+только если изменились размер или время изменения.
+
+Сборка вручную (иначе выполняется автоматически при старте бота):
+    python verb_dataset.py verbs.csv verbs.bin
+"""
+import csv
+import hashlib
+import mmap
+import operator
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from conjugator import conjugate, is_regular
+
+# Лица в порядке колонок CSV: Время__1s ... Время__3p
+PERSONS = ('1s', '2s', '3s', '1p', '2p', '3p')
+
+# Форма для времени, которого нет у глагола
+MISSING_FORM = '—'
+
+MAGIC = b'SVRB'
+VERSION = 2
+# magic, версия, порядок байт (1 - little endian), SHA-256 CSV, размер CSV, mtime CSV в нс,
+# строк, глаголов, времён, неправильных времён, размер blob
+HEADER = struct.Struct('<4sHH32sQqIIIII')
+
+# Разделитель строк в blob: весь blob декодируется одним split
+SEPARATOR = '\0'
+
+# Поля записи глагола перед временами: popularity, infinitivo, translation_ru
+RECORD_FIELDS = 3
+
+# Время глагола вместо номера в таблице неправильных форм: формы строит conjugate()
+REGULAR = 0xFFFFFFFF
+
+# Запись глагола: (popularity, infinitivo, translation_ru, forms[tense_id][person_id]);
+# в записи из CompiledVerbs.record() правильные времена - None, их формы строит conjugate()
+VerbRecord = Tuple[str, str, str, Tuple[Optional[Tuple[str, ...]], ...]]
+
+
+def csv_hash(csv_file: str) -> bytes:
+    with open(csv_file, 'rb') as f:
+        return hashlib.sha256(f.read()).digest()
+
+
+def csv_stat(csv_file: str) -> Tuple[int, int]:
+    """(размер, mtime в нс) - быстрая проверка, что CSV не менялся"""
+    stat = os.stat(csv_file)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _forms_getter(form_columns: List[Optional[int]]):
+    """Функция, возвращающая кортеж форм времени из строки CSV"""
+    if all(col is not None for col in form_columns):
+        return operator.itemgetter(*form_columns)
+
+    # Часть колонок отсутствует: на их месте '—'
+    def getter(row):
+        return tuple(
+            row[col] if col is not None and col < len(row) else MISSING_FORM
+            for col in form_columns
+        )
+    return getter
+
+
+def read_csv(csv_file: str) -> Tuple[List[str], List[VerbRecord]]:
+    """Разобрать CSV: (времена, записи глаголов в порядке файла)"""
+    with open(csv_file, 'r', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        # Короткие строки дополняются пустыми ячейками (как у csv.DictReader), пустые пропускаются
+        width = len(header)
+        rows = [row + [''] * (width - len(row)) if len(row) < width else row for row in reader if row]
+
+    # Определяем доступные времена из заголовков
+    columns = {name: index for index, name in enumerate(header)}
+    tenses = sorted({key.split('__')[0] for key in header if '__' in key})
+
+    # Для каждого времени - функция, достающая из строки CSV кортеж из 6 форм
+    form_getters = [
+        _forms_getter([columns.get(f"{tense}__{person}") for person in PERSONS])
+        for tense in tenses
+    ]
+
+    popularity_col = columns.get('popularity')
+    infinitivo_col = columns['infinitivo'] if rows else None
+    translation_col = columns.get('translation_ru')
+
+    def forms(infinitivo: str, row) -> Tuple[Tuple[str, ...], ...]:
+        # Пустые ячейки времени - правильное спряжение
+        return tuple(
+            tense_forms if any(tense_forms) else conjugate(infinitivo, tense) or tense_forms
+            for tense, tense_forms in zip(tenses, (getter(row) for getter in form_getters))
+        )
+
+    records = [
+        (
+            row[popularity_col] if popularity_col is not None else '',
+            row[infinitivo_col],
+            row[translation_col] if translation_col is not None else '',
+            forms(row[infinitivo_col], row),
+        )
+        for row in rows
+    ]
+    return tenses, records
+
+
+def build(tenses: Sequence[str], records: Sequence[VerbRecord], source_hash: bytes,
+          source_stat: Tuple[int, int] = (0, 0)) -> bytes:
+    """Собрать бинарный образ набора глаголов"""
+    strings: Dict[str, int] = {}
+
+    def intern(value: str) -> int:
+        string_id = strings.get(value)
+        if string_id is None:
+            string_id = strings[value] = len(strings)
+        return string_id
+
+    tense_ids = array('I', (intern(tense) for tense in tenses))
+    verbs = array('I')
+    # Формы неправильных времён по 6 номеров строк; в записи глагола - номер такого времени
+    overrides = array('I')
+    for popularity, infinitivo, translation, forms in records:
+        verbs.extend((intern(popularity), intern(infinitivo), intern(translation)))
+        for tense, tense_forms in zip(tenses, forms):
+            if is_regular(infinitivo, tense, tense_forms):
+                verbs.append(REGULAR)
+            else:
+                verbs.append(len(overrides) // len(PERSONS))
+                overrides.extend(intern(form) for form in tense_forms)
+
+    # Индекс: номера глаголов, отсортированные по байтам инфинитива
+    # (при дубликатах первым идёт глагол, раньше встретившийся в CSV)
+    index = array('I', sorted(range(len(records)), key=lambda verb_id: (records[verb_id][1].encode(), verb_id)))
+
+    if any(SEPARATOR in value for value in strings):
+        raise ValueError('Verb dataset strings must not contain NUL characters')
+    # Смещение начала каждой строки; строка i заканчивается перед разделителем на offsets[i + 1] - 1
+    encoded = [value.encode('utf-8') for value in strings]
+    offsets = array('I', [0])
+    for value in encoded:
+        offsets.append(offsets[-1] + len(value) + 1)
+    blob = SEPARATOR.encode().join(encoded)
+
+    header = HEADER.pack(
+        MAGIC, VERSION, sys.byteorder == 'little', source_hash, *source_stat,
+        len(encoded), len(records), len(tenses), len(overrides) // len(PERSONS), len(blob)
+    )
+    return b''.join((
+        header, offsets.tobytes(), tense_ids.tobytes(), verbs.tobytes(), overrides.tobytes(), index.tobytes(), blob
+    ))
+
+
+def compile_csv(csv_file: str, compiled_file: str) -> bytes:
+    """Скомпилировать CSV в файл (запись атомарная), вернуть образ"""
+    source_stat = csv_stat(csv_file)
+    tenses, records = read_csv(csv_file)
+    data = build(tenses, records, csv_hash(csv_file), source_stat)
+    directory = os.path.dirname(os.path.abspath(compiled_file))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, compiled_file)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return data
+
+
+def read_header(buffer) -> Optional[tuple]:
+    """Заголовок образа или None, если это не образ текущей версии для этой платформы"""
+    if len(buffer) < HEADER.size:
+        return None
+    header = HEADER.unpack_from(buffer)
+    magic, version, little_endian = header[:3]
+    if magic != MAGIC or version != VERSION or bool(little_endian) != (sys.byteorder == 'little'):
+        return None
+    return header
+
+
+class CompiledVerbs:
+    """
+    Набор глаголов поверх бинарного образа (mmap или bytes).
+    Строки декодируются при первом обращении и переиспользуются,
+    правильные времена в записи не хранятся (их строит conjugate()).
+    """
+
+    def __init__(self, buffer):
+        header = read_header(buffer)
+        if header is None:
+            raise ValueError('Not a compiled verb dataset')
+        (_, _, _, self.source_hash, source_size, source_mtime,
+         string_count, verb_count, tense_count, override_count, blob_size) = header
+        self.source_stat = (source_size, source_mtime)
+        self.count = verb_count
+        self.tense_count = tense_count
+        self.override_count = override_count
+        self.record_width = RECORD_FIELDS + tense_count
+        self._buffer = buffer
+
+        view = memoryview(buffer)
+        position = HEADER.size
+
+        def section(length: int) -> memoryview:
+            nonlocal position
+            start, position = position, position + length * 4
+            return view[start:position].cast('I')
+
+        self._offsets = section(string_count + 1)
+        tense_ids = section(tense_count)
+        self._verbs = section(verb_count * self.record_width)
+        self._overrides = section(override_count * len(PERSONS))
+        self._index = section(verb_count)
+        self._blob_start = position
+        self._blob = view[position:position + blob_size]
+        if len(self._blob) != blob_size:
+            raise ValueError('Truncated compiled verb dataset')
+        self._strings: List[Optional[str]] = [None] * string_count
+        self._decoded = False
+
+        self.tenses = [self.string(string_id) for string_id in tense_ids]
+
+    def string(self, string_id: int) -> str:
+        value = self._strings[string_id]
+        if value is None:
+            # Срез mmap/bytes сразу даёт bytes - быстрее, чем через memoryview
+            start = self._blob_start + self._offsets[string_id]
+            end = self._blob_start + self._offsets[string_id + 1] - 1
+            value = self._buffer[start:end].decode('utf-8')
+            self._strings[string_id] = value
+        return value
+
+    def decode_all(self):
+        """Декодировать всю таблицу строк разом (перед загрузкой всех записей)"""
+        if not self._decoded:
+            self._strings = str(self._blob, 'utf-8').split(SEPARATOR) if len(self._strings) else []
+            self._decoded = True
+
+    def infinitivo(self, verb_id: int) -> str:
+        return self.string(self._verbs[verb_id * self.record_width + 1])
+
+    def sorted_infinitivos(self) -> Tuple[str, ...]:
+        """Инфинитивы по алфавиту (по индексу), независимо от порядка строк CSV"""
+        return tuple(map(self.infinitivo, self._index.tolist()))
+
+    def record(self, verb_id: int) -> VerbRecord:
+        """Запись глагола по его номеру: хранятся только неправильные времена"""
+        start = verb_id * self.record_width
+        ids = self._verbs[start:start + self.record_width].tolist()
+        string = self._strings.__getitem__ if self._decoded else self.string
+        popularity, infinitivo, translation = map(string, ids[:RECORD_FIELDS])
+        persons = len(PERSONS)
+        forms = tuple(
+            None if override == REGULAR
+            else tuple(map(string, self._overrides[override * persons:(override + 1) * persons]))
+            for override in ids[RECORD_FIELDS:]
+        )
+        return popularity, infinitivo, translation, forms
+
+    def find(self, infinitivo: str) -> Optional[int]:
+        """Номер глагола по инфинитиву: бинарный поиск по индексу, O(log n)"""
+        key = infinitivo.encode('utf-8')
+        index, verbs, width = self._index, self._verbs, self.record_width
+        offsets, blob = self._offsets, self._blob
+        low, high = 0, len(index)
+        while low < high:
+            middle = (low + high) // 2
+            string_id = verbs[index[middle] * width + 1]
+            if blob[offsets[string_id]:offsets[string_id + 1] - 1].tobytes() < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(index) and self.infinitivo(index[low]) == infinitivo:
+            return index[low]
+        return None
+
+
+def open_compiled(csv_file: str, compiled_file: str) -> CompiledVerbs:
+    """
+    Открыть скомпилированный набор, пересобрав его, если он отсутствует
+    или собран из другой версии CSV. Если файл записать нельзя,
+    образ собирается в памяти.
+    """
+    try:
+        with open(compiled_file, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        header = read_header(buffer)
+        # Хеш CSV считается, только если его размер или время изменения не совпали
+        if header is not None and (header[4:6] == csv_stat(csv_file) or header[3] == csv_hash(csv_file)):
+            return CompiledVerbs(buffer)
+        buffer.close()
+    except (OSError, ValueError, TypeError):
+        # Файла нет, он пустой, повреждён или другой версии
+        pass
+
+    try:
+        data = compile_csv(csv_file, compiled_file)
+    except OSError:
+        tenses, records = read_csv(csv_file)
+        data = build(tenses, records, csv_hash(csv_file), csv_stat(csv_file))
+    return CompiledVerbs(data)
+
+
+if __name__ == '__main__':
+    source = sys.argv[1] if len(sys.argv) > 1 else 'verbs.csv'
+    target = sys.argv[2] if len(sys.argv) > 2 else os.path.splitext(source)[0] + '.bin'
+    compiled = CompiledVerbs(compile_csv(source, target))
+    print(
+        f"Compiled {compiled.count} verbs, {compiled.tense_count} tenses "
+        f"({compiled.override_count} of {compiled.count * compiled.tense_count} irregular) into {target}"
+    )
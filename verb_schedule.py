@@ -0,0 +1,52 @@
+"""
+Детерминированный выбор глагола дня.
+
+Глагол пользователя на дату вычисляется из (user_id, даты) без обращения
+к БД: у каждого пользователя свой порядок глаголов - аффинная перестановка
+номеров (a * i + b) mod n с a, взаимно простым с n, - и каждый день он
+получает следующий глагол этого порядка. За n дней подряд глаголы не
+повторяются, затем начинается новый цикл с другой перестановкой. Циклы
+пользователей сдвинуты, чтобы не начинаться в один день.
+"""
+import functools
+import math
+from datetime import date
+from typing import Tuple
+
+MASK = 0xFFFFFFFFFFFFFFFF
+
+
+def _mix(value: int) -> int:
+    """Перемешивание 64-битного числа (splitmix64): из соседних значений - непохожие"""
+    value = (value + 0x9E3779B97F4A7C15) & MASK
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & MASK
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & MASK
+    return value ^ (value >> 31)
+
+
+def day_number(today: str) -> int:
+    """Номер дня для даты в формате ISO (YYYY-MM-DD)"""
+    return date.fromisoformat(today).toordinal()
+
+
+@functools.lru_cache(maxsize=8)
+def _steps(count: int) -> Tuple[int, ...]:
+    """Шаги перестановки: числа, взаимно простые с count"""
+    return tuple(step for step in range(1, count) if math.gcd(step, count) == 1)
+
+
+def cycle_position(user_id: int, day: int, count: int) -> Tuple[int, int]:
+    """(номер цикла, номер дня в цикле) пользователя в день day для словаря из count глаголов"""
+    return divmod(day + _mix(user_id) % count, count)
+
+
+def daily_verb_id(user_id: int, day: int, count: int) -> int:
+    """Номер глагола дня (0..count-1) пользователя user_id в день day, O(1)"""
+    if count <= 1:
+        return 0
+    user_seed = _mix(user_id)
+    # То же, что cycle_position, без повторного перемешивания user_id
+    cycle, position = divmod(day + user_seed % count, count)
+    seed = _mix(user_seed ^ cycle)
+    steps = _steps(count)
+    return (steps[seed % len(steps)] * position + (seed >> 32)) % count